@@ -0,0 +1,280 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import json
+import os
+import time
+from typing import Iterable, List, Optional, Type
+
+import arrow
+
+from home_monitoring import logger
+from home_monitoring.config import BackfillConfig
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.scrapers.base_scraper import (
+    BackfillableScraper,
+    BaseScraper,
+    load_scraper_class,
+)
+from home_monitoring.scrapers.utils import Window, split_windows
+from home_monitoring.store.metrics_store import MetricsStore
+from home_monitoring.store.retry import TokenBucket
+
+logger = logger.get(__name__)
+
+
+class BackfillProgress:
+    """Windows already written by a backfill, persisted as JSON so that an
+    interrupted backfill resumes where it left off"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path) if path else None
+        self.completed = set()
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                self.completed = {tuple(window) for window in json.load(f)["completed"]}
+
+    def is_completed(self, window: Window) -> bool:
+        return window in self.completed
+
+    def mark_completed(self, windows: Iterable[Window]) -> None:
+        self.completed.update(windows)
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # write + rename so a crash never leaves truncated progress behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"completed": sorted(self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class BackfillReport:
+    windows: int = 0
+    # completed by an earlier run
+    windows_skipped: int = 0
+    windows_completed: int = 0
+    # failed to fetch or write, retried by the next run
+    windows_failed: int = 0
+    records_fetched: int = 0
+    records_written: int = 0
+    records_rejected: int = 0
+    records_failed: int = 0
+    write_calls: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.records_written / self.elapsed_seconds
+
+    def summary(self) -> str:
+        return (
+            f"{self.windows_completed}/{self.windows} windows completed "
+            f"({self.windows_skipped} skipped, {self.windows_failed} failed), "
+            f"{self.records_written}/{self.records_fetched} records written "
+            f"({self.records_rejected} rejected, {self.records_failed} failed) "
+            f"in {self.write_calls} writes, {self.elapsed_seconds:.1f}s, "
+            f"{self.records_per_second:,.0f} records/s"
+        )
+
+
+class BackfillRunner:
+    """Re-scrapes a time range for BackfillableScrapers.
+
+    The range is split into the scraper's `backfill_window_seconds` windows,
+    which are fetched concurrently by `max_workers` threads while staying
+    under the scraper's `backfill_requests_per_minute`. Fetched records are
+    buffered and written in batches of `batch_records`; a window is only
+    marked completed once its records were written"""
+
+    def __init__(
+        self,
+        scraper: BackfillableScraper,
+        store: MetricsStore,
+        progress: BackfillProgress = None,
+        table_name: str = "metrics",
+        max_workers: int = BackfillConfig.MAX_WORKERS,
+        batch_records: int = BackfillConfig.BATCH_RECORDS,
+        token_bucket: TokenBucket = None,
+    ):
+        if not isinstance(scraper, BackfillableScraper):
+            raise ValueError(unsupported_message(type(scraper)))
+
+        self.scraper = scraper
+        self.store = store
+        self.progress = progress or BackfillProgress()
+        self.table_name = table_name
+        self.max_workers = max_workers
+        self.batch_records = batch_records
+        self.token_bucket = token_bucket or TokenBucket(
+            scraper.backfill_requests_per_minute / 60, capacity=1
+        )
+
+    def run(self, since: arrow.Arrow, until: arrow.Arrow) -> BackfillReport:
+        windows = split_windows(
+            since.int_timestamp,
+            until.int_timestamp,
+            self.scraper.backfill_window_seconds,
+        )
+        pending = [w for w in windows if not self.progress.is_completed(w)]
+        report = BackfillReport(
+            windows=len(windows), windows_skipped=len(windows) - len(pending)
+        )
+        logger.info(
+            f"Backfilling {type(self.scraper).__name__} from {since} to {until}: "
+            f"{len(pending)} of {len(windows)} windows pending"
+        )
+
+        started = time.perf_counter()
+        buffer = MetricBatch()
+        buffered_windows = []
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {executor.submit(self._fetch, w): w for w in pending}
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    records = future.result()
+                except Exception as err:
+                    logger.error(f"Failed to fetch window {window}: {err}")
+                    report.windows_failed += 1
+                    continue
+
+                report.records_fetched += len(records)
+                buffer.extend(records)
+                buffered_windows.append(window)
+                if len(buffer) >= self.batch_records:
+                    self._write(buffer, buffered_windows, report)
+                    buffer = MetricBatch()
+                    buffered_windows = []
+                    report.elapsed_seconds = time.perf_counter() - started
+                    logger.info(f"Backfill progress: {report.summary()}")
+
+            self._write(buffer, buffered_windows, report)
+        finally:
+            # on interrupt, don't wait for windows that haven't started yet
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        report.elapsed_seconds = time.perf_counter() - started
+        logger.info(f"Backfill finished: {report.summary()}")
+        return report
+
+    def _fetch(self, window: Window) -> Metrics:
+        self.token_bucket.acquire()
+        since_ts, until_ts = window
+        return self.scraper.scrape_window(arrow.get(since_ts), arrow.get(until_ts))
+
+    def _write(
+        self, records: MetricBatch, windows: List[Window], report: BackfillReport
+    ) -> None:
+        if not windows:
+            return
+        if records:
+            report.write_calls += 1
+            try:
+                result = self.store.write_metrics(
+                    self.table_name,
+                    records,
+                    multi_measure_name=self.scraper.multi_measure_name,
+                )
+            except Exception as err:
+                logger.error(f"Failed to write {len(records)} records: {err}")
+                report.records_failed += len(records)
+                report.windows_failed += len(windows)
+                return
+
+            report.records_written += result.records_ingested
+            report.records_rejected += result.records_rejected
+            report.records_failed += result.records_failed
+            if result.records_failed:
+                logger.error(
+                    f"{result.records_failed} records failed to write, "
+                    f"{len(windows)} windows will be retried by the next run"
+                )
+                report.windows_failed += len(windows)
+                return
+
+        report.windows_completed += len(windows)
+        self.progress.mark_completed(windows)
+
+
+def unsupported_message(scraper_class: Type[BaseScraper]) -> str:
+    return (
+        f"{scraper_class.__name__} does not support backfill, as it can't fetch "
+        f"historical data (it isn't a BackfillableScraper)"
+    )
+
+
+def main(args: List[str] = None) -> BackfillReport:
+    parser = argparse.ArgumentParser(
+        prog="python -m home_monitoring.backfill",
+        description="Backfills a scraper's metrics over a time range. Re-running "
+        "the same command resumes an interrupted backfill",
+    )
+    parser.add_argument(
+        "scraper_class",
+        help="fully-qualified class name, e.g. "
+        "home_monitoring.scrapers.flume.FlumeScraper",
+    )
+    parser.add_argument("since", help="start of the range (ISO 8601, inclusive)")
+    parser.add_argument("until", help="end of the range (ISO 8601, exclusive)")
+    parser.add_argument("--env", default=os.environ.get("ENVIRONMENT", "prod"))
+    parser.add_argument("--workers", type=int, default=BackfillConfig.MAX_WORKERS)
+    parser.add_argument(
+        "--batch-records", type=int, default=BackfillConfig.BATCH_RECORDS
+    )
+    parser.add_argument(
+        "--progress",
+        help="progress file, defaults to one per scraper and env in "
+        f"{BackfillConfig.PROGRESS_DIR}",
+    )
+    parser.add_argument(
+        "--sqlite", help="write to this SQLite database instead of Timestream"
+    )
+    options = parser.parse_args(args)
+
+    class_name = options.scraper_class.split(".")[-1]
+    scraper_class = load_scraper_class(options.scraper_class)
+    # checked before building a store or progress file
+    if not issubclass(scraper_class, BackfillableScraper):
+        parser.error(unsupported_message(scraper_class))
+    scraper = scraper_class(env=options.env)
+    progress_path = options.progress or os.path.join(
+        BackfillConfig.PROGRESS_DIR, f"{class_name}-{options.env}.json"
+    )
+
+    if options.sqlite:
+        from home_monitoring.store.sqlite import SqliteMetricsStore
+
+        store = SqliteMetricsStore(os.path.expanduser(options.sqlite))
+    else:
+        import boto3
+
+        from home_monitoring.store.timestream import TimestreamMetricsStore
+
+        timestream_client = boto3.client("timestream-write", region_name="us-west-2")
+        store = TimestreamMetricsStore(timestream_client, "home_monitoring")
+
+    runner = BackfillRunner(
+        scraper,
+        store,
+        BackfillProgress(progress_path),
+        max_workers=options.workers,
+        batch_records=options.batch_records,
+    )
+    report = runner.run(arrow.get(options.since), arrow.get(options.until))
+    print(report.summary())
+    return report
+
+
+# Backfills a gap left by failed scraper runs, e.g.
+#   python -m home_monitoring.backfill \
+#       home_monitoring.scrapers.flume.FlumeScraper 2024-01-01 2024-02-01
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+# DynamoDB key/value table for pipeline state (see terraform_modules/storage)
+STATE_TABLE_NAME = "home_monitoring_state"
+# DynamoDB table for vendor OAuth tokens, keyed by app_name
+AUTH_TOKENS_TABLE_NAME = "home_monitoring_auth_tokens"
+
+
 def get_bucket_name(env: str) -> str:
     return f"nickdella-home-monitoring-{env}"
 
@@ -15,12 +21,39 @@ class EcowittConfig:
         "soil_ch6": "garden_tomato_soil",
         # "soil_ch7": "bamboo_forest_soil",
     }
+    # History is fetched at 5 minute resolution, one day per request. Dates
+    # in history requests are in the station's timezone
+    HISTORY_CYCLE_TYPE = "5min"
+    HISTORY_TIMEZONE = "US/Pacific"
+    BACKFILL_WINDOW_SECONDS = 24 * 60 * 60
+    BACKFILL_REQUESTS_PER_MINUTE = 60
 
 
 class EnphaseConfig:
     ENPHASE_BASE_URL = "https://api.enphaseenergy.com"
     ENPHASE_OAUTH_REDIRECT_URI = "https://api.enphaseenergy.com/oauth/redirect_uri"
     ENPHASE_SYSTEM_ID = 2215569
+    # Access tokens are valid for 24 hours. The hourly refresher only refreshes
+    # them once they expire within this window
+    TOKEN_REFRESH_WINDOW_SECONDS = 3 * 60 * 60
+    # When set, power and energy for an interval are written as a single
+    # Timestream MULTI measure record with this measure name. Note that the
+    # monitoring queries and dashboards read the single-measure schema
+    MULTI_MEASURE_NAME = None
+    # production_micro returns up to a day of 15 minute intervals per call.
+    # The free plan allows 10 calls per minute
+    BACKFILL_WINDOW_SECONDS = 24 * 60 * 60
+    BACKFILL_REQUESTS_PER_MINUTE = 10
+    # When set, each microinverter's 15 minute intervals are also stored, as
+    # microinverter_* measures with a serial_number dimension. This costs one
+    # call per microinverter per run, more than the free plan's 1,000 calls
+    # per month allow
+    MICROINVERTER_TELEMETRY = False
+    MAX_CONCURRENT_REQUESTS = 8
+    # Upper bound on calls per minute across all of a scraper's threads
+    REQUESTS_PER_MINUTE = 600
+    # Microinverters are listed via the devices API, cached in memory
+    DEVICE_LIST_TTL_SECONDS = 24 * 60 * 60
 
 
 class FlumeConfig:
@@ -31,10 +64,30 @@ class FlumeConfig:
     FLUME_USER_ID = 69740
     FLUME_DEVICE_ID = "6872060761719913970"
     LOCATION_NAME = "primary_residence"
+    # "HR" stores water usage per hour as household_water_usage, "MIN" per
+    # minute (for leak detection) as household_water_usage_per_minute, so the
+    # two resolutions never mix in one series
+    BUCKET = "HR"
+    # Buckets ending less than this long ago are left to the next run, as the
+    # Flume bridge uploads usage in batches and late buckets would otherwise
+    # be stored incomplete and never re-fetched
+    UPLOAD_LAG_SECONDS = 10 * 60
+    # Query limits: data points returned per query, and queries per request
+    MAX_POINTS_PER_QUERY = 1200
+    MAX_QUERIES_PER_REQUEST = 3
+    # Upper bound on a backfill request's range; minute buckets are further
+    # limited by the query limits above. The API allows 120 calls per hour
+    BACKFILL_WINDOW_SECONDS = 7 * 24 * 60 * 60
+    BACKFILL_REQUESTS_PER_MINUTE = 2
 
 
 class YolinkConfig:
     YOLINK_BASE_URL = "https://api.yosmart.com/open/yolink"
+    # Upper bound on concurrent getState calls per scrape
+    MAX_CONCURRENT_REQUESTS = 8
+    # Device ids, types and tokens rarely change, so Home.getDeviceList is
+    # cached. The cache is also dropped when a getState call fails
+    DEVICE_LIST_TTL_SECONDS = 6 * 60 * 60
 
     DEVICE_MAPPING = {
         "d88b4c0100070866": {
@@ -73,3 +126,107 @@ class YolinkConfig:
             "state_handler": lambda state: float(state["temperature"]),
         },
     }
+
+
+class PipelineConfig:
+    # Scrapers run together by a single Lambda invocation per schedule (see
+    # scraper_configs in terraform_modules/lambdas)
+    SCHEDULE_GROUPS = {
+        "frequent": [
+            "home_monitoring.scrapers.ecowitt.EcowittScraper",
+            "home_monitoring.scrapers.yolink.YolinkScraper",
+        ],
+        "hourly": [
+            "home_monitoring.scrapers.enphase.EnphaseScraper",
+            "home_monitoring.scrapers.flume.FlumeScraper",
+        ],
+    }
+    # A scraper still running after this is reported as failed, so one slow
+    # vendor can't fail the rest of its group with a Lambda timeout
+    SCRAPER_TIMEOUT_SECONDS = 40
+    # Write the store's own pipeline_* metrics (write latency, records per
+    # call, rejections, throttling) after each scraper run
+    EMIT_STORE_METRICS = True
+
+
+class ColdStartConfig:
+    # Upper bound on the time to import each Lambda handler in a fresh
+    # interpreter, checked by `make import-budget` (see import_profile.py)
+    IMPORT_BUDGETS_MS = {
+        "home_monitoring.lambdas.auth_token_refresher": 400,
+        "home_monitoring.lambdas.egg_detector": 50,
+        "home_monitoring.lambdas.grafana_auto_shutdown": 100,
+        "home_monitoring.lambdas.grafana_launcher": 100,
+        "home_monitoring.lambdas.metrics_importer": 400,
+        "home_monitoring.lambdas.monitoring": 350,
+    }
+    # Heavy dependencies the rarely invoked, latency sensitive handlers only
+    # import (and build clients with) on first use
+    DEFERRED_IMPORTS = {
+        "home_monitoring.lambdas.egg_detector": ["boto3", "botocore", "jinja2"],
+        "home_monitoring.lambdas.grafana_auto_shutdown": ["boto3", "botocore"],
+        "home_monitoring.lambdas.grafana_launcher": ["boto3", "botocore", "requests"],
+    }
+
+
+class BackfillConfig:
+    # Completed windows are recorded here so interrupted backfills resume
+    PROGRESS_DIR = "~/.home-monitoring/backfill"
+    # Windows fetched concurrently, still subject to the vendor's rate limit
+    MAX_WORKERS = 4
+    # Fetched records are buffered and written in batches of this size
+    BATCH_RECORDS = 10_000
+
+
+class PingConfig:
+    # When set, the ping stats are written as a single Timestream MULTI measure
+    # record with this measure name instead of one record per stat
+    MULTI_MEASURE_NAME = None
+    # Probed concurrently on each run (see home_monitoring.scrapers.probes).
+    # "icmp" targets fall back to TCP connects to `port` where unprivileged
+    # ICMP sockets aren't permitted
+    TARGETS = [
+        {"name": "google_dns", "host": "8.8.8.8", "kind": "icmp", "port": 53},
+        {"name": "cloudflare_dns", "host": "1.1.1.1", "kind": "icmp", "port": 53},
+        {"name": "google_dns_lookup", "host": "8.8.8.8", "kind": "dns"},
+    ]
+    PROBE_COUNT = 10
+    PROBE_INTERVAL_SECONDS = 0.5
+    PROBE_TIMEOUT_SECONDS = 2.0
+    # The ping daemon (hosted by scheduler.py) probes each target this often and
+    # writes one summary per target per minute, flushing finished minutes in
+    # batches
+    DAEMON_SAMPLE_INTERVAL_SECONDS = 1.0
+    DAEMON_FLUSH_INTERVAL_SECONDS = 300
+    # Upper bounds of the daemon's per-minute RTT histogram buckets, used to
+    # estimate percentiles. Slower replies share one last bucket
+    RTT_BUCKETS_MS = [1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000]
+
+
+class OnPremConfig:
+    # Local write-ahead spool used by the on-prem scrapers so metrics survive
+    # WAN outages. Oldest batches are dropped once SPOOL_MAX_RECORDS is reached
+    SPOOL_PATH = "~/.home-monitoring/spool.db"
+    SPOOL_MAX_RECORDS = 500_000
+    # Upper bound on how long a run waits to deliver spooled metrics before
+    # exiting. Undelivered metrics are picked up by the next run
+    SPOOL_DRAIN_TIMEOUT_SECONDS = 20
+    # Spooled batches still failing after this many drains (not counting
+    # connectivity errors) are moved to the spool's dead letter table
+    SPOOL_MAX_ATTEMPTS = 10
+    # Oldest dead-lettered batches are dropped once this many records are kept
+    SPOOL_MAX_DEAD_LETTER_RECORDS = 50_000
+    # Last value written per series, for scrapers that set `dedupe_writes`
+    LAST_VALUE_INDEX_PATH = "~/.home-monitoring/last_values.json"
+    # Resident job scheduler (scheduler.py), which replaces cron. Jobs share
+    # its thread pool
+    SCHEDULER_MAX_THREADS = 4
+    SCHEDULER_FLUSH_INTERVAL_SECONDS = 60
+    # The egg detector is packaged as its own Docker image (see egg-detector),
+    # run during daylight hours (UTC)
+    EGG_DETECTOR_DIR = "~/egg-detector"
+    EGG_DETECTOR_HOURS = [*range(14, 24), *range(0, 4)]
+    EGG_DETECTOR_INTERVAL_SECONDS = 5 * 60
+    EGG_DETECTOR_TIMEOUT_SECONDS = 4 * 60
+    EGG_DETECTOR_OUTPUT_DIR = "/var/egg-detector/output"
+    EGG_DETECTOR_OUTPUT_RETENTION_DAYS = 30
@@ -0,0 +1,145 @@
+import argparse
+from dataclasses import dataclass, field
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from home_monitoring.config import ColdStartConfig
+
+
+@dataclass
+class ModuleImport:
+    name: str
+    # time spent importing the module itself, excluding its imports
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class ImportProfile:
+    """Per-module import times of a module imported in a fresh interpreter,
+    as reported by `python -X importtime`"""
+
+    module: str
+    imports: List[ModuleImport] = field(default_factory=list)
+
+    @property
+    def total_ms(self) -> float:
+        for module_import in self.imports:
+            if module_import.name == self.module:
+                return module_import.cumulative_us / 1000
+        raise ValueError(f"{self.module} was not imported")
+
+    def imported(self, package: str) -> bool:
+        return any(
+            i.name == package or i.name.startswith(package + ".") for i in self.imports
+        )
+
+    def slowest(self, count: int = 10) -> List[ModuleImport]:
+        return sorted(self.imports, key=lambda i: i.self_us, reverse=True)[:count]
+
+
+@dataclass
+class BudgetCheck:
+    profile: ImportProfile
+    budget_ms: Optional[float] = None
+    deferred: Sequence[str] = ()
+
+    @property
+    def eagerly_imported(self) -> List[str]:
+        """Deferred packages that were imported anyway"""
+        return [p for p in self.deferred if self.profile.imported(p)]
+
+    @property
+    def passed(self) -> bool:
+        over_budget = self.budget_ms is not None and (
+            self.profile.total_ms > self.budget_ms
+        )
+        return not over_budget and not self.eagerly_imported
+
+    def report(self, top: int = 10) -> str:
+        budget = f" (budget {self.budget_ms:.0f} ms)" if self.budget_ms else ""
+        status = "OK" if self.passed else "FAILED"
+        lines = [
+            f"{status} {self.profile.module}: {self.profile.total_ms:.1f} ms{budget}"
+        ]
+        for package in self.eagerly_imported:
+            lines.append(f"  imports {package}, which should be deferred")
+        for i in self.profile.slowest(top):
+            lines.append(
+                f"  {i.self_us / 1000:8.1f} ms self {i.cumulative_us / 1000:8.1f} ms "
+                f"cumulative  {i.name}"
+            )
+        return "\n".join(lines)
+
+
+def parse_importtime(output: str) -> List[ModuleImport]:
+    """Parses the lines `python -X importtime` writes to stderr, e.g.
+    `import time:       433 |     241065 |   home_monitoring.logger`"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # the header line
+            continue
+        imports.append(ModuleImport(name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def profile_import(
+    module: str, runs: int = 3, env: Optional[Dict[str, str]] = None
+) -> ImportProfile:
+    """Imports the module in `runs` fresh interpreters, like a Lambda cold
+    start, and returns the fastest run's profile to reduce noise"""
+    env = {**os.environ, "ENVIRONMENT": "dev", **(env or {})}
+    profiles = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+        profiles.append(ImportProfile(module, parse_importtime(result.stderr)))
+    return min(profiles, key=lambda p: p.total_ms)
+
+
+def check_budgets(modules: Sequence[str], runs: int = 3) -> List[BudgetCheck]:
+    return [
+        BudgetCheck(
+            profile_import(module, runs),
+            ColdStartConfig.IMPORT_BUDGETS_MS.get(module),
+            ColdStartConfig.DEFERRED_IMPORTS.get(module, ()),
+        )
+        for module in modules
+    ]
+
+
+def main(args: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Reports the cold import time of Lambda handlers, per module, "
+        "and checks it against ColdStartConfig's budgets"
+    )
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=list(ColdStartConfig.IMPORT_BUDGETS_MS),
+        help="modules to profile, by default every Lambda handler",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules shown")
+    parsed = parser.parse_args(args)
+
+    checks = check_budgets(parsed.modules, parsed.runs)
+    for check in checks:
+        print(check.report(parsed.top))
+    return 0 if all(check.passed for check in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,4 +13,4 @@ def lambda_handler(event, context):
     fetcher = AuthTokenFetcher(env=env)
     auth_tokens = fetcher.refresh_tokens(app_name)
     access_token_prefix = auth_tokens.access_token_payload()[:8]
-    logger.info(f"Updated tokens. Access token={access_token_prefix}...")
+    logger.info(f"Current access token={access_token_prefix}...")
@@ -1,26 +1,21 @@
 import os
 
-import arrow
-import boto3
-from jinja2 import Environment, PackageLoader, select_autoescape
-
 from home_monitoring import logger
 from home_monitoring.store.egg_detector_cache import EggDetectorCacheReader
 
 logger = logger.get(__name__)
 
-jinja_env = Environment(
-    loader=PackageLoader("home_monitoring"),
-    autoescape=select_autoescape(),
-)
-
-dynamodb = boto3.resource("dynamodb", region_name="us-west-2")
+# Created on first use rather than at import, to keep cold starts short
+jinja_env = None
+dynamodb = None
 
 
 def lambda_handler(event, context):
+    import arrow
+
     env = os.environ["ENVIRONMENT"]
 
-    cache_reader = EggDetectorCacheReader(dynamodb)
+    cache_reader = EggDetectorCacheReader(get_dynamodb())
     records = cache_reader.read()
 
     total_eggs = sum(map(lambda r: r.egg_count_blob, records))
@@ -33,7 +28,7 @@ def lambda_handler(event, context):
 
     last_updated = arrow.get(records[0].ts).to("US/Pacific")
 
-    results_template = jinja_env.get_template("egg_detector.html")
+    results_template = get_jinja_env().get_template("egg_detector.html")
     html = results_template.render(
         {
             "egg_count": total_eggs,
@@ -50,6 +45,27 @@ def lambda_handler(event, context):
     }
 
 
+def get_dynamodb():
+    global dynamodb
+    if dynamodb is None:
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb", region_name="us-west-2")
+    return dynamodb
+
+
+def get_jinja_env():
+    global jinja_env
+    if jinja_env is None:
+        from jinja2 import Environment, PackageLoader, select_autoescape
+
+        jinja_env = Environment(
+            loader=PackageLoader("home_monitoring"),
+            autoescape=select_autoescape(),
+        )
+    return jinja_env
+
+
 if __name__ == "__main__":
     os.environ["ENVIRONMENT"] = "dev"
     print(lambda_handler(None, None))
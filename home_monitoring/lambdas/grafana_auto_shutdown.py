@@ -1,7 +1,6 @@
 import os
 
 import arrow
-import boto3
 
 from home_monitoring import logger
 from home_monitoring.scrapers import utils
@@ -9,14 +8,16 @@ from home_monitoring.scrapers import utils
 
 logger = logger.get(__name__)
 
-asg_client = boto3.client("autoscaling", region_name="us-west-2")
-ec2_client = boto3.client("ec2", region_name="us-west-2")
+# Created on first use rather than at import, see init_clients()
+asg_client = None
+ec2_client = None
 
 INSTANCE_TTL_SECONDS = 30 * 60
 
 
 def lambda_handler(event, context):
     asg_name = os.environ["ASG_NAME"]
+    init_clients()
 
     logger.info("Checking for long-running Grafana instances...")
     instance = utils.find_first_instance_in_asg(asg_name, asg_client, ec2_client)
@@ -37,5 +38,14 @@ def lambda_handler(event, context):
         logger.info("Grafana EC2 instance is not running")
 
 
+def init_clients():
+    global asg_client, ec2_client
+    if asg_client is None or ec2_client is None:
+        import boto3
+
+        asg_client = asg_client or boto3.client("autoscaling", region_name="us-west-2")
+        ec2_client = ec2_client or boto3.client("ec2", region_name="us-west-2")
+
+
 if __name__ == "__main__":
     lambda_handler(None, None)
@@ -2,11 +2,6 @@ import json
 import time
 import os
 
-import boto3
-from botocore.exceptions import ClientError
-import requests
-from requests.exceptions import RequestException
-
 from home_monitoring import logger, secrets
 from home_monitoring.scrapers import utils
 
@@ -17,8 +12,10 @@ POLLING_INTERVAL_SECONDS = 5
 # The Grafana instance usually initializes in under 2 minutes
 POLLING_DURATION_SECONDS = 25
 
-asg_client = boto3.client("autoscaling", region_name="us-west-2")
-ec2_client = boto3.client("ec2", region_name="us-west-2")
+# Created on first use rather than at import, see init_clients(). Requests
+# with a bad token never pay for them
+asg_client = None
+ec2_client = None
 
 
 def lambda_handler(event, context):
@@ -37,6 +34,7 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": "Authentication error"}),
         }
 
+    init_clients()
     action = params.get("action")
     if action == "start" or action == "stop":
         print("Adjusting ASG size")
@@ -46,7 +44,18 @@ def lambda_handler(event, context):
         return check(event)
 
 
+def init_clients():
+    global asg_client, ec2_client
+    if asg_client is None or ec2_client is None:
+        import boto3
+
+        asg_client = asg_client or boto3.client("autoscaling", region_name="us-west-2")
+        ec2_client = ec2_client or boto3.client("ec2", region_name="us-west-2")
+
+
 def adjust_asg_size(desired_capacity, event):
+    from botocore.exceptions import ClientError
+
     try:
         asg_name = os.environ["ASG_NAME"]
         logger.info(f"Setting {asg_name} desired capacity to {desired_capacity}")
@@ -131,6 +140,9 @@ def get_instance_public_ip(asg_name):
 
 
 def get_grafana_url_if_healthy(public_ip):
+    import requests
+    from requests.exceptions import RequestException
+
     url = f"https://{public_ip}:3000/login"
     logger.info(f"Checking Grafana health at {url}")
     try:
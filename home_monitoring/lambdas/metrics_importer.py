@@ -1,33 +1,253 @@
 import boto3
-import importlib
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
+import time
+from typing import Dict, List
 
 from home_monitoring import logger
-from home_monitoring.scrapers.base_scraper import BaseScraper
+from home_monitoring.config import PipelineConfig
+from home_monitoring.lambdas.warm_cache import WarmCache, is_credential_or_config_error
+from home_monitoring.scrapers.base_scraper import (
+    BackfillableScraper,
+    BaseScraper,
+    load_scraper_class,
+)
+from home_monitoring.store.async_writer import AsyncMetricsWriter
+from home_monitoring.store.last_value import (
+    DedupingMetricsStore,
+    DynamoLastValueIndex,
+    LastValueIndex,
+)
+from home_monitoring.store.metrics_store import MetricsStore
 from home_monitoring.store.timestream import TimestreamMetricsStore
+from home_monitoring.store.watermark import WatermarkingMetricsStore, WatermarkStore
 
 
 logger = logger.get(__name__)
 
+# boto3 clients, state stores and scrapers, reused by warm invocations.
+# Dropped after credential or configuration errors. Scrapers read their access
+# tokens through their expiry-aware token caches on every request, so cached
+# instances never hold on to an expired token
+warm_cache = WarmCache()
+
 
 def lambda_handler(event, context):
+    """Runs the scrapers named by the event and writes their records.
+
+    The event names a single scraper (`scraper_class`), a list of scrapers
+    (`scraper_classes`) or one of PipelineConfig.SCHEDULE_GROUPS
+    (`schedule_group`). Scrapers run concurrently and share one store, so
+    their records are written through the same batched writer"""
     env = os.environ["ENVIRONMENT"]
+    scraper_class_names = get_scraper_class_names(event)
+    run_name = event.get("schedule_group") or ",".join(
+        name.split(".")[-1] for name in scraper_class_names
+    )
 
-    timestream_client = boto3.client("timestream-write", region_name="us-west-2")
     # TODO Pull database name from context
-    store = TimestreamMetricsStore(timestream_client, "home_monitoring")
+    store = TimestreamMetricsStore(get_client("timestream-write"), "home_monitoring")
 
-    scraper_class_name = event["scraper_class"]
-    module_name = ".".join(scraper_class_name.split(".")[:-1])
-    class_name = scraper_class_name.split(".")[-1]
-    module = importlib.import_module(module_name)
-    class_ = getattr(module, class_name)
-    scraper: BaseScraper = class_(env=env)
+    # records are written in the background while scraping continues, and
+    # must be flushed before the invocation returns
+    writer = AsyncMetricsWriter(store)
+    try:
+        failures = run_scrapers(
+            scraper_class_names,
+            env,
+            writer,
+            warm_cache.get("last_value_index", DynamoLastValueIndex),
+            warm_cache.get("watermarks", WatermarkStore),
+            cache=warm_cache,
+        )
+    finally:
+        result = writer.close()
+        if any(
+            is_credential_or_config_error(c.error) for c in result.chunks if c.error
+        ):
+            logger.warning("Dropping cached clients after write errors")
+            warm_cache.invalidate()
+        logger.info(
+            f"Delivered {result.records_ingested} records: "
+            f"{result.records_rejected} rejected, {result.records_failed} failed, "
+            f"{result.records_skipped} skipped"
+        )
+        if PipelineConfig.EMIT_STORE_METRICS:
+            write_store_metrics(store, run_name)
 
-    logger.info(f"Running {class_name}")
-    records = scraper.scrape_metrics()
+    # fail the invocation so Lambda error alarms still fire, after the
+    # healthy scrapers' records were delivered
+    if failures:
+        raise Exception(
+            f"{len(failures)} of {len(scraper_class_names)} scrapers failed: "
+            + "; ".join(f"{name}: {error}" for name, error in failures.items())
+        )
+
+
+def get_scraper_class_names(event: dict) -> List[str]:
+    if "schedule_group" in event:
+        return PipelineConfig.SCHEDULE_GROUPS[event["schedule_group"]]
+    if "scraper_classes" in event:
+        return event["scraper_classes"]
+    return [event["scraper_class"]]
+
+
+def get_client(service_name: str):
+    """A boto3 client, created on first use and reused by warm invocations"""
+    return warm_cache.get(
+        ("client", service_name),
+        lambda: boto3.client(service_name, region_name="us-west-2"),
+    )
 
+
+def write_store_metrics(store: TimestreamMetricsStore, run_name: str) -> None:
+    """Writes the store's pipeline_* metrics for this run, then resets them
+
+    :param run_name: the scraper, or group of scrapers, that wrote them"""
+    records = store.stats.to_metric_records(dimensions=[("scraper", run_name)])
+    store.stats.reset()
     if records:
         store.write_metrics("metrics", records)
+
+
+def run_scrapers(
+    scraper_class_names: List[str],
+    env: str,
+    store: MetricsStore,
+    last_value_index: LastValueIndex = None,
+    watermarks: WatermarkStore = None,
+    cache: WarmCache = None,
+) -> Dict[str, str]:
+    """Runs the scrapers concurrently, writing to a shared store.
+
+    Each scraper is isolated from the others: a scraper that raises, or is
+    still running after its `timeout_seconds`, is reported as failed while
+    the rest complete normally. Timed out scrapers are abandoned and
+    cancelled: they stop between catch-up windows and never write, so they
+    can't move watermarks after being reported as failed
+
+    :param cache: when set, scraper classes and instances are reused from
+        previous runs. Failed scrapers are dropped from it, as is everything
+        else after a credential or configuration error
+    :returns: the error of each failed scraper, by class name"""
+    failures = {}
+    scrapers = {}
+    for scraper_class_name in scraper_class_names:
+        try:
+            scrapers[scraper_class_name] = get_scraper(scraper_class_name, env, cache)
+        except Exception as err:
+            logger.exception(f"Error creating {scraper_class_name}")
+            failures[scraper_class_name] = str(err)
+
+    if not scrapers:
+        return failures
+
+    executor = ThreadPoolExecutor(max_workers=len(scrapers))
+    started = time.monotonic()
+    cancelled = {name: threading.Event() for name in scrapers}
+    futures = {
+        scraper_class_name: executor.submit(
+            write_scraper_metrics,
+            scraper,
+            store,
+            last_value_index,
+            watermarks,
+            cancelled[scraper_class_name],
+        )
+        for scraper_class_name, scraper in scrapers.items()
+    }
+    for scraper_class_name, future in futures.items():
+        timeout_seconds = scrapers[scraper_class_name].timeout_seconds
+        try:
+            future.result(
+                timeout=max(0.0, started + timeout_seconds - time.monotonic())
+            )
+        except TimeoutError:
+            cancelled[scraper_class_name].set()
+            logger.error(f"{scraper_class_name} timed out after {timeout_seconds}s")
+            failures[scraper_class_name] = f"timed out after {timeout_seconds}s"
+        except Exception as err:
+            logger.error(f"{scraper_class_name} failed", exc_info=err)
+            failures[scraper_class_name] = str(err)
+            if cache is not None and is_credential_or_config_error(err):
+                logger.warning("Dropping cached clients after scraper errors")
+                cache.invalidate()
+        if cache is not None and scraper_class_name in failures:
+            # rebuilt next run, e.g. with a fresh access token. Timed out
+            # scrapers may still be running, so can't be reused either
+            cache.invalidate(("scraper", scraper_class_name, env))
+    # don't wait for timed out scrapers
+    executor.shutdown(wait=False)
+
+    return failures
+
+
+def get_scraper(scraper_class_name: str, env: str, cache: WarmCache = None):
+    """Creates the scraper, or reuses the one cached by a previous run"""
+    if cache is None:
+        return load_scraper_class(scraper_class_name)(env=env)
+    scraper_class = cache.get(
+        ("scraper_class", scraper_class_name),
+        lambda: load_scraper_class(scraper_class_name),
+    )
+    return cache.get(
+        ("scraper", scraper_class_name, env), lambda: scraper_class(env=env)
+    )
+
+
+def run_scraper(
+    scraper_class_name: str,
+    env: str,
+    store: MetricsStore,
+    last_value_index: LastValueIndex = None,
+    watermarks: WatermarkStore = None,
+) -> None:
+    """Runs the scraper identified by its fully-qualified class name and writes
+    its records to the store
+
+    :param last_value_index: used to skip unchanged records for scrapers that
+        set `dedupe_writes`
+    :param watermarks: used by scrapers that set `track_watermark` to fetch
+        everything since their previous successful write"""
+    scraper: BaseScraper = load_scraper_class(scraper_class_name)(env=env)
+    write_scraper_metrics(scraper, store, last_value_index, watermarks)
+
+
+def write_scraper_metrics(
+    scraper: BaseScraper,
+    store: MetricsStore,
+    last_value_index: LastValueIndex = None,
+    watermarks: WatermarkStore = None,
+    cancelled: threading.Event = None,
+) -> None:
+    """Runs the scraper and writes its records to the store, see run_scraper
+
+    :param cancelled: when set, e.g. after the scraper timed out, its records
+        are dropped rather than written"""
+    class_name = type(scraper).__name__
+    logger.info(f"Running {class_name}")
+    if (
+        isinstance(scraper, BackfillableScraper)
+        and scraper.track_watermark
+        and watermarks
+    ):
+        watermark_ts = watermarks.get(class_name)
+        records = scraper.scrape_since(watermark_ts, cancelled)
+        store = store.wrap(
+            lambda s: WatermarkingMetricsStore(s, watermarks, class_name, watermark_ts)
+        )
+    else:
+        records = scraper.scrape_metrics()
+
+    if scraper.dedupe_writes and last_value_index:
+        store = store.wrap(lambda s: DedupingMetricsStore(s, last_value_index))
+
+    if cancelled is not None and cancelled.is_set():
+        logger.warning(f"Dropping {len(records)} records of cancelled {class_name}")
+    elif records:
+        store.write_metrics(
+            "metrics", records, multi_measure_name=scraper.multi_measure_name
+        )
     else:
         logger.info(f"No records returned for {class_name}")
@@ -1,6 +1,7 @@
 import boto3
 import os
 from home_monitoring import logger
+from home_monitoring.lambdas.warm_cache import WarmCache, is_credential_or_config_error
 from home_monitoring.monitoring.alarm import AlarmRunner
 from home_monitoring.monitoring import configs
 from home_monitoring.monitoring.timestream_query import TimestreamQueryRunner
@@ -8,22 +9,41 @@ from home_monitoring.monitoring.timestream_query import TimestreamQueryRunner
 
 logger = logger.get(__name__)
 
+# boto3 clients and the alarm runner, reused by warm invocations. Dropped
+# after credential or configuration errors
+warm_cache = WarmCache()
+
 
 def lambda_handler(event, context):
     env = os.environ["ENVIRONMENT"]
     alarm_topic_arn = os.environ["ALARM_TOPIC_ARN"]
     schedule = event["schedule"]
 
-    sns_client = boto3.client("sns", region_name="us-west-2")
-    timestream_client = boto3.client("timestream-query", region_name="us-west-2")
-    runner = AlarmRunner(
-        sns_client=sns_client,
-        sns_topic_arn=alarm_topic_arn,
-        query_runner=TimestreamQueryRunner(timestream_client),
-        env=env,
+    runner = warm_cache.get(
+        ("alarm_runner", env, alarm_topic_arn),
+        lambda: AlarmRunner(
+            sns_client=get_client("sns"),
+            sns_topic_arn=alarm_topic_arn,
+            query_runner=TimestreamQueryRunner(get_client("timestream-query")),
+            env=env,
+        ),
     )
 
-    for conf in (
-        configs.HOURLY_CONFIGS if schedule == "hourly" else configs.DAILY_CONFIGS
-    ):
-        runner.maybe_alarm(conf)
+    try:
+        for conf in (
+            configs.HOURLY_CONFIGS if schedule == "hourly" else configs.DAILY_CONFIGS
+        ):
+            runner.maybe_alarm(conf)
+    except Exception as err:
+        if is_credential_or_config_error(err):
+            logger.warning("Dropping cached clients after credential or config error")
+            warm_cache.invalidate()
+        raise
+
+
+def get_client(service_name: str):
+    """A boto3 client, created on first use and reused by warm invocations"""
+    return warm_cache.get(
+        ("client", service_name),
+        lambda: boto3.client(service_name, region_name="us-west-2"),
+    )
@@ -0,0 +1,77 @@
+import threading
+from typing import Callable, Dict, Hashable, TypeVar, Union
+
+from home_monitoring import logger
+
+logger = logger.get(__name__)
+
+T = TypeVar("T")
+
+# AWS error codes meaning a client's credentials or configuration are bad, so
+# it must be rebuilt rather than reused
+CREDENTIAL_OR_CONFIG_ERROR_CODES = (
+    "ExpiredToken",
+    "ExpiredTokenException",
+    "InvalidClientTokenId",
+    "UnrecognizedClientException",
+    "InvalidSignatureException",
+    "AccessDenied",
+    "AccessDeniedException",
+    "ResourceNotFoundException",
+)
+# botocore exceptions raised before a request is sent
+CREDENTIAL_OR_CONFIG_EXCEPTIONS = (
+    "NoCredentialsError",
+    "PartialCredentialsError",
+    "CredentialRetrievalError",
+    "NoRegionError",
+)
+
+
+class WarmCache:
+    """Values created on first use and kept for the life of the process, so
+    warm Lambda invocations reuse them instead of paying for construction
+    again, e.g. boto3 clients. Values are rebuilt after invalidate()"""
+
+    def __init__(self):
+        self.values: Dict[Hashable, object] = {}
+        # reentrant, as factories may use the cache themselves
+        self.lock = threading.RLock()
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = factory()
+            return self.values[key]
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Drops the given values, or every value if none are given"""
+        with self.lock:
+            if not keys:
+                self.values.clear()
+            for key in keys:
+                self.values.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.values
+
+
+def is_credential_or_config_error(error: Union[BaseException, str]) -> bool:
+    """Whether `error` means cached clients may be unusable, e.g. because
+    their credentials expired.
+
+    :param error: an exception, or an error message such as ChunkResult.error"""
+    if isinstance(error, BaseException):
+        if type(error).__name__ in CREDENTIAL_OR_CONFIG_EXCEPTIONS:
+            return True
+        # botocore ClientErrors, checked by shape so botocore isn't imported
+        response = getattr(error, "response", None)
+        if isinstance(response, dict) and "Error" in response:
+            return response["Error"].get("Code") in CREDENTIAL_OR_CONFIG_ERROR_CODES
+        error = str(error)
+
+    # ClientError messages read "An error occurred (<code>) when calling ..."
+    return any(
+        f"({code})" in error or error == code
+        for code in CREDENTIAL_OR_CONFIG_ERROR_CODES
+    ) or any(name in error for name in CREDENTIAL_OR_CONFIG_EXCEPTIONS)
@@ -1,10 +1,17 @@
 import logging
 
+_configured = False
+
 
 def get(module: str) -> logging.Logger:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s %(levelname)s: %(message)s",
-        force=True,
-    )
+    global _configured
+    if not _configured:
+        # force replaces the handler the Lambda runtime installs. Only done
+        # once, rather than on every module import
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s %(levelname)s: %(message)s",
+            force=True,
+        )
+        _configured = True
     return logging.getLogger(module)
@@ -1,5 +1,6 @@
+from array import array
 from dataclasses import dataclass, field
-from typing import List
+from typing import Iterable, Iterator, List, Tuple, Union
 
 
 @dataclass
@@ -11,3 +12,149 @@ class MetricRecord:
 
     def add_dimension(self, name: str, value: str):
         self.dimensions.append({"Name": name, "Value": value})
+
+
+DimensionSet = Tuple[Tuple[str, str], ...]
+
+
+class MetricBatch:
+    """Compact, columnar container for many metric records.
+
+    Measure names, timestamps and values are held in typed arrays, while measure
+    names and dimension sets are interned and referenced by id, so a scrape that
+    shares one dimension set across thousands of records stores it only once.
+    Iterating a batch yields MetricRecord views, so it can be used wherever a
+    list of MetricRecords is expected."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.dimension_sets: List[DimensionSet] = []
+        self.name_ids = array("I")
+        self.times = array("q")
+        self.values = array("d")
+        self.dimension_set_ids = array("I")
+        self._name_index = {}
+        self._dimension_set_index = {}
+        # materialized Timestream "Dimensions" lists, one per dimension set
+        self._dimension_lists: List[List[dict[str, str]]] = []
+
+    @classmethod
+    def from_records(cls, records: Iterable[MetricRecord]) -> "MetricBatch":
+        batch = cls()
+        batch.extend(records)
+        return batch
+
+    def intern_name(self, name: str) -> int:
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self._name_index[name] = name_id
+        return name_id
+
+    def intern_dimensions(
+        self, dimensions: Union[List[dict[str, str]], DimensionSet, None]
+    ) -> int:
+        """Returns the id of the dimension set, adding it if it's new.
+
+        :param dimensions: either Timestream-style [{"Name": .., "Value": ..}]
+            dicts or a tuple of (name, value) pairs"""
+        if not dimensions:
+            key = ()
+        elif isinstance(dimensions[0], dict):
+            key = tuple((d["Name"], str(d["Value"])) for d in dimensions)
+        else:
+            key = tuple((name, str(value)) for name, value in dimensions)
+
+        dimension_set_id = self._dimension_set_index.get(key)
+        if dimension_set_id is None:
+            dimension_set_id = len(self.dimension_sets)
+            self.dimension_sets.append(key)
+            self._dimension_lists.append(
+                [{"Name": name, "Value": value} for name, value in key]
+            )
+            self._dimension_set_index[key] = dimension_set_id
+        return dimension_set_id
+
+    def append(
+        self,
+        name: str,
+        time: int,
+        value: float,
+        dimensions: Union[List[dict[str, str]], DimensionSet, None] = None,
+        dimension_set_id: int = None,
+    ) -> None:
+        """Appends a single data point. Pass `dimension_set_id` (from
+        intern_dimensions) to avoid re-hashing a shared dimension set"""
+        if dimension_set_id is None:
+            dimension_set_id = self.intern_dimensions(dimensions)
+        self.name_ids.append(self.intern_name(name))
+        self.times.append(int(time))
+        self.values.append(float(value))
+        self.dimension_set_ids.append(dimension_set_id)
+
+    def extend(self, records: Iterable[MetricRecord]) -> None:
+        if isinstance(records, MetricBatch):
+            for i in range(len(records)):
+                self.append(
+                    records.names[records.name_ids[i]],
+                    records.times[i],
+                    records.values[i],
+                    records.dimension_sets[records.dimension_set_ids[i]],
+                )
+        else:
+            for record in records:
+                self.append(record.name, record.time, record.value, record.dimensions)
+
+    def dimensions(self, index: int) -> List[dict[str, str]]:
+        """The (shared) Timestream dimensions list of the record at `index`"""
+        return self._dimension_lists[self.dimension_set_ids[index]]
+
+    def to_timestream_records(self, start: int = 0, stop: int = None) -> Iterator[dict]:
+        """Lazily builds Timestream WriteRecords payloads for records in
+        [start, stop). Dimension lists are shared between records of a set"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self.to_timestream_record(i)
+
+    def to_timestream_record(self, index: int) -> dict:
+        return {
+            "Dimensions": self._dimension_lists[self.dimension_set_ids[index]],
+            "MeasureName": self.names[self.name_ids[index]],
+            "MeasureValue": str(self.values[index]),
+            "MeasureValueType": "DOUBLE",
+            "Time": str(self.times[index]),
+            "TimeUnit": "SECONDS",
+        }
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, index: int) -> MetricRecord:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MetricBatch index out of range")
+        return MetricRecord(
+            self.names[self.name_ids[index]],
+            self.times[index],
+            self.values[index],
+            list(self.dimensions(index)),
+        )
+
+    def __iter__(self) -> Iterator[MetricRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return (
+            f"MetricBatch(records={len(self)}, names={self.names}, "
+            f"dimension_sets={len(self.dimension_sets)})"
+        )
+
+
+# Scrapers and stores accept either representation
+Metrics = Union[List[MetricRecord], MetricBatch]
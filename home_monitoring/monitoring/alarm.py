@@ -1,18 +1,19 @@
-from typing import Dict, List
-
-from botocore.client import BaseClient
+from typing import TYPE_CHECKING, Dict, List
 
 from home_monitoring import logger
 from home_monitoring.monitoring.timestream_query import TimestreamQueryRunner
 from home_monitoring.monitoring.configs import MonitoringConfig
 
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
 logger = logger.get(__name__)
 
 
 class AlarmRunner:
     def __init__(
         self,
-        sns_client: BaseClient,
+        sns_client: "BaseClient",
         sns_topic_arn: str,
         query_runner: TimestreamQueryRunner,
         env: str,
@@ -1,16 +1,18 @@
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List
 
 import arrow
-from botocore.client import BaseClient
 
 from home_monitoring import logger
 from home_monitoring.monitoring.configs import MonitoringConfig
 
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
 logger = logger.get(__name__)
 
 
 class TimestreamQueryRunner:
-    def __init__(self, timestream_client: BaseClient):
+    def __init__(self, timestream_client: "BaseClient"):
         self.client = timestream_client
 
     def query_for_config(self, config: MonitoringConfig) -> List[Dict]:
@@ -0,0 +1,249 @@
+import asyncio
+import bisect
+import math
+import signal
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from home_monitoring import logger
+from home_monitoring.config import PingConfig
+from home_monitoring.models.metrics import MetricBatch
+from home_monitoring.scrapers.ping import append_ping_stats
+from home_monitoring.scrapers.probes import ProbeSession, ProbeTarget
+from home_monitoring.store.metrics_store import MetricsStore
+
+logger = logger.get(__name__)
+
+MINUTE = 60
+# (minute timestamp, target, kind of probe sent)
+HistogramKey = Tuple[int, ProbeTarget, str]
+
+
+class RttHistogram:
+    """Summary of a minute of probes to one target. RTTs are counted in fixed
+    buckets, from which percentiles are estimated, alongside the exact min,
+    max and mean, jitter and loss"""
+
+    def __init__(self, bounds_ms: Sequence[float]):
+        self.bounds_ms = bounds_ms
+        # counts[i] holds RTTs in (bounds_ms[i - 1], bounds_ms[i]], the last
+        # bucket those above bounds_ms[-1]
+        self.counts = [0] * (len(bounds_ms) + 1)
+        self.sent = 0
+        self.received = 0
+        self.total_ms = 0.0
+        self.min_ms = math.inf
+        self.max_ms = 0.0
+        self.jitter_total_ms = 0.0
+        self.last_rtt_ms = None
+
+    def add(self, rtt_ms: Optional[float]) -> None:
+        """:param rtt_ms: None for a lost probe"""
+        self.sent += 1
+        if rtt_ms is None:
+            return
+
+        self.received += 1
+        self.counts[bisect.bisect_left(self.bounds_ms, rtt_ms)] += 1
+        self.total_ms += rtt_ms
+        self.min_ms = min(self.min_ms, rtt_ms)
+        self.max_ms = max(self.max_ms, rtt_ms)
+        if self.last_rtt_ms is not None:
+            self.jitter_total_ms += abs(rtt_ms - self.last_rtt_ms)
+        self.last_rtt_ms = rtt_ms
+
+    def percentile(self, q: float) -> float:
+        """Estimates the q-th percentile (0-100), interpolating linearly
+        within the bucket it falls in"""
+        rank = q / 100 * self.received
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = max(self.bounds_ms[i - 1] if i else 0.0, self.min_ms)
+                upper = self.max_ms
+                if i < len(self.bounds_ms):
+                    upper = min(self.bounds_ms[i], upper)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max_ms
+
+    def stats(self) -> Dict[str, float]:
+        """The same stats as ProbeResult.stats, with estimated percentiles"""
+        stats = {"packet_loss_pct": 100.0 * (self.sent - self.received) / self.sent}
+        if not self.received:
+            return stats
+
+        stats.update(
+            {
+                "min": self.min_ms,
+                "avg": self.total_ms / self.received,
+                "max": self.max_ms,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "p99": self.percentile(99),
+                "jitter": (
+                    self.jitter_total_ms / (self.received - 1)
+                    if self.received > 1
+                    else 0.0
+                ),
+            }
+        )
+        return stats
+
+
+class PingDaemon:
+    """Long-running alternative to the cron-driven PingScraper. Probes each
+    target every `sample_interval_seconds`, summarizes the samples into a
+    histogram per target per minute, and writes finished minutes to the store
+    every `flush_interval_seconds`, so short outages between cron runs are
+    caught without paying interpreter startup on every run"""
+
+    def __init__(
+        self,
+        store: MetricsStore,
+        targets: Optional[List[ProbeTarget]] = None,
+        sample_interval_seconds: float = PingConfig.DAEMON_SAMPLE_INTERVAL_SECONDS,
+        timeout_seconds: float = PingConfig.PROBE_TIMEOUT_SECONDS,
+        flush_interval_seconds: float = PingConfig.DAEMON_FLUSH_INTERVAL_SECONDS,
+        buckets_ms: Sequence[float] = PingConfig.RTT_BUCKETS_MS,
+        table_name: str = "metrics",
+    ):
+        self.store = store
+        self.targets = targets or [ProbeTarget(**t) for t in PingConfig.TARGETS]
+        self.sample_interval_seconds = sample_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.buckets_ms = buckets_ms
+        self.table_name = table_name
+        # only touched from the event loop's thread
+        self.histograms: Dict[HistogramKey, RttHistogram] = {}
+        self._loop = None
+        self._stopped = None
+        self._stop_requested = False
+
+    def run(self) -> None:
+        """Runs until SIGINT or SIGTERM, then flushes everything sampled"""
+        asyncio.run(self.run_async(handle_signals=True))
+
+    def stop(self) -> None:
+        """Stops the daemon. Safe to call from any thread, before or while
+        it's running"""
+        self._stop_requested = True
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stopped.set)
+            except RuntimeError:
+                # already finished
+                pass
+
+    async def run_async(self, handle_signals: bool = False) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self._stop_requested:
+            self._stopped.set()
+        if handle_signals:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(signum, self._stopped.set)
+
+        logger.info(
+            f"Probing {len(self.targets)} targets every "
+            f"{self.sample_interval_seconds}s"
+        )
+        samplers = [
+            asyncio.create_task(self._sample(target)) for target in self.targets
+        ]
+        try:
+            while not self._stopped.is_set():
+                try:
+                    await asyncio.wait_for(
+                        self._stopped.wait(), self.flush_interval_seconds
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                await self._flush(self.take_finished(time.time()))
+        finally:
+            for sampler in samplers:
+                sampler.cancel()
+            await asyncio.gather(*samplers, return_exceptions=True)
+            # partial minutes too, rather than losing them
+            await self._flush(self.take_finished(None))
+
+    def record(
+        self, ts: float, target: ProbeTarget, kind: str, rtt_ms: Optional[float]
+    ) -> None:
+        """Adds the sample of a probe sent at `ts` to its minute's histogram"""
+        key = (int(ts) // MINUTE * MINUTE, target, kind)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = RttHistogram(self.buckets_ms)
+        histogram.add(rtt_ms)
+
+    def take_finished(self, now: Optional[float]) -> MetricBatch:
+        """Removes and returns the records of minutes whose probes have all
+        completed by `now`, or of every minute if `now` is None"""
+        records = MetricBatch()
+        for key in sorted(self.histograms, key=lambda k: (k[0], k[1].name)):
+            minute_ts, target, kind = key
+            if now is not None and minute_ts + MINUTE + self.timeout_seconds > now:
+                continue
+            stats = self.histograms.pop(key).stats()
+            append_ping_stats(records, target.name, kind, stats, minute_ts)
+        return records
+
+    async def _flush(self, records: MetricBatch) -> None:
+        if not records:
+            return
+        try:
+            # the store may block, e.g. on fsync, so keep it off the loop
+            result = await self._loop.run_in_executor(
+                None,
+                lambda: self.store.write_metrics(
+                    self.table_name,
+                    records,
+                    multi_measure_name=PingConfig.MULTI_MEASURE_NAME,
+                ),
+            )
+        except Exception as err:
+            logger.error(f"Dropping {len(records)} ping records: {err}")
+            return
+        if result.records_failed:
+            logger.error(f"Failed to write {result.records_failed} ping records")
+
+    async def _sample(self, target: ProbeTarget) -> None:
+        session = None
+        resolve_failed = False
+        in_flight = set()
+        next_at = self._loop.time()
+        try:
+            while True:
+                if session is None:
+                    try:
+                        session = await ProbeSession.open(target, self.timeout_seconds)
+                    except OSError as err:
+                        if not resolve_failed:
+                            logger.warning(f"Could not resolve {target.host}: {err}")
+                        resolve_failed = True
+                if session is None:
+                    # likely an outage in itself, so counted as a lost probe
+                    self.record(time.time(), target, target.kind, None)
+                else:
+                    task = asyncio.create_task(self._probe(session))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+
+                next_at += self.sample_interval_seconds
+                if next_at < self._loop.time():
+                    # fell behind, e.g. the machine was suspended
+                    next_at = self._loop.time()
+                await asyncio.sleep(next_at - self._loop.time())
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            if session is not None:
+                session.close()
+
+    async def _probe(self, session: ProbeSession) -> None:
+        sent_at = time.time()
+        rtt_ms = await session.probe()
+        self.record(sent_at, session.target, session.kind, rtt_ms)
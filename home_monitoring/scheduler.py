@@ -0,0 +1,196 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import functools
+import math
+import os
+import random
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Tuple
+
+from home_monitoring import logger
+from home_monitoring.config import OnPremConfig
+from home_monitoring.models.metrics import MetricBatch
+from home_monitoring.store.metrics_store import MetricsStore
+
+logger = logger.get(__name__)
+
+
+@dataclass
+class Job:
+    name: str
+    # Called without arguments, in the scheduler's thread pool. Heavy work,
+    # e.g. the egg detector, runs as its own process (see run_command)
+    func: Callable[[], None]
+    # Runs are due at multiples of the interval since the epoch, e.g. on the
+    # hour for an hourly job, like cron
+    interval_seconds: float
+    # Each run starts up to this many seconds after it's due, at random, so
+    # jobs sharing an interval don't all start at once
+    jitter_seconds: float = 0
+    # Runs due while this many are still running are skipped, so a slow run
+    # never overlaps the next one
+    max_instances: int = 1
+    # When set, runs only start during these hours (UTC)
+    hours: Optional[Collection[int]] = None
+
+
+class _JobState:
+    def __init__(self, job: Job):
+        self.job = job
+        self.running = 0
+        self.due_at = None
+        self.start_at = None
+
+    def schedule(self, now: float) -> None:
+        """Schedules the first run due after `now`, skipping any missed"""
+        interval = self.job.interval_seconds
+        if self.due_at is None:
+            self.due_at = math.ceil(now / interval) * interval
+        else:
+            self.due_at += interval
+            if self.due_at <= now:
+                self.due_at += math.ceil((now - self.due_at) / interval) * interval
+        self.start_at = self.due_at + random.uniform(0, self.job.jitter_seconds)
+
+
+def _run_timed(func: Callable[[], None]) -> Tuple[float, float, Optional[str]]:
+    """Runs a job, in a worker thread.
+
+    :returns: when it started, its duration in seconds and its error, if any"""
+    started = time.time()
+    error = None
+    try:
+        func()
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+    return started, time.time() - started, error
+
+
+def run_command(args: Sequence[str], cwd: str = None, timeout_seconds: float = None):
+    """Job function running an external program, e.g. one packaged in its own
+    container"""
+    cwd = os.path.expanduser(cwd) if cwd else None
+    subprocess.run(args, cwd=cwd, timeout=timeout_seconds, check=True)
+
+
+class Scheduler:
+    """Resident replacement for cron. Starts due jobs with jitter, skips runs
+    that would overlap a still running one, bounds concurrency with its thread
+    pool, and writes each run's job_duration_seconds and
+    job_lateness_seconds (start time minus planned start time) to the store"""
+
+    def __init__(
+        self,
+        jobs: List[Job],
+        store: MetricsStore = None,
+        max_threads: int = OnPremConfig.SCHEDULER_MAX_THREADS,
+        flush_interval_seconds: float = OnPremConfig.SCHEDULER_FLUSH_INTERVAL_SECONDS,
+        tick_seconds: float = 1,
+        table_name: str = "metrics",
+    ):
+        self.states: Dict[str, _JobState] = {job.name: _JobState(job) for job in jobs}
+        self.store = store
+        self.flush_interval_seconds = flush_interval_seconds
+        self.tick_seconds = tick_seconds
+        self.table_name = table_name
+
+        self.thread_pool = ThreadPoolExecutor(max_threads, thread_name_prefix="job")
+
+        self.lock = threading.Lock()
+        self.records = MetricBatch()
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Runs jobs until SIGINT or SIGTERM, then waits for running jobs"""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stop())
+
+        logger.info(f"Scheduling {', '.join(self.states)}")
+        last_flush = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                self.tick(time.time())
+                if time.monotonic() - last_flush >= self.flush_interval_seconds:
+                    self.flush()
+                    last_flush = time.monotonic()
+                self._stop.wait(self.tick_seconds)
+        finally:
+            self.shutdown()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def tick(self, now: float) -> List[Future]:
+        """Starts the runs that are due at `now`"""
+        futures = []
+        for state in self.states.values():
+            if state.due_at is None:
+                state.schedule(now)
+            if now < state.start_at:
+                continue
+
+            job, planned_at = state.job, state.start_at
+            state.schedule(now)
+            if (
+                job.hours is not None
+                and time.gmtime(planned_at).tm_hour not in job.hours
+            ):
+                continue
+            with self.lock:
+                if state.running >= job.max_instances:
+                    logger.warning(f"Skipping {job.name}, still running")
+                    continue
+                state.running += 1
+
+            future = self.thread_pool.submit(_run_timed, job.func)
+            future.add_done_callback(
+                functools.partial(self._on_done, state, planned_at)
+            )
+            futures.append(future)
+        return futures
+
+    def flush(self) -> None:
+        with self.lock:
+            records, self.records = self.records, MetricBatch()
+        if not records or self.store is None:
+            return
+        try:
+            self.store.write_metrics(self.table_name, records)
+        except Exception as err:
+            logger.error(f"Failed to write job metrics: {err}")
+
+    def shutdown(self) -> None:
+        self.thread_pool.shutdown(wait=True)
+        self.flush()
+
+    def _on_done(self, state: _JobState, planned_at: float, future: Future) -> None:
+        with self.lock:
+            state.running -= 1
+        name = state.job.name
+        try:
+            started, duration, error = future.result()
+        except Exception as err:
+            # e.g. the run was cancelled at shutdown
+            logger.error(f"Job {name} could not run: {err}")
+            return
+
+        if error:
+            logger.error(f"Job {name} failed: {error}")
+        else:
+            logger.info(f"Job {name} finished in {duration:.1f}s")
+
+        lateness = max(0.0, started - planned_at)
+        with self.lock:
+            dimension_set_id = self.records.intern_dimensions(
+                [("location", "primary_residence"), ("job", name)]
+            )
+            ts = int(started)
+            self.records.append(
+                "job_duration_seconds", ts, duration, dimension_set_id=dimension_set_id
+            )
+            self.records.append(
+                "job_lateness_seconds", ts, lateness, dimension_set_id=dimension_set_id
+            )
@@ -1,15 +1,15 @@
 import base64
 from dataclasses import dataclass
 import sys
+from typing import Dict, Optional
 
 import arrow
 import boto3
-from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
-import requests
 
 from home_monitoring import logger, secrets
-from home_monitoring.config import EnphaseConfig
+from home_monitoring.config import AUTH_TOKENS_TABLE_NAME, EnphaseConfig
+from home_monitoring.scrapers.http import get_client
 
 logger = logger.get(__name__)
 
@@ -25,6 +25,12 @@ class AuthTokens:
         return self.access_token.split(".")[1]
 
 
+# auth tokens table by env and access tokens by app name, shared across
+# instances in a warm process
+_tables = {}
+_access_tokens: Dict[str, AuthTokens] = {}
+
+
 class AuthTokenFetcher:
     def __init__(self, env="prod"):
         self.env = env
@@ -41,34 +47,74 @@ class AuthTokenFetcher:
         raise NotImplementedError("homeowner_authorization is not implemented yet")
 
     def get_access_token(self, app_name: str) -> str:
-        """Loads the latest access token from the database
+        """Returns the latest access token, from memory if the cached copy
+        hasn't expired, otherwise from the database
+
+        :param app_name: the Enphase app name"""
+        auth_tokens = _access_tokens.get(app_name)
+        if (
+            auth_tokens is None
+            or auth_tokens.expiration_ts <= arrow.now().int_timestamp
+        ):
+            auth_tokens = self.get_auth_tokens(app_name)
+            if auth_tokens is None:
+                raise Exception(f"No access token found for app={app_name}")
+            if auth_tokens.expiration_ts <= arrow.now().int_timestamp:
+                logger.warning(
+                    f"Stored access token for app={app_name} expired at "
+                    f"{arrow.get(auth_tokens.expiration_ts)}"
+                )
+            else:
+                _access_tokens[app_name] = auth_tokens
+        return auth_tokens.access_token
+
+    def invalidate(self, app_name: str) -> None:
+        """Drops the in-memory copy of the access token, e.g. after the vendor
+        rejected it, so the next get_access_token() reads the stored one
+
+        :param app_name: the Enphase app name"""
+        _access_tokens.pop(app_name, None)
+
+    def get_auth_tokens(self, app_name: str) -> Optional[AuthTokens]:
+        """Loads the stored tokens with a strongly consistent read
 
         :param app_name: the Enphase app name"""
         table = self._get_dynamo_table()
-        result = table.query(KeyConditionExpression=Key("app_name").eq(app_name))
-        items = result["Items"]
-        if not items:
-            raise Exception(f"No access token found for app={app_name}")
-        else:
-            return items[0]["access_token"]
+        item = table.get_item(Key={"app_name": app_name}, ConsistentRead=True).get(
+            "Item"
+        )
+        if not item:
+            return None
+        return AuthTokens(
+            token_type=item.get("token_type"),
+            access_token=item["access_token"],
+            refresh_token=item.get("refresh_token"),
+            # tokens stored before expiry tracking are treated as expired
+            expiration_ts=int(item.get("expiration_ts", 0)),
+        )
 
     def refresh_tokens(
-        self, app_name, grant_type="refresh_token", authorization_code=None
+        self,
+        app_name,
+        grant_type="refresh_token",
+        authorization_code=None,
+        force=False,
     ) -> AuthTokens:
-        """Refreshes access/refresh tokens and stores them in the database.
+        """Refreshes access/refresh tokens and stores them in the database, if
+        the stored tokens expire within EnphaseConfig.TOKEN_REFRESH_WINDOW_SECONDS.
 
         :param app_name: The Enphcase app name
         :param grant_type: the OAuth grant type
         :param authorization_code: The authorization code granted by the homeowner.
-            Only required if refresh token has expired."""
+            Only required if refresh token has expired.
+        :param force: refresh regardless of the stored expiration time
+        :returns: the new tokens, or the stored ones if no refresh was due"""
         refresh_token = None
         if grant_type == "refresh_token":
             # get existing tokens
-            table = self._get_dynamo_table()
-            result = table.query(KeyConditionExpression=Key("app_name").eq(app_name))
-            items = result["Items"]
+            auth_tokens = self.get_auth_tokens(app_name)
 
-            if not items:
+            if auth_tokens is None:
                 # use bootstrap refresh token
                 refresh_token = (
                     secrets.ENPHASE_PROD_BOOTSTRAP_REFRESH_TOKEN
@@ -76,29 +122,42 @@ class AuthTokenFetcher:
                     else secrets.ENPHASE_DEV_BOOTSTRAP_REFRESH_TOKEN
                 )
             else:
-                # The token expires every 24 hours, so we just always refresh
-                item = items[0]
-                refresh_token = item["refresh_token"]
+                refresh_at = (
+                    auth_tokens.expiration_ts
+                    - EnphaseConfig.TOKEN_REFRESH_WINDOW_SECONDS
+                )
+                if not force and arrow.now().int_timestamp < refresh_at:
+                    logger.info(
+                        f"Tokens for app={app_name} expire at "
+                        f"{arrow.get(auth_tokens.expiration_ts)}, not refreshing"
+                    )
+                    return auth_tokens
+                refresh_token = auth_tokens.refresh_token
 
         auth_tokens = self._enphase_token_refresh(
             grant_type, refresh_token, authorization_code
         )
         self._upsert_auth_tokens(app_name, auth_tokens)
+        _access_tokens[app_name] = auth_tokens
         return auth_tokens
 
     def _get_dynamo_table(self):
-        # hack to write to prod table from laptop (see __main__ function below)
-        import platform
-
-        if platform.system() == "Darwin" and self.env == "prod":
-            session = boto3.Session(profile_name="home-monitoring-prod")
-        else:
-            session = boto3.Session()
+        # one table resource per process, reused across warm invocations
+        table = _tables.get(self.env)
+        if table is None:
+            # hack to write to prod table from laptop (see __main__ function below)
+            import platform
+
+            if platform.system() == "Darwin" and self.env == "prod":
+                session = boto3.Session(profile_name="home-monitoring-prod")
+            else:
+                session = boto3.Session()
 
-        resource = session.resource("dynamodb", region_name="us-west-2")
-        table_name = "home_monitoring_auth_tokens"
+            resource = session.resource("dynamodb", region_name="us-west-2")
+            table = resource.Table(AUTH_TOKENS_TABLE_NAME)
+            _tables[self.env] = table
 
-        return resource.Table(table_name)
+        return table
 
     def _enphase_token_refresh(
         self, grant_type: str, refresh_token: str = None, authorization_code: str = None
@@ -119,7 +178,7 @@ class AuthTokenFetcher:
         headers = {"Authorization": f"Basic {authz_encoded}"}
 
         now = arrow.now("US/Pacific")
-        response = requests.post(
+        response = get_client(EnphaseConfig.ENPHASE_BASE_URL).post(
             f"{EnphaseConfig.ENPHASE_BASE_URL}/oauth/token",
             params=params,
             headers=headers,
@@ -146,7 +205,7 @@ class AuthTokenFetcher:
         try:
             table = self._get_dynamo_table()
             response = table.update_item(
-                Key={"app_name": "enphase"},
+                Key={"app_name": app_name},
                 UpdateExpression="SET access_token = :val1,"
                 "refresh_token = :val2, "
                 "expiration_ts = :val3,"
@@ -161,9 +220,8 @@ class AuthTokenFetcher:
             )
         except ClientError as err:
             logger.error(
-                f"Couldn't update auth tokens for {app_name}",
-                err.response["Error"]["Code"],
-                err.response["Error"]["Message"],
+                f"Couldn't update auth tokens for {app_name}: "
+                f"{err.response['Error']['Code']} {err.response['Error']['Message']}"
             )
             raise
         else:
@@ -190,7 +248,7 @@ if __name__ == "__main__":
     print(
         "  NOTE: Before proceeding, please disable EventBridge triggers for the"
         " following lambda functions: "
-        "home_monitoring_scraper_enphase, home_monitoring_auth"
+        "home_monitoring_scraper_hourly, home_monitoring_auth"
     )
 
     fetcher = AuthTokenFetcher(env)
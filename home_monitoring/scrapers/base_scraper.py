@@ -1,13 +1,108 @@
 from abc import ABC, abstractmethod
-from home_monitoring.store.metrics_store import MetricRecord
-from typing import List
+import importlib
+import threading
+from typing import Optional, Type
+
+import arrow
+
+from home_monitoring import logger
+from home_monitoring.config import PipelineConfig
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.scrapers.utils import split_windows
+
+logger = logger.get(__name__)
 
 
 class BaseScraper(ABC):
+    # When set, records sharing a timestamp and dimensions are written as a
+    # single Timestream MULTI measure record with this measure name
+    multi_measure_name: Optional[str] = None
+    # When set, records whose time and value match the last value written for
+    # their series are skipped (see home_monitoring.store.last_value)
+    dedupe_writes: bool = False
+    # Runs that take longer are reported as failed by the multi-scraper
+    # runner (see metrics_importer.run_scrapers)
+    timeout_seconds: float = PipelineConfig.SCRAPER_TIMEOUT_SECONDS
+
     def __init__(self, env: str = "prod"):
         self.env = env
         self.access_token = None
 
     @abstractmethod
-    def scrape_metrics(self) -> List[MetricRecord]:
+    def scrape_metrics(self) -> Metrics:
         pass
+
+
+class BackfillableScraper(BaseScraper):
+    """Scraper that can fetch historical data, so it can be backfilled (see
+    home_monitoring.backfill) and track watermarks"""
+
+    # Longest time range a single scrape_window() call may cover
+    backfill_window_seconds: int
+    # Upper bound on vendor API calls made while backfilling
+    backfill_requests_per_minute: float = 60
+    # When set, runs fetch everything after the last timestamp written by a
+    # previous run (see scrape_since) instead of a fixed hour, so missed runs
+    # heal on the next run
+    track_watermark: bool = False
+    # Longer gaps are truncated to this and need a backfill
+    max_catch_up_seconds: int = 7 * 24 * 60 * 60
+
+    @abstractmethod
+    def scrape_window(self, since: arrow.Arrow, until: arrow.Arrow) -> Metrics:
+        """Scrapes the records timestamped in [since, until). The range is at
+        most `backfill_window_seconds` long and is fetched with a single API
+        call"""
+        pass
+
+    def scrape_since(
+        self, watermark_ts: Optional[int], cancelled: threading.Event = None
+    ) -> Metrics:
+        """Scrapes everything after `watermark_ts`, the last timestamp written
+        by a previous run, up to catch_up_until(). Uses as few scrape_window()
+        calls as the vendor allows, i.e. a single call in the common case.
+
+        :param watermark_ts: None on the first run, in which case this is
+            scrape_metrics()
+        :param cancelled: when set, stops before the next scrape_window() call
+            and returns the windows scraped so far"""
+        if watermark_ts is None:
+            return self.scrape_metrics()
+
+        since_ts = watermark_ts + 1
+        until_ts = self.catch_up_until().int_timestamp
+        if until_ts - since_ts > self.max_catch_up_seconds:
+            logger.warning(
+                f"{type(self).__name__} is {until_ts - since_ts}s behind, only "
+                f"catching up on the last {self.max_catch_up_seconds}s. Backfill "
+                f"the rest with home_monitoring.backfill"
+            )
+            since_ts = until_ts - self.max_catch_up_seconds
+
+        records = MetricBatch()
+        windows = split_windows(
+            since_ts, until_ts, self.backfill_window_seconds, align=False
+        )
+        for window_since_ts, window_until_ts in windows:
+            if cancelled is not None and cancelled.is_set():
+                logger.warning(f"{type(self).__name__} was cancelled")
+                break
+            records.extend(
+                self.scrape_window(
+                    arrow.get(window_since_ts), arrow.get(window_until_ts)
+                )
+            )
+        return records
+
+    def catch_up_until(self) -> arrow.Arrow:
+        """End of the range scrape_since() fetches. Scrapers whose latest data
+        is still changing (e.g. an hourly bucket) stop before it"""
+        return arrow.utcnow()
+
+
+def load_scraper_class(scraper_class_name: str) -> Type[BaseScraper]:
+    """Imports a scraper by its fully-qualified class name, e.g.
+    home_monitoring.scrapers.flume.FlumeScraper"""
+    module_name, _, class_name = scraper_class_name.rpartition(".")
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)
@@ -1,16 +1,21 @@
 from typing import List
 
+import arrow
 import requests
 
 from home_monitoring import logger, secrets
 from home_monitoring.config import EcowittConfig
 from home_monitoring.models.metrics import MetricRecord
-from home_monitoring.scrapers.base_scraper import BaseScraper
+from home_monitoring.scrapers.base_scraper import BackfillableScraper
+from home_monitoring.scrapers.http import get_client
 
 logger = logger.get(__name__)
 
 
-class EcowittScraper(BaseScraper):
+class EcowittScraper(BackfillableScraper):
+    backfill_window_seconds = EcowittConfig.BACKFILL_WINDOW_SECONDS
+    backfill_requests_per_minute = EcowittConfig.BACKFILL_REQUESTS_PER_MINUTE
+
     def scrape_metrics(self) -> List[MetricRecord]:
         response_json = self.scrape_ecowitt_metrics()
         if response_json["msg"] != "success":
@@ -41,6 +46,67 @@ class EcowittScraper(BaseScraper):
             logger.error(f"Response: {response_json}")
             raise e
 
+    def scrape_window(
+        self, since: arrow.Arrow, until: arrow.Arrow
+    ) -> List[MetricRecord]:
+        response_json = self.scrape_ecowitt_history(since, until)
+        if response_json["msg"] != "success":
+            logger.error(f"Response: {response_json}")
+            raise Exception("Error fetching history from Ecowitt")
+        return self.process_history_response(
+            response_json, since.int_timestamp, until.int_timestamp
+        )
+
+    def process_history_response(
+        self, response_json: dict, since_ts: int, until_ts: int
+    ) -> List[MetricRecord]:
+        try:
+            data = response_json["data"]
+            # empty history is returned as an empty list rather than a dict
+            if not data:
+                return []
+
+            series = [("temperature", "indoors", data["indoor"]["temperature"])]
+            for key, name in EcowittConfig.SOIL_SENSOR_NAMES.items():
+                if key in data:
+                    series.append(("soil_moisture", name, data[key]["soilmoisture"]))
+
+            records = []
+            for metric_name, location, history in series:
+                for ts, value in history["list"].items():
+                    if since_ts <= int(ts) < until_ts:
+                        records.append(
+                            self.build_record(
+                                metric_name, location, {"time": ts, "value": value}
+                            )
+                        )
+            return records
+        except Exception as e:
+            logger.error(f"Response: {response_json}")
+            raise e
+
+    def scrape_ecowitt_history(self, since: arrow.Arrow, until: arrow.Arrow) -> dict:
+        # dates are inclusive and in the station's timezone
+        format_str = "YYYY-MM-DD HH:mm:ss"
+        call_back = ["indoor.temperature"] + [
+            f"{key}.soilmoisture" for key in EcowittConfig.SOIL_SENSOR_NAMES
+        ]
+        response = self.make_ecowitt_request(
+            "/device/history",
+            params={
+                "mac": EcowittConfig.ECOWITT_MAC_ADDRESS,
+                "start_date": since.to(EcowittConfig.HISTORY_TIMEZONE).format(
+                    format_str
+                ),
+                "end_date": until.shift(seconds=-1)
+                .to(EcowittConfig.HISTORY_TIMEZONE)
+                .format(format_str),
+                "cycle_type": EcowittConfig.HISTORY_CYCLE_TYPE,
+                "call_back": ",".join(call_back),
+            },
+        )
+        return response.json()
+
     def scrape_ecowitt_metrics(self) -> dict:
         response = self.make_ecowitt_request(
             "/device/real_time",
@@ -57,7 +123,7 @@ class EcowittScraper(BaseScraper):
         all_params["application_key"] = secrets.ECOWITT_APP_KEY
         all_params["api_key"] = secrets.ECOWITT_API_KEY
 
-        return requests.get(url, params=all_params)
+        return get_client(EcowittConfig.ECOWITT_BASE_URL).get(url, params=all_params)
 
     def build_record(self, metric_name: str, location: str, data: dict) -> MetricRecord:
         record = MetricRecord(metric_name, int(data["time"]), float(data["value"]))
@@ -1,50 +1,209 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import time
+from typing import Callable, Dict, List, Tuple, Union
 
+import arrow
 import requests
 
 from home_monitoring import logger, secrets
 from home_monitoring.config import EnphaseConfig
-from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.models.metrics import MetricBatch
 from home_monitoring.scrapers.auth_token_fetcher import AuthTokenFetcher
-from home_monitoring.scrapers.base_scraper import BaseScraper
+from home_monitoring.scrapers.base_scraper import BackfillableScraper
+from home_monitoring.scrapers.http import get_client
 from home_monitoring.scrapers.utils import get_previous_hour_dt
+from home_monitoring.store.retry import TokenBucket
 
 logger = logger.get(__name__)
 
+SYSTEM_PATH = f"/api/v4/systems/{EnphaseConfig.ENPHASE_SYSTEM_ID}"
+LOCATION_DIMENSION = {"Name": "location", "Value": "primary_residence"}
 
-class EnphaseScraper(BaseScraper):
-    """Scrapes the Enphase API for solar energy production over previous hour"""
+# (listed at, serial numbers) of the system's microinverters, shared across
+# scraper instances in a warm process
+_microinverters: Dict[int, Tuple[float, List[str]]] = {}
+# paces API calls across all scraper threads in the process
+_token_bucket = TokenBucket(
+    EnphaseConfig.REQUESTS_PER_MINUTE / 60,
+    capacity=EnphaseConfig.MAX_CONCURRENT_REQUESTS,
+)
 
-    def scrape_metrics(self) -> List[MetricRecord]:
+
+class EnphaseScraper(BackfillableScraper):
+    """Scrapes the Enphase API for solar energy production since the last
+    interval written"""
+
+    multi_measure_name = EnphaseConfig.MULTI_MEASURE_NAME
+
+    backfill_window_seconds = EnphaseConfig.BACKFILL_WINDOW_SECONDS
+    backfill_requests_per_minute = EnphaseConfig.BACKFILL_REQUESTS_PER_MINUTE
+    track_watermark = True
+    microinverter_telemetry = EnphaseConfig.MICROINVERTER_TELEMETRY
+
+    def scrape_metrics(self) -> MetricBatch:
         logger.info("Starting Enphase API scrape")
         # Enphase API only returns internals strictly greater than start_at
         start_at_ts = get_previous_hour_dt().shift(seconds=-1).int_timestamp
 
         response_json = self.get_microinverter_production(start_at_ts).json()
+        records = self.process_json_response(response_json)
+        if self.microinverter_telemetry:
+            records.extend(self.scrape_microinverters(start_at_ts))
+        return records
+
+    def scrape_window(self, since: arrow.Arrow, until: arrow.Arrow) -> MetricBatch:
+        # telemetry APIs have no end_at parameter: a "day" request returns
+        # up to a day of intervals after start_at, so trim to the window
+        start_at_ts = since.shift(seconds=-1).int_timestamp
+        until_ts = until.int_timestamp
+        intervals = self.get_intervals(
+            self.get_microinverter_production, start_at_ts, until_ts
+        )
+        records = self.process_json_response({"intervals": intervals}, until_ts)
+        if self.microinverter_telemetry:
+            # a skipped device would fall behind the watermark or be marked as
+            # backfilled, so the whole window fails and is fetched again
+            records.extend(
+                self.scrape_microinverters(start_at_ts, until_ts, allow_partial=False)
+            )
+        return records
+
+    def scrape_microinverters(
+        self, start_at_ts: int, until_ts: int = None, allow_partial: bool = True
+    ) -> MetricBatch:
+        """Fetches each microinverter's intervals concurrently.
+
+        A microinverter that fails to fetch is logged and skipped, so one bad
+        device doesn't hide the others. Raises if every fetch failed
+
+        :param allow_partial: when False, raises if any fetch failed"""
+        serial_numbers = self.get_microinverter_serial_numbers()
+        if not serial_numbers:
+            return MetricBatch()
+        # fetched once up front rather than by every thread
+        self._ensure_access_token()
+
+        def fetch(serial_number: str) -> Union[List[dict], Exception]:
+            try:
+                return self.get_intervals(
+                    lambda ts: self.get_microinverter_telemetry(serial_number, ts),
+                    start_at_ts,
+                    until_ts,
+                )
+            except Exception as err:
+                return err
+
+        num_workers = min(EnphaseConfig.MAX_CONCURRENT_REQUESTS, len(serial_numbers))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(fetch, serial_numbers))
+
+        records = MetricBatch()
+        failed = 0
+        for serial_number, intervals in zip(serial_numbers, results):
+            if isinstance(intervals, Exception):
+                logger.error(
+                    f"Error fetching microinverter {serial_number}: {intervals}"
+                )
+                failed += 1
+                continue
+            dimension_set_id = records.intern_dimensions(
+                [LOCATION_DIMENSION, {"Name": "serial_number", "Value": serial_number}]
+            )
+            for interval in intervals:
+                ts = interval["end_at"]
+                if until_ts is not None and ts >= until_ts:
+                    continue
+                records.append(
+                    "microinverter_avg_power_produced",
+                    ts,
+                    interval["powr"],
+                    dimension_set_id=dimension_set_id,
+                )
+                records.append(
+                    "microinverter_energy_produced",
+                    ts,
+                    interval["enwh"],
+                    dimension_set_id=dimension_set_id,
+                )
+
+        if failed == len(serial_numbers) or (failed and not allow_partial):
+            raise Exception(
+                f"Failed to fetch {failed} of {len(serial_numbers)} microinverters"
+            )
+        return records
+
+    def get_intervals(
+        self,
+        fetch_page: Callable[[int], requests.Response],
+        start_at_ts: int,
+        until_ts: int = None,
+    ) -> List[dict]:
+        """Fetches telemetry intervals after start_at_ts, following further
+        day-long pages until the response covers until_ts. Without until_ts,
+        only the first page is fetched"""
+        intervals = []
+        while True:
+            response_json = fetch_page(start_at_ts).json()
+            try:
+                page = response_json["intervals"]
+            except KeyError:
+                logger.error(f"Response: {response_json}")
+                raise
+            intervals.extend(page)
+            if (
+                until_ts is None
+                or not page
+                or response_json.get("end_at", until_ts) >= until_ts
+            ):
+                return intervals
+            start_at_ts = page[-1]["end_at"]
+
+    def get_microinverter_serial_numbers(self) -> List[str]:
+        system_id = EnphaseConfig.ENPHASE_SYSTEM_ID
+        cached = _microinverters.get(system_id)
+        if cached and time.time() - cached[0] < EnphaseConfig.DEVICE_LIST_TTL_SECONDS:
+            return cached[1]
 
-        records = []
-        dimensions = [{"Name": "location", "Value": "primary_residence"}]
+        response_json = self._get(f"{SYSTEM_PATH}/devices").json()
+        try:
+            micros = response_json["devices"].get("micros", [])
+        except KeyError:
+            logger.error(f"Response: {response_json}")
+            raise
+        serial_numbers = [
+            micro["serial_number"] for micro in micros if micro.get("active", True)
+        ]
+        _microinverters[system_id] = (time.time(), serial_numbers)
+        return serial_numbers
+
+    def process_json_response(
+        self, response_json: dict, until_ts: int = None
+    ) -> MetricBatch:
+        """Converts production_micro intervals to records
+
+        :param until_ts: when set, intervals ending at or after it are dropped"""
+        records = MetricBatch()
+        # every interval shares the same dimensions
+        dimension_set_id = records.intern_dimensions([LOCATION_DIMENSION])
         try:
             intervals = response_json["intervals"]
             for interval in intervals:
                 ts = interval["end_at"]
+                if until_ts is not None and ts >= until_ts:
+                    continue
                 records.append(
-                    MetricRecord(
-                        "solar_avg_power_produced",
-                        ts,
-                        # measured in watts
-                        interval["powr"],
-                        dimensions=dimensions,
-                    )
+                    "solar_avg_power_produced",
+                    ts,
+                    # measured in watts
+                    interval["powr"],
+                    dimension_set_id=dimension_set_id,
                 )
                 records.append(
-                    MetricRecord(
-                        "solar_energy_produced",
-                        ts,
-                        # measured in watt-hours
-                        interval["enwh"],
-                        dimensions=dimensions,
-                    )
+                    "solar_energy_produced",
+                    ts,
+                    # measured in watt-hours
+                    interval["enwh"],
+                    dimension_set_id=dimension_set_id,
                 )
 
             return records
@@ -53,19 +212,37 @@ class EnphaseScraper(BaseScraper):
             raise e
 
     def get_microinverter_production(self, start_at_ts: int) -> requests.Response:
-        if not self.access_token:
-            self.access_token = self._get_access_token()
+        return self._get(
+            f"{SYSTEM_PATH}/telemetry/production_micro",
+            {"start_at": start_at_ts, "granularity": "day"},
+        )
 
-        url = (
-            f"{EnphaseConfig.ENPHASE_BASE_URL}/api/v4/systems/{EnphaseConfig.ENPHASE_SYSTEM_ID}"
-            f"/telemetry/production_micro"
+    def get_microinverter_telemetry(
+        self, serial_number: str, start_at_ts: int
+    ) -> requests.Response:
+        return self._get(
+            f"{SYSTEM_PATH}/devices/micros/{serial_number}/telemetry",
+            {"start_at": start_at_ts, "granularity": "day"},
         )
 
-        return requests.get(
-            url,
+    def _get(self, path: str, params: dict = None) -> requests.Response:
+        response = self._send_get(path, params)
+        if response.status_code == 401:
+            # the token was revoked or replaced early => reload it once
+            logger.info("Enphase rejected access token, reloading it")
+            AuthTokenFetcher(env=self.env).invalidate("enphase")
+            response = self._send_get(path, params)
+        # e.g. rate limited or a server error, rather than a missing "intervals"
+        response.raise_for_status()
+        return response
+
+    def _send_get(self, path: str, params: dict = None) -> requests.Response:
+        self._ensure_access_token()
+        _token_bucket.acquire()
+        return get_client(EnphaseConfig.ENPHASE_BASE_URL).get(
+            f"{EnphaseConfig.ENPHASE_BASE_URL}{path}",
             params={
-                "start_at": start_at_ts,
-                "granularity": "day",
+                **(params or {}),
                 "key": secrets.ENPHASE_PROD_API_KEY
                 if self.env == "prod"
                 else secrets.ENPHASE_DEV_API_KEY,
@@ -75,5 +252,10 @@ class EnphaseScraper(BaseScraper):
             },
         )
 
+    def _ensure_access_token(self) -> None:
+        # read through the expiry-aware token cache on every call, as scraper
+        # instances outlive their tokens in warm processes
+        self.access_token = self._get_access_token()
+
     def _get_access_token(self) -> str:
         return AuthTokenFetcher(env=self.env).get_access_token("enphase")
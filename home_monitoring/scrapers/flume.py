@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import Dict, Tuple
 import uuid
 
 import arrow
@@ -7,20 +7,77 @@ import requests
 
 from home_monitoring import logger, secrets
 from home_monitoring.config import FlumeConfig
-from home_monitoring.models.metrics import MetricRecord
-from home_monitoring.scrapers.base_scraper import BaseScraper
+from home_monitoring.models.metrics import MetricBatch, MetricRecord, Metrics
+from home_monitoring.scrapers.base_scraper import BackfillableScraper
+from home_monitoring.scrapers.http import get_client
+from home_monitoring.scrapers.token_cache import TokenCache
 from home_monitoring.scrapers.utils import get_previous_hour_dt
 
 logger = logger.get(__name__)
 
+# Lifetime assumed for tokens returned without "expires_in"
+DEFAULT_TOKEN_EXPIRES_IN_SECONDS = 3600
+# Length in seconds and arrow floor() frame of each supported bucket
+BUCKET_SECONDS = {"MIN": 60, "HR": 60 * 60}
+BUCKET_FRAMES = {"MIN": "minute", "HR": "hour"}
+# Each bucket size is stored as its own measure, so resolutions never mix
+MEASURE_NAMES = {
+    "MIN": "household_water_usage_per_minute",
+    "HR": "household_water_usage",
+}
+DATETIME_FORMAT = "YYYY-MM-DD HH:mm:ss"
 
-class FlumeScraper(BaseScraper):
-    """Scrapes the Flume API for water usage over previous hour"""
 
-    def scrape_metrics(self) -> List[MetricRecord]:
+class LocalDatetimeParser:
+    """Converts Flume's local "YYYY-MM-DD HH:mm:ss" datetimes to epoch
+    seconds. Only the first datetime seen in each hour is parsed by arrow,
+    the rest are offsets from it, so a day of minute buckets costs 24 arrow
+    parses rather than 1440"""
+
+    def __init__(self, tz: str = "US/Pacific"):
+        self.tz = tz
+        self.hours: Dict[str, int] = {}
+
+    def parse(self, datetime_str: str) -> int:
+        hour = datetime_str[:13]
+        hour_ts = self.hours.get(hour)
+        if hour_ts is None:
+            hour_ts = arrow.get(hour, "YYYY-MM-DD HH", tzinfo=self.tz).int_timestamp
+            self.hours[hour] = hour_ts
+        return hour_ts + int(datetime_str[14:16]) * 60 + int(datetime_str[17:19])
+
+
+class FlumeScraper(BackfillableScraper):
+    """Scrapes the Flume API for water usage since the last bucket written"""
+
+    bucket = FlumeConfig.BUCKET
+    backfill_requests_per_minute = FlumeConfig.BACKFILL_REQUESTS_PER_MINUTE
+    track_watermark = True
+
+    def __init__(self, env: str = "prod", token_cache: TokenCache = None):
+        super().__init__(env)
+        self.token_cache = token_cache or TokenCache("flume", self.fetch_token)
+
+    @property
+    def backfill_window_seconds(self) -> int:
+        # as much as a single request can return at this bucket size, less the
+        # bucket scrape_window() may add when flooring the start of the window
+        return min(
+            FlumeConfig.BACKFILL_WINDOW_SECONDS,
+            (
+                FlumeConfig.MAX_QUERIES_PER_REQUEST * FlumeConfig.MAX_POINTS_PER_QUERY
+                - 1
+            )
+            * BUCKET_SECONDS[self.bucket],
+        )
+
+    def scrape_metrics(self) -> Metrics:
         logger.info("Starting Flume API scrape")
         since = get_previous_hour_dt()
         until = since.shift(hours=1)
+        if self.bucket != "HR":
+            return self.scrape_window(since, until)
+
         response_json = self.query_device(since, until, "HR").json()
 
         try:
@@ -35,15 +92,7 @@ class FlumeScraper(BaseScraper):
                 )
 
             data_point = list(query_results.values())[0][0]
-            ts = int(arrow.get(data_point["datetime"], tzinfo="US/Pacific").timestamp())
-            value = float(data_point["value"])
-
-            record = MetricRecord(
-                "household_water_usage",
-                ts,
-                value,
-            )
-            record.add_dimension("name", FlumeConfig.LOCATION_NAME)
+            record = self.build_record(data_point)
             logger.info(f"Writing metric: {record}")
 
             return [record]
@@ -51,22 +100,91 @@ class FlumeScraper(BaseScraper):
             logger.error(f"Response: {response_json}")
             raise e
 
+    def scrape_window(self, since: arrow.Arrow, until: arrow.Arrow) -> MetricBatch:
+        # Flume datetimes are in the account's local time, and until_datetime
+        # is inclusive
+        query_since = since.to("US/Pacific").floor(BUCKET_FRAMES[self.bucket])
+        query_until = until.to("US/Pacific").shift(seconds=-1)
+        response_json = self.query_device(query_since, query_until, self.bucket).json()
+
+        try:
+            return self.process_query_results(
+                response_json, since.int_timestamp, until.int_timestamp
+            )
+        except Exception as e:
+            logger.error(f"Response: {response_json}")
+            raise e
+
+    def process_query_results(
+        self, response_json: dict, since_ts: int, until_ts: int
+    ) -> MetricBatch:
+        """Converts the data points of every query in the response to records,
+        keeping those in [since_ts, until_ts)"""
+        parse = LocalDatetimeParser().parse
+        records = MetricBatch()
+        # every data point shares the same dimensions
+        dimension_set_id = records.intern_dimensions(
+            [{"Name": "name", "Value": FlumeConfig.LOCATION_NAME}]
+        )
+        # a nested array of query results, with time series data per result
+        for query_results in response_json["data"]:
+            for data_points in query_results.values():
+                for data_point in data_points:
+                    ts = parse(data_point["datetime"])
+                    if since_ts <= ts < until_ts:
+                        records.append(
+                            MEASURE_NAMES[self.bucket],
+                            ts,
+                            data_point["value"],
+                            dimension_set_id=dimension_set_id,
+                        )
+        return records
+
+    def catch_up_until(self) -> arrow.Arrow:
+        # the current bucket is still filling up, and the latest finished ones
+        # may not have been uploaded yet
+        return (
+            arrow.utcnow()
+            .shift(seconds=-FlumeConfig.UPLOAD_LAG_SECONDS)
+            .floor(BUCKET_FRAMES[self.bucket])
+        )
+
+    def build_record(self, data_point: dict) -> MetricRecord:
+        ts = int(arrow.get(data_point["datetime"], tzinfo="US/Pacific").timestamp())
+        record = MetricRecord("household_water_usage", ts, float(data_point["value"]))
+        record.add_dimension("name", FlumeConfig.LOCATION_NAME)
+        return record
+
     def query_device(
         self, since: arrow.Arrow, until: arrow.Arrow, bucket: str = "HR"
     ) -> requests.Response:
+        """Queries usage per `bucket` from `since` to `until` (inclusive).
+        Ranges with more buckets than a query may return are split into
+        several queries of a single request"""
         endpoint = "/users/{user_id}/devices/{device_id}/query"
-        format_str = "YYYY-MM-DD HH:mm:ss"
+        query_seconds = FlumeConfig.MAX_POINTS_PER_QUERY * BUCKET_SECONDS[bucket]
 
-        query_payload = {
-            "queries": [
+        queries = []
+        query_since = since
+        while True:
+            query_until = min(until, query_since.shift(seconds=query_seconds - 1))
+            queries.append(
                 {
                     "request_id": uuid.uuid4().hex,
                     "bucket": bucket,
-                    "since_datetime": since.format(format_str),
-                    "until_datetime": until.format(format_str),
-                },
-            ]
-        }
+                    "since_datetime": query_since.format(DATETIME_FORMAT),
+                    "until_datetime": query_until.format(DATETIME_FORMAT),
+                }
+            )
+            if query_until >= until:
+                break
+            query_since = query_until.shift(seconds=1)
+        if len(queries) > FlumeConfig.MAX_QUERIES_PER_REQUEST:
+            raise ValueError(
+                f"{since} to {until} needs {len(queries)} {bucket} queries, at most "
+                f"{FlumeConfig.MAX_QUERIES_PER_REQUEST} are allowed per request"
+            )
+        query_payload = {"queries": queries}
 
         return self._make_flume_request(
             endpoint,
@@ -78,7 +196,10 @@ class FlumeScraper(BaseScraper):
             params=query_payload,
         )
 
-    def get_tokens(self) -> str:
+    def fetch_token(self) -> Tuple[str, int]:
+        """Fetches a new access token.
+
+        :returns: the token and its lifetime in seconds"""
         response = self._make_flume_request(
             endpoint="/oauth/token",
             method="POST",
@@ -92,15 +213,15 @@ class FlumeScraper(BaseScraper):
             authenticated=False,
         )
         if response.status_code == 200:
-            body = response.json()
-            self.access_token = body["data"][0]["access_token"]
+            token = response.json()["data"][0]
+            return token["access_token"], int(
+                token.get("expires_in", DEFAULT_TOKEN_EXPIRES_IN_SECONDS)
+            )
         else:
             raise Exception(
                 "Error getting access token. Response body is: " + response.text
             )
 
-        return self.access_token
-
     def _make_flume_request(
         self,
         endpoint: str,
@@ -120,19 +241,20 @@ class FlumeScraper(BaseScraper):
             "Content-Type": "application/json",
             "accept": "application/json",
         }
+        if method not in ("GET", "POST"):
+            raise Exception(f"Method {method} not supported")
         if authenticated:
-            if self.access_token is None:
-                self.access_token = self.get_tokens()
-
-            headers["Authorization"] = f"Bearer {self.access_token}"
+            # on every request, as scraper instances outlive their tokens in
+            # warm processes. Served from memory until near expiry
+            self.access_token = self.token_cache.get_token()
 
-        response = None
-        if method == "GET":
-            response = requests.get(url, params=params, headers=headers)
-        elif method == "POST":
-            response = requests.post(url, json=params, headers=headers)
-        else:
-            raise Exception(f"Method {method} not supported")
+        response = self._send_request(method, url, params, headers, authenticated)
+        if authenticated and response.status_code == 401:
+            # the cached token was revoked or expired early => refresh once
+            logger.info("Flume rejected access token, refreshing it")
+            self.token_cache.invalidate()
+            self.access_token = self.token_cache.get_token()
+            response = self._send_request(method, url, params, headers, authenticated)
 
         if response.status_code < 300:
             return response
@@ -140,3 +262,14 @@ class FlumeScraper(BaseScraper):
             raise Exception(
                 f"Received {response.status_code} response code, body={response.text}"
             )
+
+    def _send_request(
+        self, method: str, url: str, params: dict, headers: dict, authenticated: bool
+    ) -> requests.Response:
+        if authenticated:
+            headers = dict(headers, Authorization=f"Bearer {self.access_token}")
+
+        client = get_client(FlumeConfig.FLUME_BASE_URL)
+        if method == "GET":
+            return client.get(url, params=params, headers=headers)
+        return client.post(url, json=params, headers=headers)
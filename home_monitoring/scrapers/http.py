@@ -0,0 +1,84 @@
+import threading
+from typing import Dict, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts. The connect timeout is slightly larger than a
+# multiple of 3s, the default TCP retransmission window
+# See https://requests.readthedocs.io/en/latest/user/advanced/#timeouts
+DEFAULT_TIMEOUT = (3.05, 30)
+# Keep-alive connections kept per host, enough for concurrent device fetches
+DEFAULT_POOL_SIZE = 16
+# Only connection failures are retried: the request never reached the server,
+# so this is safe for POSTs too
+CONNECT_RETRIES = 2
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HttpClient:
+    """Pooled HTTP client for a single vendor API.
+
+    Wraps a requests.Session so connections (and TLS sessions) are reused
+    across calls and, via get_client(), across warm Lambda invocations. Every
+    request gets a default timeout and negotiates gzip"""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=CONNECT_RETRIES,
+                connect=CONNECT_RETRIES,
+                read=0,
+                status=0,
+                other=0,
+                backoff_factor=0.2,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.url(url), **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(self.url(url), **kwargs)
+
+    def url(self, url: str) -> str:
+        """Resolves a path relative to the base URL. Absolute URLs are
+        returned unchanged"""
+        if url.startswith("http://") or url.startswith("https://"):
+            return url
+        return f"{self.base_url}/{url.lstrip('/')}"
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: Dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: str, timeout: Timeout = DEFAULT_TIMEOUT) -> HttpClient:
+    """Returns the process-wide client for `base_url`, creating it on first use"""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = HttpClient(base_url, timeout=timeout)
+            _clients[base_url] = client
+        return client
@@ -1,57 +1,67 @@
-import subprocess
-from typing import List
+from typing import Dict, List, Optional
 
 import arrow
 
 from home_monitoring import logger
+from home_monitoring.config import PingConfig
 from home_monitoring.scrapers.base_scraper import BaseScraper
-from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.scrapers.probes import ProbeEngine, ProbeResult, ProbeTarget
+from home_monitoring.models.metrics import MetricBatch
 
 logger = logger.get(__name__)
 
 
 class PingScraper(BaseScraper):
-    def scrape_metrics(self) -> List[MetricRecord]:
-        records = []
+    """Measures latency, jitter and packet loss to each of PingConfig.TARGETS,
+    probing them all concurrently in-process"""
 
+    multi_measure_name = PingConfig.MULTI_MEASURE_NAME
+
+    def __init__(
+        self,
+        env: str = "prod",
+        targets: Optional[List[ProbeTarget]] = None,
+        engine: Optional[ProbeEngine] = None,
+    ):
+        super().__init__(env)
+        self.targets = targets or [ProbeTarget(**t) for t in PingConfig.TARGETS]
+        self.engine = engine or ProbeEngine(
+            count=PingConfig.PROBE_COUNT,
+            interval_seconds=PingConfig.PROBE_INTERVAL_SECONDS,
+            timeout_seconds=PingConfig.PROBE_TIMEOUT_SECONDS,
+        )
+
+    def scrape_metrics(self) -> MetricBatch:
         now = int(arrow.utcnow().timestamp())
-        result = subprocess.run(["ping", "-c", "10", "8.8.8.8"], stdout=subprocess.PIPE)
-        if result.returncode != 0:
-            logger.error(f"ping command returned exit code {result.returncode}:")
-            logger.error(result.stdout)
-            return records
-
-        output_lines = result.stdout.splitlines()
-        rtt_stats_line = output_lines[-1].decode("utf-8")
-        packet_stats_line = output_lines[-2].decode("utf-8")
-
-        min, avg, max, mdev = rtt_stats_line.split("=")[1].strip().split("/")
-        packet_loss_pct = int(packet_stats_line.split(",")[2].split("%")[0])
-        data = {
-            "ping_min": float(min),
-            "ping_avg": float(avg),
-            "ping_max": float(max),
-            "ping_packet_loss_pct": float(packet_loss_pct),
-        }
-
-        for metric_name, value in data.items():
-            record = MetricRecord(
-                metric_name,
-                now,
-                value,
+        return self.process_results(self.engine.run(self.targets), now)
+
+    @staticmethod
+    def process_results(results: List[ProbeResult], ts: int) -> MetricBatch:
+        records = MetricBatch()
+        for result in results:
+            if result.loss_pct == 100:
+                logger.error(f"All probes to {result.target.host} were lost")
+            append_ping_stats(
+                records, result.target.name, result.kind, result.stats(), ts
             )
-            record.add_dimension("location", "primary_residence")
-            records.append(record)
 
         return records
 
 
-# PING 8.8.8.8 (8.8.8.8) 56(84) bytes of data.
-# 64 bytes from 8.8.8.8: icmp_seq=1 ttl=57 time=10.2 ms
-# 64 bytes from 8.8.8.8: icmp_seq=2 ttl=57 time=11.9 ms
-# ...
-# 64 bytes from 8.8.8.8: icmp_seq=10 ttl=57 time=20.0 ms
-#
-# --- 8.8.8.8 ping statistics ---
-# 10 packets transmitted, 10 received, 0% packet loss, time 9016ms
-# rtt min/avg/max/mdev = 10.094/13.744/20.540/3.631 ms
+def append_ping_stats(
+    records: MetricBatch,
+    target_name: str,
+    kind: str,
+    stats: Dict[str, float],
+    ts: int,
+) -> None:
+    """Appends a target's stats as ping_* records, see ProbeResult.stats"""
+    dimension_set_id = records.intern_dimensions(
+        [
+            ("location", "primary_residence"),
+            ("target", target_name),
+            ("probe", kind),
+        ]
+    )
+    for stat, value in stats.items():
+        records.append(f"ping_{stat}", ts, value, dimension_set_id=dimension_set_id)
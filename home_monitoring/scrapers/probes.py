@@ -0,0 +1,338 @@
+from abc import ABC, abstractmethod
+import asyncio
+from dataclasses import dataclass, field
+import random
+import socket
+import struct
+import time
+from typing import Dict, List, Optional, Sequence
+
+from home_monitoring import logger
+
+logger = logger.get(__name__)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+DNS_TYPE_A = 1
+DNS_CLASS_IN = 1
+
+
+@dataclass(frozen=True)
+class ProbeTarget:
+    name: str
+    host: str
+    # "icmp", "tcp" or "dns". ICMP probes fall back to TCP connects where
+    # unprivileged ICMP sockets aren't permitted
+    kind: str = "icmp"
+    # TCP port for "tcp" probes (and the ICMP fallback), UDP port for "dns"
+    port: int = 53
+    # name resolved by "dns" probes
+    query: str = "google.com"
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """The q-th percentile (0-100) of sorted values, interpolating linearly
+    between the closest ranks"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = q / 100 * (len(sorted_values) - 1)
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = rank - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        fraction
+    )
+
+
+@dataclass
+class ProbeResult:
+    target: ProbeTarget
+    # the kind of probe actually sent, after any fallback
+    kind: str
+    # round trip time of each probe in milliseconds, None if it was lost
+    samples: List[Optional[float]] = field(default_factory=list)
+
+    @property
+    def rtts(self) -> List[float]:
+        return [sample for sample in self.samples if sample is not None]
+
+    @property
+    def loss_pct(self) -> float:
+        if not self.samples:
+            return 100.0
+        return 100.0 * (len(self.samples) - len(self.rtts)) / len(self.samples)
+
+    def stats(self) -> Dict[str, float]:
+        """RTT statistics in milliseconds and the packet loss percentage.
+        Only the loss is returned if every probe was lost.
+
+        Jitter is the mean absolute difference between consecutive RTTs"""
+        stats = {"packet_loss_pct": self.loss_pct}
+        rtts = self.rtts
+        if not rtts:
+            return stats
+
+        sorted_rtts = sorted(rtts)
+        differences = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+        stats.update(
+            {
+                "min": sorted_rtts[0],
+                "avg": sum(rtts) / len(rtts),
+                "max": sorted_rtts[-1],
+                "p50": percentile(sorted_rtts, 50),
+                "p95": percentile(sorted_rtts, 95),
+                "p99": percentile(sorted_rtts, 99),
+                "jitter": sum(differences) / len(differences) if differences else 0.0,
+            }
+        )
+        return stats
+
+
+class _DatagramProber(ABC):
+    """Sends datagram probes over a connected, non-blocking socket and
+    matches replies to probes by id, so many probes can be in flight"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.loop = asyncio.get_running_loop()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.loop.add_reader(sock.fileno(), self._on_readable)
+
+    @abstractmethod
+    def build_request(self, probe_id: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def parse_reply(self, data: bytes) -> Optional[int]:
+        """:returns: the id of the probe answered by `data`, if any"""
+        pass
+
+    async def probe(self, probe_id: int, timeout_seconds: float) -> Optional[float]:
+        future = self.loop.create_future()
+        self.pending[probe_id] = future
+        started = time.perf_counter()
+        try:
+            self.sock.send(self.build_request(probe_id))
+            replied_at = await asyncio.wait_for(future, timeout_seconds)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self.pending.pop(probe_id, None)
+        return (replied_at - started) * 1000
+
+    def close(self) -> None:
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+    def _on_readable(self) -> None:
+        replied_at = time.perf_counter()
+        try:
+            data = self.sock.recv(4096)
+        except OSError:
+            # e.g. port unreachable errors; the probe times out
+            return
+        future = self.pending.get(self.parse_reply(data))
+        if future is not None and not future.done():
+            future.set_result(replied_at)
+
+
+class _IcmpProber(_DatagramProber):
+    """ICMP echo over an unprivileged SOCK_DGRAM ICMP socket. The kernel sets
+    the echo identifier, so replies are matched by sequence number"""
+
+    @classmethod
+    def open(cls, address: str) -> "_IcmpProber":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        sock.setblocking(False)
+        sock.connect((address, 0))
+        return cls(sock)
+
+    def build_request(self, probe_id: int) -> bytes:
+        payload = struct.pack("!d", time.time())
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, 0, probe_id)
+        checksum = self._checksum(header + payload)
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, 0, probe_id)
+        return header + payload
+
+    def parse_reply(self, data: bytes) -> Optional[int]:
+        # some platforms include the IPv4 header
+        if data and data[0] >> 4 == 4:
+            data = data[(data[0] & 0x0F) * 4 :]
+        if len(data) < 8 or data[0] != ICMP_ECHO_REPLY:
+            return None
+        return struct.unpack("!H", data[6:8])[0]
+
+    @staticmethod
+    def _checksum(data: bytes) -> int:
+        if len(data) % 2:
+            data += b"\x00"
+        total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+        total = (total >> 16) + (total & 0xFFFF)
+        total += total >> 16
+        return ~total & 0xFFFF
+
+
+class _DnsProber(_DatagramProber):
+    """DNS A queries over UDP, matched by transaction id"""
+
+    def __init__(self, sock: socket.socket, query: str):
+        super().__init__(sock)
+        self.question = (
+            b"".join(
+                bytes([len(label)]) + label.encode("ascii")
+                for label in query.rstrip(".").split(".")
+            )
+            + b"\x00"
+            + struct.pack("!HH", DNS_TYPE_A, DNS_CLASS_IN)
+        )
+
+    @classmethod
+    def open(cls, address: str, port: int, query: str) -> "_DnsProber":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.connect((address, port))
+        return cls(sock, query)
+
+    def build_request(self, probe_id: int) -> bytes:
+        # recursion desired, one question
+        return struct.pack("!HHHHHH", probe_id, 0x0100, 1, 0, 0, 0) + self.question
+
+    def parse_reply(self, data: bytes) -> Optional[int]:
+        if len(data) < 12:
+            return None
+        return struct.unpack("!H", data[:2])[0]
+
+
+class ProbeSession:
+    """Probes one target over a socket that stays open between probes, so
+    callers can probe on their own schedule. Use open() to create one"""
+
+    def __init__(
+        self,
+        target: ProbeTarget,
+        address: str,
+        kind: str,
+        timeout_seconds: float,
+        prober: Optional[_DatagramProber] = None,
+    ):
+        self.target = target
+        self.address = address
+        # the kind of probe actually sent, after any fallback
+        self.kind = kind
+        self.timeout_seconds = timeout_seconds
+        self.prober = prober
+        # ids start at a random offset so that late replies to a previous
+        # session can't be mistaken for this session's
+        self.next_id = random.randrange(0x10000)
+
+    @classmethod
+    async def open(cls, target: ProbeTarget, timeout_seconds: float) -> "ProbeSession":
+        """:raises OSError: if the target's host can't be resolved"""
+        address = await cls._resolve(target.host)
+        kind = target.kind
+        prober = None
+        if kind == "icmp":
+            try:
+                prober = _IcmpProber.open(address)
+            except OSError as err:
+                logger.debug(f"ICMP not permitted ({err}), using TCP connects")
+                kind = "tcp"
+        elif kind == "dns":
+            prober = _DnsProber.open(address, target.port, target.query)
+        elif kind != "tcp":
+            raise ValueError(f"Unknown probe kind '{kind}'")
+        return cls(target, address, kind, timeout_seconds, prober)
+
+    async def probe(self) -> Optional[float]:
+        """:returns: the round trip time in milliseconds, None if the probe
+        was lost"""
+        probe_id = self.next_id
+        self.next_id = (self.next_id + 1) & 0xFFFF
+        if self.prober is not None:
+            return await self.prober.probe(probe_id, self.timeout_seconds)
+        return await self._tcp_probe()
+
+    def close(self) -> None:
+        if self.prober is not None:
+            self.prober.close()
+
+    async def _tcp_probe(self) -> Optional[float]:
+        started = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.address, self.target.port),
+                self.timeout_seconds,
+            )
+        except ConnectionRefusedError:
+            # the host answered with a reset, which is still a round trip
+            return (time.perf_counter() - started) * 1000
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+        rtt_ms = (time.perf_counter() - started) * 1000
+        writer.close()
+        try:
+            # releases the socket now rather than when it's garbage collected
+            await asyncio.wait_for(writer.wait_closed(), self.timeout_seconds)
+        except (OSError, asyncio.TimeoutError):
+            pass
+        return rtt_ms
+
+    @staticmethod
+    async def _resolve(host: str) -> str:
+        """Resolves the target once, so name lookups aren't part of the RTT"""
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, family=socket.AF_INET
+        )
+        return infos[0][4][0]
+
+
+class ProbeEngine:
+    """Probes many targets concurrently from a single asyncio event loop.
+
+    Each target gets `count` probes started `interval_seconds` apart, each
+    waiting up to `timeout_seconds` for a reply. A run therefore takes about
+    (count - 1) * interval + timeout seconds, whatever the number of
+    targets"""
+
+    def __init__(
+        self,
+        count: int = 10,
+        interval_seconds: float = 0.5,
+        timeout_seconds: float = 2.0,
+    ):
+        self.count = count
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+
+    def run(self, targets: Sequence[ProbeTarget]) -> List[ProbeResult]:
+        return asyncio.run(self.probe_all(targets))
+
+    async def probe_all(self, targets: Sequence[ProbeTarget]) -> List[ProbeResult]:
+        return list(await asyncio.gather(*(self.probe(t) for t in targets)))
+
+    async def probe(self, target: ProbeTarget) -> ProbeResult:
+        try:
+            session = await ProbeSession.open(target, self.timeout_seconds)
+        except OSError as err:
+            logger.error(f"Could not resolve {target.host}: {err}")
+            return ProbeResult(target, target.kind, [None] * self.count)
+
+        try:
+            samples = await asyncio.gather(
+                *(
+                    self._probe_at(i * self.interval_seconds, session)
+                    for i in range(self.count)
+                )
+            )
+        finally:
+            session.close()
+
+        return ProbeResult(target, session.kind, list(samples))
+
+    @staticmethod
+    async def _probe_at(delay_seconds: float, session: ProbeSession) -> Optional[float]:
+        # probes start on a fixed schedule, so a slow reply doesn't delay
+        # the next probe
+        await asyncio.sleep(delay_seconds)
+        return await session.probe()
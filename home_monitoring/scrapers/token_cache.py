@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+from home_monitoring import logger
+from home_monitoring.config import AUTH_TOKENS_TABLE_NAME
+
+logger = logger.get(__name__)
+
+# Tokens are refreshed this long before they expire
+DEFAULT_REFRESH_MARGIN_SECONDS = 300
+
+# access token and its lifetime in seconds, as returned by a vendor token API
+TokenFetcher = Callable[[], Tuple[str, int]]
+
+
+@dataclass
+class CachedToken:
+    access_token: str
+    expiration_ts: int
+    # incremented on every refresh, used for optimistic locking
+    version: int = 0
+
+    def is_valid(self, margin_seconds: float = 0) -> bool:
+        return self.expiration_ts - margin_seconds > time.time()
+
+
+# tokens by app name, shared across scraper instances in a warm process
+_tokens: Dict[str, CachedToken] = {}
+_tokens_lock = threading.Lock()
+
+
+class TokenCache:
+    """Expiry-aware access token cache backed by the auth tokens table.
+
+    Tokens are kept in process memory and in DynamoDB, so warm and cold
+    invocations reuse a token until it is within `refresh_margin_seconds` of
+    expiring. Refreshes are written with a version check: when two processes
+    refresh concurrently, the loser adopts the winner's token"""
+
+    def __init__(
+        self,
+        app_name: str,
+        fetch_token: TokenFetcher,
+        table=None,
+        refresh_margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS,
+        memory: Dict[str, CachedToken] = None,
+    ):
+        self.app_name = app_name
+        self.fetch_token = fetch_token
+        self._table = table
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.memory = _tokens if memory is None else memory
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = boto3.resource("dynamodb", region_name="us-west-2").Table(
+                AUTH_TOKENS_TABLE_NAME
+            )
+        return self._table
+
+    def get_token(self) -> str:
+        token = self.memory.get(self.app_name)
+        if token and token.is_valid(self.refresh_margin_seconds):
+            return token.access_token
+
+        with _tokens_lock:
+            if not (token and token.expiration_ts == 0):
+                # not invalidated => another process may have refreshed it
+                token = self._load() or token
+            if not token or not token.is_valid(self.refresh_margin_seconds):
+                token = self._refresh(token)
+            self.memory[self.app_name] = token
+        return token.access_token
+
+    def invalidate(self) -> None:
+        """Forces a refresh on the next get_token(), e.g. after the vendor
+        rejected the token before its expiry"""
+        token = self.memory.get(self.app_name)
+        if token:
+            self.memory[self.app_name] = CachedToken(
+                token.access_token, 0, token.version
+            )
+
+    def _load(self) -> Optional[CachedToken]:
+        try:
+            item = self.table.get_item(
+                Key={"app_name": self.app_name}, ConsistentRead=True
+            ).get("Item")
+        except (BotoCoreError, ClientError) as err:
+            logger.warning(f"Error loading cached {self.app_name} token: {err}")
+            return None
+        if not item or "access_token" not in item:
+            return None
+        return CachedToken(
+            item["access_token"],
+            int(item["expiration_ts"]),
+            int(item.get("version", 0)),
+        )
+
+    def _refresh(self, previous: Optional[CachedToken]) -> CachedToken:
+        logger.info(f"Refreshing {self.app_name} access token")
+        access_token, expires_in_seconds = self.fetch_token()
+        version = previous.version + 1 if previous else 1
+        token = CachedToken(
+            access_token, int(time.time()) + int(expires_in_seconds), version
+        )
+
+        try:
+            self.table.put_item(
+                Item={
+                    "app_name": self.app_name,
+                    "access_token": token.access_token,
+                    "expiration_ts": token.expiration_ts,
+                    "version": token.version,
+                },
+                ConditionExpression="attribute_not_exists(app_name) "
+                "OR attribute_not_exists(version) OR version < :version",
+                ExpressionAttributeValues={":version": token.version},
+            )
+        except (BotoCoreError, ClientError) as err:
+            if (
+                not isinstance(err, ClientError)
+                or err.response["Error"]["Code"] != "ConditionalCheckFailedException"
+            ):
+                logger.warning(f"Error caching {self.app_name} token: {err}")
+                return token
+            # another process refreshed first => use its token if it's usable
+            winner = self._load()
+            if winner and winner.is_valid(self.refresh_margin_seconds):
+                return winner
+        return token
@@ -1,11 +1,19 @@
+from typing import TYPE_CHECKING, List, Tuple
+
 import arrow
-from botocore.client import BaseClient
 
 from home_monitoring import logger
 
+if TYPE_CHECKING:
+    # botocore is slow to import and only needed for annotations here
+    from botocore.client import BaseClient
+
 
 logger = logger.get(__name__)
 
+# [since, until) in epoch seconds
+Window = Tuple[int, int]
+
 
 def get_previous_hour_dt() -> arrow.Arrow:
     dt = arrow.now("US/Pacific")
@@ -13,8 +21,28 @@ def get_previous_hour_dt() -> arrow.Arrow:
     return dt.shift(hours=-1)
 
 
+def split_windows(
+    since_ts: int, until_ts: int, window_seconds: int, align: bool = True
+) -> List[Window]:
+    """Splits [since_ts, until_ts) into windows of at most `window_seconds`.
+
+    :param align: align window boundaries to multiples of `window_seconds`
+        since the epoch, so overlapping ranges produce the same interior
+        windows. Unaligned ranges need the fewest windows"""
+    windows = []
+    start = since_ts
+    while start < until_ts:
+        if align:
+            end = (start // window_seconds + 1) * window_seconds
+        else:
+            end = start + window_seconds
+        windows.append((start, min(end, until_ts)))
+        start = end
+    return windows
+
+
 def find_first_instance_in_asg(
-    asg_name: str, asg_client: BaseClient, ec2_client: BaseClient
+    asg_name: str, asg_client: "BaseClient", ec2_client: "BaseClient"
 ) -> dict:
     """Finds the first EC2 instance in the autoscaling group.
 
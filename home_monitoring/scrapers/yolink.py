@@ -1,62 +1,210 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
 import arrow
-import requests
 
 from home_monitoring import logger, secrets
 from home_monitoring.config import YolinkConfig
 from home_monitoring.models.metrics import MetricRecord
 from home_monitoring.scrapers.base_scraper import BaseScraper
+from home_monitoring.scrapers.http import get_client
+from home_monitoring.scrapers.token_cache import TokenCache
+from home_monitoring.store.state import StateTable
 
 logger = logger.get(__name__)
 
 
+# API response code for successful calls
+SUCCESS_CODE = "000000"
+# API response codes for invalid and expired access tokens
+AUTH_ERROR_CODES = ("000103", "010104")
+# Lifetime assumed for tokens returned without "expires_in"
+DEFAULT_TOKEN_EXPIRES_IN_SECONDS = 3600
+
+# device lists by home, shared across scraper instances in a warm process
+_device_lists: Dict[str, dict] = {}
+
+
+class YolinkApiError(Exception):
+    """A Yolink API call that returned a non-success code, e.g. because of an
+    invalid token or an unknown device"""
+
+    def __init__(self, method: str, code: str, desc: str):
+        super().__init__(f"{method} failed with code {code}: {desc}")
+        self.code = code
+
+
+class YolinkDeviceCache:
+    """TTL cache for the Home.getDeviceList response (device ids, types and
+    tokens), kept in memory and in the pipeline state table so it survives
+    cold starts. Failures to read or write the state table are logged and
+    treated as cache misses"""
+
+    KEY_PREFIX = "yolink_devices#"
+
+    def __init__(
+        self,
+        state_table: StateTable = None,
+        ttl_seconds: int = YolinkConfig.DEVICE_LIST_TTL_SECONDS,
+        memory: Dict[str, dict] = None,
+    ):
+        self.state_table = state_table or StateTable()
+        self.ttl_seconds = ttl_seconds
+        self.memory = _device_lists if memory is None else memory
+
+    def get(self, home_key: str) -> Optional[List[dict]]:
+        entry = self.memory.get(home_key)
+        if entry is None:
+            try:
+                entry = self.state_table.get(self.KEY_PREFIX + home_key)
+            except Exception as e:
+                logger.warning(f"Error reading cached Yolink devices: {e}")
+                return None
+            if entry is None:
+                return None
+            self.memory[home_key] = entry
+
+        if entry["expires_at"] <= time.time():
+            return None
+        return entry["devices"]
+
+    def put(self, home_key: str, devices: List[dict]) -> None:
+        entry = {
+            "expires_at": int(time.time()) + self.ttl_seconds,
+            "devices": devices,
+        }
+        self.memory[home_key] = entry
+        try:
+            self.state_table.put(self.KEY_PREFIX + home_key, entry)
+        except Exception as e:
+            logger.warning(f"Error caching Yolink devices: {e}")
+
+    def invalidate(self, home_key: str) -> None:
+        self.memory.pop(home_key, None)
+        try:
+            self.state_table.delete(self.KEY_PREFIX + home_key)
+        except Exception as e:
+            logger.warning(f"Error invalidating cached Yolink devices: {e}")
+
+
 class YolinkScraper(BaseScraper):
+    # sensors report infrequently, so most polls re-read the last report
+    dedupe_writes = True
+
+    def __init__(
+        self,
+        env: str = "prod",
+        device_cache: YolinkDeviceCache = None,
+        token_cache: TokenCache = None,
+    ):
+        super().__init__(env)
+        self.device_cache = device_cache or YolinkDeviceCache()
+        self.token_cache = token_cache or TokenCache("yolink", self.get_token)
+        # a Yolink account (UAID) maps to a single home
+        self.home_key = secrets.YOLINK_UAID
+
     def scrape_metrics(self) -> List[MetricRecord]:
         records = []
 
         minimum_ingest_ts = arrow.now().shift(days=-30).int_timestamp
         logger.info(f"minimum_ingest_ts: {minimum_ingest_ts}")
 
-        # get devices + tokens
-        response_json = self.make_yolink_request("Home.getDeviceList")
-        try:
-            for device in response_json["data"]["devices"]:
-                device_id = device["deviceId"]
-                logger.info(device)
-
-                if device_id in YolinkConfig.DEVICE_MAPPING:
-                    device_token = device["token"]
-                    device_type = device["type"]
-                    state_handler = YolinkConfig.DEVICE_MAPPING[device_id][
-                        "state_handler"
-                    ]
-
-                    (ts, value) = self.get_device_state(
-                        device_type, device_id, device_token, state_handler
-                    )
-                    metric_name = YolinkConfig.DEVICE_MAPPING[device_id]["type"]
-                    logger.info(f"{metric_name}, {ts}, {value}")
-                    if ts > minimum_ingest_ts:
-                        record = MetricRecord(
-                            metric_name,
-                            ts,
-                            value,
-                        )
-                        record.add_dimension(
-                            "name", YolinkConfig.DEVICE_MAPPING[device_id]["name"]
-                        )
-                        records.append(record)
-                    else:
-                        logger.info(
-                            f"Timestamp for {metric_name} too old, skipping: "
-                            f"{arrow.get(ts)}"
-                        )
-
-            return records
-        except Exception as e:
-            logger.error(f"Response: {response_json}")
-            raise e
+        devices, cached = self.get_devices()
+        states = self.get_device_states(devices)
+        if cached and any(isinstance(state, YolinkApiError) for state in states):
+            # device tokens may have been rotated or devices removed
+            logger.info("Device errors with cached device list, refetching it")
+            self.device_cache.invalidate(self.home_key)
+            devices, _ = self.get_devices()
+            states = self.get_device_states(devices)
+
+        if devices and all(isinstance(state, Exception) for state in states):
+            raise Exception(f"Failed to get state for all {len(devices)} devices")
+
+        for device, state in zip(devices, states):
+            if isinstance(state, Exception):
+                continue
+            ts, value = state
+            device_config = YolinkConfig.DEVICE_MAPPING[device["deviceId"]]
+            metric_name = device_config["type"]
+            logger.info(f"{metric_name}, {ts}, {value}")
+            if ts > minimum_ingest_ts:
+                record = MetricRecord(
+                    metric_name,
+                    ts,
+                    value,
+                )
+                record.add_dimension("name", device_config["name"])
+                records.append(record)
+            else:
+                logger.info(
+                    f"Timestamp for {metric_name} too old, skipping: {arrow.get(ts)}"
+                )
+
+        return records
+
+    def get_devices(self) -> Tuple[List[dict], bool]:
+        """Returns the mapped devices (id, type and token), from the device
+        cache if possible.
+
+        :returns: the devices and whether they came from the cache"""
+        devices = self.device_cache.get(self.home_key)
+        cached = devices is not None
+        if not cached:
+            response_json = self.make_yolink_request("Home.getDeviceList")
+            try:
+                devices = [
+                    {
+                        "deviceId": device["deviceId"],
+                        "type": device["type"],
+                        "token": device["token"],
+                    }
+                    for device in response_json["data"]["devices"]
+                ]
+            except Exception as e:
+                logger.error(f"Response: {response_json}")
+                raise e
+            self.device_cache.put(self.home_key, devices)
+
+        # the full list is cached so that changes to DEVICE_MAPPING apply
+        # immediately
+        mapped_devices = [
+            device
+            for device in devices
+            if device["deviceId"] in YolinkConfig.DEVICE_MAPPING
+        ]
+        return mapped_devices, cached
+
+    def get_device_states(self, devices: List[dict]) -> List[Union[Tuple, Exception]]:
+        """Fetches the state of each device concurrently.
+
+        :returns: a (ts, value) tuple per device, in the order of `devices`, or
+            the exception raised for devices whose state couldn't be fetched"""
+        if not devices:
+            return []
+
+        num_workers = min(YolinkConfig.MAX_CONCURRENT_REQUESTS, len(devices))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.get_device_state,
+                    device["type"],
+                    device["deviceId"],
+                    device["token"],
+                    YolinkConfig.DEVICE_MAPPING[device["deviceId"]]["state_handler"],
+                )
+                for device in devices
+            ]
+
+        states = []
+        for device, future in zip(devices, futures):
+            try:
+                states.append(future.result())
+            except Exception as e:
+                logger.error(f"Error getting state for device {device}: {e}")
+                states.append(e)
+        return states
 
     def get_device_state(self, device_type, device_id, device_token, state_handler):
         response = self.make_yolink_request(
@@ -66,6 +214,10 @@ class YolinkScraper(BaseScraper):
                 "token": device_token,
             },
         )
+        if response.get("code") != SUCCESS_CODE:
+            raise YolinkApiError(
+                f"{device_type}.getState", response.get("code"), response.get("desc")
+            )
 
         date = arrow.get(response["data"]["reportAt"])
         ts = date.int_timestamp
@@ -73,9 +225,20 @@ class YolinkScraper(BaseScraper):
         return ts, value
 
     def make_yolink_request(self, method, params={}):
-        if self.access_token is None:
-            self.access_token = self.get_token()
+        # on every request, as scraper instances outlive their tokens in warm
+        # processes. Served from memory until near expiry
+        self.access_token = self.token_cache.get_token()
 
+        response_json = self._post_api_request(method, params)
+        if response_json.get("code") in AUTH_ERROR_CODES:
+            # the cached token was revoked or expired early => refresh once
+            logger.info(f"Yolink rejected access token: {response_json.get('desc')}")
+            self.token_cache.invalidate()
+            self.access_token = self.token_cache.get_token()
+            response_json = self._post_api_request(method, params)
+        return response_json
+
+    def _post_api_request(self, method, params):
         url = f"{YolinkConfig.YOLINK_BASE_URL}/v2/api"
         headers = {
             "Content-Type": "application/json",
@@ -86,10 +249,17 @@ class YolinkScraper(BaseScraper):
         }
         post_body.update(params)
 
-        return requests.post(url, json=post_body, headers=headers).json()
+        return (
+            get_client(YolinkConfig.YOLINK_BASE_URL)
+            .post(url, json=post_body, headers=headers)
+            .json()
+        )
+
+    def get_token(self) -> Tuple[str, int]:
+        """Fetches a new access token.
 
-    def get_token(self):
-        response = requests.post(
+        :returns: the token and its lifetime in seconds"""
+        response = get_client(YolinkConfig.YOLINK_BASE_URL).post(
             f"{YolinkConfig.YOLINK_BASE_URL}/token",
             data={
                 "grant_type": "client_credentials",
@@ -97,7 +267,10 @@ class YolinkScraper(BaseScraper):
                 "client_secret": secrets.YOLINK_SECRET_KEY,
             },
         )
-        return response.json()["access_token"]
+        body = response.json()
+        return body["access_token"], int(
+            body.get("expires_in", DEFAULT_TOKEN_EXPIRES_IN_SECONDS)
+        )
 
 
 # Run this module to print out the full device list and IDs for inclusion in
@@ -0,0 +1,313 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from home_monitoring import logger
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.store.metrics_store import (
+    ChunkResult,
+    DeliveryCallback,
+    FilteringMetricsStore,
+    MetricsStore,
+    WriteResult,
+)
+
+logger = logger.get(__name__)
+
+# (downstream store, table name, multi-measure name)
+QueueKey = Tuple[MetricsStore, str, Optional[str]]
+# records enqueued by one write_metrics call, and the callbacks of the
+# FilteringMetricsStores they passed through
+QueuedWrite = Tuple[Metrics, Sequence[DeliveryCallback]]
+
+
+class AsyncMetricsWriter(MetricsStore):
+    """Writes to another MetricsStore from a background thread, so producers
+    can keep scraping while earlier records are being written.
+
+    write_metrics only enqueues the records. The worker coalesces queued
+    records per table into a single downstream write once `max_batch_records`
+    are queued or the oldest queued records are `max_delay_seconds` old.
+    Producers block once `max_queue_records` are queued. Call flush() or
+    close() before the process or Lambda exits; their WriteResult reports
+    what was actually delivered. Records written after close() are dropped
+    and counted in `records_dropped`.
+
+    FilteringMetricsStores applied with wrap() filter records as they are
+    enqueued, so records of differently wrapped producers (e.g. scrapers
+    with their own watermarks) still share one downstream write"""
+
+    def __init__(
+        self,
+        downstream: MetricsStore,
+        max_batch_records: int = 1000,
+        max_delay_seconds: float = 1.0,
+        max_queue_records: int = 100_000,
+    ):
+        self.downstream = downstream
+        self.max_batch_records = max_batch_records
+        self.max_delay_seconds = max_delay_seconds
+        self.max_queue_records = max_queue_records
+
+        self._condition = threading.Condition()
+        self._queue: "OrderedDict[QueueKey, List[QueuedWrite]]" = OrderedDict()
+        self._queued_records = 0
+        # dropped by filters since the last flush
+        self._records_skipped = 0
+        # written after close()
+        self.records_dropped = 0
+        self._oldest_enqueued_at = None
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._results: List[WriteResult] = []
+        self._thread = None
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        """Enqueues the records for the downstream store.
+
+        :returns: a WriteResult counting the records as accepted"""
+        return self._enqueue(self.downstream, table_name, records, multi_measure_name)
+
+    def wrap(self, wrapper: Callable[[MetricsStore], MetricsStore]) -> MetricsStore:
+        """Applies `wrapper` while keeping writes on this writer's queue, so
+        wrappers that act on delivery results (e.g. DedupingMetricsStore) see
+        the real downstream WriteResult"""
+        return _WrappedAsyncMetricsWriter(self, self.downstream).wrap(wrapper)
+
+    def flush(self, timeout_seconds: float = None) -> WriteResult:
+        """Blocks until every record enqueued so far has been written.
+
+        :returns: the combined downstream results since the last flush"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            drained = self._condition.wait_for(
+                lambda: not self._queued_records and not self._in_flight,
+                timeout=timeout_seconds,
+            )
+            if not drained:
+                logger.warning(
+                    f"Flush timed out with {self._queued_records} records queued"
+                )
+            results, self._results = self._results, []
+            skipped, self._records_skipped = self._records_skipped, 0
+
+        return WriteResult(
+            chunks=[chunk for result in results for chunk in result.chunks],
+            records_skipped=skipped + sum(result.records_skipped for result in results),
+        )
+
+    def close(self, timeout_seconds: float = None) -> WriteResult:
+        """Flushes and stops the background thread"""
+        result = self.flush(timeout_seconds)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout_seconds)
+            self._thread = None
+        return result
+
+    def _enqueue(
+        self,
+        downstream: MetricsStore,
+        table_name: str,
+        records: Metrics,
+        multi_measure_name: Optional[str],
+        on_delivered: Sequence[DeliveryCallback] = (),
+        records_skipped: int = 0,
+    ) -> WriteResult:
+        chunk_result = ChunkResult(
+            index=0,
+            record_count=len(records),
+            records_ingested=len(records),
+            attempts=1,
+        )
+        if records_skipped:
+            with self._condition:
+                self._records_skipped += records_skipped
+        if not records:
+            for callback in on_delivered:
+                callback(WriteResult())
+            return WriteResult(chunks=[chunk_result], records_skipped=records_skipped)
+
+        with self._condition:
+            closed = self._closed
+            if closed:
+                self.records_dropped += len(records)
+            else:
+                self._start()
+                # back-pressure: block producers while the queue is full
+                self._condition.wait_for(
+                    lambda: self._queued_records < self.max_queue_records
+                )
+                key = (downstream, table_name, multi_measure_name)
+                self._queue.setdefault(key, []).append((records, on_delivered))
+                self._queued_records += len(records)
+                if self._oldest_enqueued_at is None:
+                    self._oldest_enqueued_at = time.monotonic()
+                self._condition.notify_all()
+        if closed:
+            # callbacks run outside the lock, as they do on the worker thread
+            return self._drop(table_name, records, on_delivered)
+
+        return WriteResult(chunks=[chunk_result], records_skipped=records_skipped)
+
+    def _drop(
+        self,
+        table_name: str,
+        records: Metrics,
+        on_delivered: Sequence[DeliveryCallback],
+    ) -> WriteResult:
+        # e.g. a scraper that outlived its timeout, writing after the
+        # invocation that started it closed the writer. Reported as failed so
+        # filters don't record them as delivered
+        logger.warning(
+            f"Dropping {len(records)} {table_name} records written after close"
+        )
+        result = WriteResult(
+            chunks=[
+                ChunkResult(
+                    index=0,
+                    record_count=len(records),
+                    attempts=0,
+                    error="AsyncMetricsWriter is closed",
+                )
+            ]
+        )
+        for callback in on_delivered:
+            callback(result)
+        return result
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="async-metrics-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._ready():
+                    if self._closed and not self._queued_records:
+                        return
+                    self._condition.wait(self._wait_seconds())
+                queue, self._queue = self._queue, OrderedDict()
+                self._in_flight = self._queued_records
+                self._queued_records = 0
+                self._oldest_enqueued_at = None
+                self._flush_requested = False
+                # unblock producers waiting on a full queue
+                self._condition.notify_all()
+
+            results = [self._write(key, parts) for key, parts in queue.items()]
+
+            with self._condition:
+                self._results.extend(results)
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def _ready(self) -> bool:
+        if not self._queued_records:
+            return False
+        return (
+            self._flush_requested
+            or self._closed
+            or self._queued_records >= self.max_batch_records
+            or time.monotonic() - self._oldest_enqueued_at >= self.max_delay_seconds
+        )
+
+    def _wait_seconds(self) -> Optional[float]:
+        if self._oldest_enqueued_at is None:
+            return None
+        age = time.monotonic() - self._oldest_enqueued_at
+        return max(0.0, self.max_delay_seconds - age)
+
+    @classmethod
+    def _write(cls, key: QueueKey, parts: List[QueuedWrite]) -> WriteResult:
+        downstream, table_name, multi_measure_name = key
+        if len(parts) == 1:
+            records = parts[0][0]
+        else:
+            records = MetricBatch()
+            for part, _ in parts:
+                records.extend(part)
+
+        try:
+            if multi_measure_name:
+                result = downstream.write_metrics(
+                    table_name, records, multi_measure_name=multi_measure_name
+                )
+            else:
+                result = downstream.write_metrics(table_name, records)
+        except Exception as err:
+            logger.error(f"Async write of {len(records)} records failed: {err}")
+            result = WriteResult(
+                chunks=[
+                    ChunkResult(
+                        index=0, record_count=len(records), attempts=1, error=str(err)
+                    )
+                ]
+            )
+
+        # failures can't be attributed to a part, so any failure counts as a
+        # failure of every part, which then re-fetches them next run
+        for _, on_delivered in parts:
+            for callback in on_delivered:
+                try:
+                    callback(result)
+                except Exception as err:
+                    logger.error(f"Delivery callback failed: {err}")
+        return result
+
+
+class _WrappedAsyncMetricsWriter(MetricsStore):
+    """Writes through an AsyncMetricsWriter's queue to a different downstream,
+    after filtering records with `filters`, outermost first"""
+
+    def __init__(
+        self,
+        writer: AsyncMetricsWriter,
+        downstream: MetricsStore,
+        filters: Sequence[FilteringMetricsStore] = (),
+    ):
+        self.writer = writer
+        self.downstream = downstream
+        self.filters = filters
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        callbacks = []
+        skipped = 0
+        for store in self.filters:
+            new_records, on_delivered = store.prepare(table_name, records)
+            skipped += len(records) - len(new_records)
+            records = new_records
+            callbacks.append(on_delivered)
+        # innermost first, like nested write_metrics calls
+        callbacks.reverse()
+        return self.writer._enqueue(
+            self.downstream,
+            table_name,
+            records,
+            multi_measure_name,
+            on_delivered=callbacks,
+            records_skipped=skipped,
+        )
+
+    def wrap(self, wrapper: Callable[[MetricsStore], MetricsStore]) -> MetricsStore:
+        store = wrapper(self.downstream)
+        if isinstance(store, FilteringMetricsStore) and store.downstream is (
+            self.downstream
+        ):
+            # filtered on enqueue, so writes keep sharing the downstream's queue
+            return _WrappedAsyncMetricsWriter(
+                self.writer, self.downstream, [store, *self.filters]
+            )
+        return _WrappedAsyncMetricsWriter(self.writer, store, self.filters)
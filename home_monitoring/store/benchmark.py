@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import time
+
+from home_monitoring.models.metrics import MetricBatch
+from home_monitoring.store.memory import InMemoryMetricsStore
+from home_monitoring.store.metrics_store import MetricsStore
+from home_monitoring.store.parquet import ParquetMetricsStore
+from home_monitoring.store.sqlite import SqliteMetricsStore
+
+STORES = ("memory", "sqlite", "parquet")
+
+
+def build_batch(num_records: int, num_series: int = 20) -> MetricBatch:
+    """A synthetic scrape: `num_series` sensors reporting once a minute"""
+    batch = MetricBatch()
+    dimension_set_ids = [
+        batch.intern_dimensions([("name", f"sensor-{i}")]) for i in range(num_series)
+    ]
+    start = int(time.time()) - num_records * 60 // num_series
+    for i in range(num_records):
+        batch.append(
+            "temperature",
+            start + (i // num_series) * 60,
+            20 + (i % 100) / 10,
+            dimension_set_id=dimension_set_ids[i % num_series],
+        )
+    return batch
+
+
+def create_store(name: str, directory: str) -> MetricsStore:
+    if name == "memory":
+        return InMemoryMetricsStore(max_records=1_000_000)
+    elif name == "sqlite":
+        return SqliteMetricsStore(os.path.join(directory, "metrics.db"))
+    elif name == "parquet":
+        return ParquetMetricsStore(os.path.join(directory, "metrics"))
+    raise ValueError(f"Unknown store '{name}', must be one of {STORES}")
+
+
+def run(store: MetricsStore, batch: MetricBatch, batch_size: int) -> float:
+    """Writes `batch` in slices of `batch_size` records.
+
+    :returns: throughput in records per second"""
+    slices = [
+        MetricBatch.from_records(
+            batch[i] for i in range(start, min(start + batch_size, len(batch)))
+        )
+        for start in range(0, len(batch), batch_size)
+    ]
+
+    started = time.perf_counter()
+    for records in slices:
+        store.write_metrics("metrics", records)
+    return len(batch) / (time.perf_counter() - started)
+
+
+# Measures local store write throughput without AWS, e.g.
+#   python -m home_monitoring.store.benchmark sqlite 100000 1000
+if __name__ == "__main__":
+    names = sys.argv[1:2] or STORES
+    num_records = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    batch = build_batch(num_records)
+    for name in names:
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                store = create_store(name, directory)
+            except ImportError as err:
+                print(f"{name:>8}: skipped ({err})")
+                continue
+            throughput = run(store, batch, batch_size)
+            print(f"{name:>8}: {throughput:,.0f} records/s ({num_records} records)")
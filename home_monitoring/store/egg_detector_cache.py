@@ -1,8 +1,6 @@
 from dataclasses import dataclass
 from typing import List
 
-from botocore.exceptions import ClientError
-
 from home_monitoring import logger
 from home_monitoring import config
 
@@ -36,6 +34,10 @@ class EggDetectorCacheReader:
         self.dynamodb = dynamodb
 
     def read(self) -> List[NestingBoxCacheRecord]:
+        # imported here so the egg detector Lambda doesn't pay for botocore
+        # until it reads
+        from botocore.exceptions import ClientError
+
         table_name = "egg_detector_cache"
 
         try:
@@ -0,0 +1,173 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from home_monitoring.models.metrics import MetricRecord
+
+# Upper bounds of the write latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+METRIC_PREFIX = "pipeline_"
+
+
+@dataclass
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every call"""
+
+    bounds_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS
+    # one extra bucket for anything above the largest bound
+    counts: List[int] = field(default_factory=list)
+    count: int = 0
+    sum_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (len(self.bounds_ms) + 1)
+
+    def observe(self, latency_ms: float) -> None:
+        self.counts[bisect_left(self.bounds_ms, latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket containing the q-th percentile (0-100),
+        capped at the observed maximum"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds_ms, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    @property
+    def mean_ms(self) -> float:
+        return self.sum_ms / self.count if self.count else 0.0
+
+
+@dataclass
+class StoreStatsSnapshot:
+    calls: int = 0
+    records: int = 0
+    bytes: int = 0
+    max_records_per_call: int = 0
+    records_rejected: int = 0
+    throttled_calls: int = 0
+    retries: int = 0
+    errors: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def records_per_call(self) -> float:
+        return self.records / self.calls if self.calls else 0.0
+
+    @property
+    def bytes_per_call(self) -> float:
+        return self.bytes / self.calls if self.calls else 0.0
+
+
+class StoreStats:
+    """Thread-safe counters describing a store's write calls.
+
+    Read them with snapshot() (e.g. in tests), or write them back as
+    pipeline_* metrics with to_metric_records()"""
+
+    def __init__(self, store_name: str):
+        self.store_name = store_name
+        self.lock = threading.Lock()
+        self._stats = StoreStatsSnapshot()
+
+    def record_call(
+        self,
+        latency_seconds: float,
+        records: int,
+        num_bytes: int,
+        records_rejected: int = 0,
+        throttled: bool = False,
+        error: bool = False,
+    ) -> None:
+        """Records a single write API call, successful or not"""
+        with self.lock:
+            stats = self._stats
+            stats.calls += 1
+            stats.records += records
+            stats.bytes += num_bytes
+            stats.max_records_per_call = max(stats.max_records_per_call, records)
+            stats.records_rejected += records_rejected
+            stats.throttled_calls += int(throttled)
+            stats.errors += int(error and not throttled)
+            stats.latency.observe(latency_seconds * 1000)
+
+    def record_retry(self) -> None:
+        with self.lock:
+            self._stats.retries += 1
+
+    def snapshot(self) -> StoreStatsSnapshot:
+        with self.lock:
+            stats = self._stats
+            return StoreStatsSnapshot(
+                calls=stats.calls,
+                records=stats.records,
+                bytes=stats.bytes,
+                max_records_per_call=stats.max_records_per_call,
+                records_rejected=stats.records_rejected,
+                throttled_calls=stats.throttled_calls,
+                retries=stats.retries,
+                errors=stats.errors,
+                latency=LatencyHistogram(
+                    counts=list(stats.latency.counts),
+                    count=stats.latency.count,
+                    sum_ms=stats.latency.sum_ms,
+                    max_ms=stats.latency.max_ms,
+                ),
+            )
+
+    def reset(self) -> StoreStatsSnapshot:
+        """Resets all counters.
+
+        :returns: the counters before the reset"""
+        with self.lock:
+            stats, self._stats = self._stats, StoreStatsSnapshot()
+        return stats
+
+    def to_metric_records(
+        self, ts: Optional[int] = None, dimensions: List[Tuple[str, str]] = None
+    ) -> List[MetricRecord]:
+        """The current counters as pipeline_* metric records. Returns nothing
+        if no calls were made"""
+        stats = self.snapshot()
+        if not stats.calls:
+            return []
+
+        ts = int(time.time()) if ts is None else ts
+        values = {
+            "write_calls": stats.calls,
+            "write_records": stats.records,
+            "write_bytes": stats.bytes,
+            "write_records_per_call": stats.records_per_call,
+            "write_max_records_per_call": stats.max_records_per_call,
+            "write_bytes_per_call": stats.bytes_per_call,
+            "write_records_rejected": stats.records_rejected,
+            "write_throttled_calls": stats.throttled_calls,
+            "write_retries": stats.retries,
+            "write_errors": stats.errors,
+            "write_latency_ms_avg": stats.latency.mean_ms,
+            "write_latency_ms_p50": stats.latency.percentile(50),
+            "write_latency_ms_p95": stats.latency.percentile(95),
+            "write_latency_ms_p99": stats.latency.percentile(99),
+            "write_latency_ms_max": stats.latency.max_ms,
+        }
+
+        records = []
+        for name, value in values.items():
+            record = MetricRecord(f"{METRIC_PREFIX}{name}", ts, value)
+            record.add_dimension("store", self.store_name)
+            for dimension_name, dimension_value in dimensions or []:
+                record.add_dimension(dimension_name, dimension_value)
+            records.append(record)
+        return records
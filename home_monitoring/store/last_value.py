@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import boto3
+
+from home_monitoring import logger
+from home_monitoring.config import STATE_TABLE_NAME
+from home_monitoring.models.metrics import MetricRecord, Metrics
+from home_monitoring.store.metrics_store import (
+    DeliveryCallback,
+    FilteringMetricsStore,
+    MetricsStore,
+    WriteResult,
+)
+
+logger = logger.get(__name__)
+
+# (time, value) of the last record written for a series
+LastValue = Tuple[int, float]
+
+
+def series_key(table_name: str, record: MetricRecord) -> str:
+    """Identifies a series by table, measure name and dimension set"""
+    dimensions = sorted((d["Name"], str(d["Value"])) for d in record.dimensions)
+    return json.dumps([table_name, record.name, dimensions], separators=(",", ":"))
+
+
+class LastValueIndex(ABC):
+    """Persistent index of the last (time, value) written per series"""
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str]) -> Dict[str, LastValue]:
+        pass
+
+    @abstractmethod
+    def put_many(self, values: Dict[str, LastValue]) -> None:
+        pass
+
+
+class DynamoLastValueIndex(LastValueIndex):
+    """Stores last values in the shared state table, for use from Lambda"""
+
+    KEY_PREFIX = "last_value#"
+    BATCH_GET_SIZE = 100
+
+    def __init__(self, dynamodb=None, table_name: str = STATE_TABLE_NAME):
+        self._dynamodb = dynamodb
+        self.table_name = table_name
+
+    @property
+    def dynamodb(self):
+        # created lazily so that scrapers which don't dedupe pay nothing
+        if self._dynamodb is None:
+            self._dynamodb = boto3.resource("dynamodb", region_name="us-west-2")
+        return self._dynamodb
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, LastValue]:
+        keys = list(keys)
+        values = {}
+        for i in range(0, len(keys), self.BATCH_GET_SIZE):
+            request = {
+                self.table_name: {
+                    "Keys": [
+                        {"state_key": self.KEY_PREFIX + key}
+                        for key in keys[i : i + self.BATCH_GET_SIZE]
+                    ],
+                    "ConsistentRead": True,
+                }
+            }
+            while request:
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response["Responses"].get(self.table_name, []):
+                    key = item["state_key"][len(self.KEY_PREFIX) :]
+                    values[key] = (int(item["ts"]), float(item["value"]))
+                request = response.get("UnprocessedKeys")
+        return values
+
+    def put_many(self, values: Dict[str, LastValue]) -> None:
+        table = self.dynamodb.Table(self.table_name)
+        with table.batch_writer() as batch:
+            for key, (ts, value) in values.items():
+                batch.put_item(
+                    Item={
+                        "state_key": self.KEY_PREFIX + key,
+                        "ts": ts,
+                        # stored as a string to avoid float => Decimal conversion
+                        "value": repr(value),
+                    }
+                )
+
+
+class FileLastValueIndex(LastValueIndex):
+    """Stores last values in a local JSON file, for use on-prem"""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self.values = None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, LastValue]:
+        values = self._load()
+        return {key: tuple(values[key]) for key in keys if key in values}
+
+    def put_many(self, values: Dict[str, LastValue]) -> None:
+        all_values = self._load()
+        all_values.update(values)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # write + rename so a crash never leaves a truncated index behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(all_values, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> dict:
+        if self.values is None:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    self.values = json.load(f)
+            else:
+                self.values = {}
+        return self.values
+
+
+class DedupingMetricsStore(FilteringMetricsStore):
+    """Drops records whose time and value match the last value persisted for
+    their series before delegating to the downstream store. Useful for
+    scrapers that re-read slow-reporting sensors on every run"""
+
+    def __init__(self, downstream: MetricsStore, index: LastValueIndex):
+        super().__init__(downstream)
+        self.index = index
+
+    def prepare(
+        self, table_name: str, records: Metrics
+    ) -> Tuple[Metrics, DeliveryCallback]:
+        keyed_records = [(series_key(table_name, r), r) for r in records]
+        last_values = self.index.get_many(set(k for k, _ in keyed_records))
+
+        new_records: List[MetricRecord] = []
+        latest: Dict[str, LastValue] = {}
+        for key, record in keyed_records:
+            value = (record.time, float(record.value))
+            last_value = last_values.get(key)
+            if last_value == value:
+                continue
+            new_records.append(record)
+            if (last_value is None or record.time >= last_value[0]) and (
+                key not in latest or record.time >= latest[key][0]
+            ):
+                latest[key] = value
+
+        skipped = len(keyed_records) - len(new_records)
+        if skipped:
+            logger.info(f"Skipping {skipped} unchanged records")
+
+        def on_delivered(result: WriteResult) -> None:
+            if latest and not result.records_failed:
+                self.index.put_many(latest)
+
+        return new_records, on_delivered
@@ -0,0 +1,43 @@
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from home_monitoring.models.metrics import MetricRecord, Metrics
+from home_monitoring.store.metrics_store import (
+    ChunkResult,
+    MetricsStore,
+    WriteResult,
+)
+
+
+class InMemoryMetricsStore(MetricsStore):
+    """Bounded, in-memory ring buffer for tests and benchmarks. Once
+    `max_records` are held, the oldest records are evicted"""
+
+    def __init__(self, max_records: int = 100_000):
+        self.max_records = max_records
+        self.buffer: Deque[Tuple[str, MetricRecord]] = deque(maxlen=max_records)
+        self.write_calls = 0
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        self.write_calls += 1
+        self.buffer.extend((table_name, record) for record in records)
+        chunk_result = ChunkResult(
+            index=0,
+            record_count=len(records),
+            records_ingested=len(records),
+            attempts=1,
+        )
+        return WriteResult(chunks=[chunk_result])
+
+    def records(self, table_name: Optional[str] = None) -> List[MetricRecord]:
+        """The buffered records, oldest first"""
+        return [r for t, r in self.buffer if table_name is None or t == table_name]
+
+    def clear(self) -> None:
+        self.buffer.clear()
+        self.write_calls = 0
+
+    def __len__(self) -> int:
+        return len(self.buffer)
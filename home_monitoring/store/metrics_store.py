@@ -1,12 +1,111 @@
-from abc import ABC
-from typing import List
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
 
-from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.models.metrics import MetricRecord, Metrics
+
+
+@dataclass
+class ChunkResult:
+    """Outcome of a single write call covering one chunk of a batch"""
+
+    index: int
+    record_count: int
+    records_ingested: int = 0
+    # records permanently rejected by the store, e.g. version conflicts
+    records_rejected: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def records_failed(self) -> int:
+        """Records that were neither ingested nor permanently rejected, e.g.
+        because retries were exhausted"""
+        return self.record_count - self.records_ingested - self.records_rejected
+
+
+@dataclass
+class WriteResult:
+    """Per-chunk outcome of a write_metrics call"""
+
+    chunks: List[ChunkResult] = field(default_factory=list)
+    # records dropped before writing because they were already persisted
+    records_skipped: int = 0
+
+    @property
+    def records_ingested(self) -> int:
+        return sum(c.records_ingested for c in self.chunks)
+
+    @property
+    def records_rejected(self) -> int:
+        return sum(c.records_rejected for c in self.chunks)
+
+    @property
+    def records_failed(self) -> int:
+        return sum(c.records_failed for c in self.chunks)
 
 
 class MetricsStore(ABC):
-    def write_metric(self, record: MetricRecord) -> None:
+    """Destination for scraped metrics, e.g. Timestream or a local file"""
+
+    def write_metric(self, table_name: str, record: MetricRecord) -> WriteResult:
+        return self.write_metrics(table_name, [record])
+
+    @abstractmethod
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        """Writes the records to the given table.
+
+        :param multi_measure_name: groups records sharing a timestamp and
+            dimension set under this measure name, for stores that support it
+        :returns: the per-chunk outcome of the write"""
         pass
 
-    def write_metrics(self, records: List[MetricRecord]) -> None:
+    def wrap(
+        self, wrapper: Callable[["MetricsStore"], "MetricsStore"]
+    ) -> "MetricsStore":
+        """Decorates this store, e.g. with a DedupingMetricsStore. Stores that
+        defer writes override this to apply `wrapper` where delivery happens"""
+        return wrapper(self)
+
+
+# Called with the downstream result of writing a FilteringMetricsStore's
+# filtered records
+DeliveryCallback = Callable[[WriteResult], None]
+
+
+class FilteringMetricsStore(MetricsStore):
+    """Wrapper that drops records already persisted before delegating to the
+    downstream store, and records what was delivered once the write succeeds.
+
+    The two steps are separate so that stores deferring writes (see
+    AsyncMetricsWriter) can filter when records are queued and batch what
+    remains of many wrappers' records into a single downstream write"""
+
+    def __init__(self, downstream: MetricsStore):
+        self.downstream = downstream
+
+    @abstractmethod
+    def prepare(
+        self, table_name: str, records: Metrics
+    ) -> Tuple[Metrics, DeliveryCallback]:
+        """Filters the records to write.
+
+        :returns: the records to write, and a callback to run with the
+            downstream result of writing them"""
         pass
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        new_records, on_delivered = self.prepare(table_name, records)
+        if new_records:
+            result = self.downstream.write_metrics(
+                table_name, new_records, multi_measure_name=multi_measure_name
+            )
+        else:
+            result = WriteResult()
+        result.records_skipped += len(records) - len(new_records)
+        on_delivered(result)
+        return result
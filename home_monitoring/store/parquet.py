@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+import json
+import os
+from typing import Optional
+import uuid
+
+from home_monitoring import logger
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.store.metrics_store import (
+    ChunkResult,
+    MetricsStore,
+    WriteResult,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    # optional dependency, only needed for local archives
+    pa = None
+    pq = None
+
+logger = logger.get(__name__)
+
+
+class ParquetMetricsStore(MetricsStore):
+    """Partitioned Parquet archive for cheap bulk storage and offline analysis.
+
+    Each write_metrics call appends one file per (measure, UTC date) partition:
+
+        <root>/<table_name>/measure_name=<measure>/date=<YYYY-MM-DD>/<uuid>.parquet
+
+    Rows are stored columnar as (time, value, dimensions), with dimensions
+    JSON encoded. Records are written as single measures regardless of
+    `multi_measure_name`. Requires pyarrow"""
+
+    def __init__(self, root: str, compression: str = "zstd"):
+        if pa is None:
+            raise ImportError("ParquetMetricsStore requires pyarrow")
+        self.root = os.path.expanduser(root)
+        self.compression = compression
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        partitions = {}
+        for record in records:
+            date = datetime.fromtimestamp(record.time, timezone.utc).date()
+            columns = partitions.setdefault(
+                (record.name, date.isoformat()), ([], [], [])
+            )
+            columns[0].append(int(record.time))
+            columns[1].append(float(record.value))
+            columns[2].append(
+                json.dumps(
+                    [[d["Name"], str(d["Value"])] for d in record.dimensions],
+                    separators=(",", ":"),
+                )
+            )
+
+        for (measure_name, date), (times, values, dimensions) in partitions.items():
+            directory = os.path.join(
+                self.root, table_name, f"measure_name={measure_name}", f"date={date}"
+            )
+            os.makedirs(directory, exist_ok=True)
+            table = pa.table(
+                {
+                    "time": pa.array(times, pa.int64()),
+                    "value": pa.array(values, pa.float64()),
+                    "dimensions": pa.array(dimensions, pa.string()),
+                }
+            )
+            pq.write_table(
+                table,
+                os.path.join(directory, f"{uuid.uuid4().hex}.parquet"),
+                compression=self.compression,
+            )
+
+        logger.debug(
+            f"Wrote {len(records)} records to {len(partitions)} partition(s) "
+            f"under {os.path.join(self.root, table_name)}"
+        )
+        chunk_result = ChunkResult(
+            index=0,
+            record_count=len(records),
+            records_ingested=len(records),
+            attempts=1,
+        )
+        return WriteResult(chunks=[chunk_result])
+
+    def query(
+        self,
+        table_name: str,
+        measure_name: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> MetricBatch:
+        """Reads records ordered by time, pruning partitions by measure and
+        date before opening any files.
+
+        :param since: inclusive lower bound, in epoch seconds
+        :param until: exclusive upper bound, in epoch seconds"""
+        since_date = self._date(since) if since is not None else None
+        until_date = self._date(until) if until is not None else None
+
+        rows = []
+        table_root = os.path.join(self.root, table_name)
+        for measure_dir in self._partitions(table_root, "measure_name"):
+            measure = measure_dir.split("=", 1)[1]
+            if measure_name is not None and measure != measure_name:
+                continue
+            measure_root = os.path.join(table_root, measure_dir)
+            for date_dir in self._partitions(measure_root, "date"):
+                date = date_dir.split("=", 1)[1]
+                if (since_date and date < since_date) or (
+                    until_date and date > until_date
+                ):
+                    continue
+                date_root = os.path.join(measure_root, date_dir)
+                for file_name in sorted(os.listdir(date_root)):
+                    table = pq.read_table(os.path.join(date_root, file_name))
+                    for ts, value, dimensions in zip(
+                        table.column("time").to_pylist(),
+                        table.column("value").to_pylist(),
+                        table.column("dimensions").to_pylist(),
+                    ):
+                        if (since is None or ts >= since) and (
+                            until is None or ts < until
+                        ):
+                            rows.append((ts, measure, value, dimensions))
+
+        batch = MetricBatch()
+        rows.sort(key=lambda row: row[0])
+        for ts, measure, value, dimensions in rows:
+            batch.append(measure, ts, value, tuple(map(tuple, json.loads(dimensions))))
+        return batch
+
+    @staticmethod
+    def _partitions(directory: str, key: str) -> list:
+        if not os.path.isdir(directory):
+            return []
+        return sorted(d for d in os.listdir(directory) if d.startswith(f"{key}="))
+
+    @staticmethod
+    def _date(ts: int) -> str:
+        return datetime.fromtimestamp(ts, timezone.utc).date().isoformat()
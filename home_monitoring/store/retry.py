@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+import random
+import threading
+import time
+
+# Substrings of Timestream RejectedRecords reasons that will never succeed on
+# resubmission, e.g. timestamps outside the memory/magnetic store window or
+# records that would be superseded by an existing, newer version
+# See https://docs.aws.amazon.com/timestream/latest/developerguide/API_RejectedRecord.html  # noqa
+NON_RETRYABLE_REASONS = (
+    "outside the time range",
+    "duplicate",
+    "exceeds",
+    "invalid",
+    "different measure value",
+    "schema",
+)
+# Write errors after which resubmitting the same records can never succeed
+NON_RETRYABLE_ERRORS = ("ValidationException",)
+# Write errors meaning the store wasn't reached or was overloaded, which say
+# nothing about whether the records themselves can be written
+TRANSIENT_ERRORS = (
+    "ThrottlingException",
+    "InternalServerException",
+    "ConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "Could not connect",
+)
+
+
+def is_retryable_rejection(rejected_record: dict) -> bool:
+    """Whether a RejectedRecords entry may succeed if resubmitted"""
+    if "ExistingVersion" in rejected_record:
+        # a record with a higher version already exists => last writer won
+        return False
+
+    reason = rejected_record.get("Reason", "").lower()
+    return not any(marker in reason for marker in NON_RETRYABLE_REASONS)
+
+
+def is_retryable_error(error: str) -> bool:
+    """Whether a failed write, e.g. a ChunkResult.error, may succeed if the
+    same records are resubmitted"""
+    return not any(code in error for code in NON_RETRYABLE_ERRORS)
+
+
+def is_transient_error(error: str) -> bool:
+    """Whether a failed write failed because of the store or the network,
+    rather than the records written"""
+    return any(name in error for name in TRANSIENT_ERRORS)
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay_seconds: float = 0.2
+    max_delay_seconds: float = 10.0
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Exponential backoff with "full jitter" for the given (1-based) attempt
+        See https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/"""  # noqa
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * 2**attempt)
+        return random.uniform(0, ceiling)
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to pace API calls across worker threads"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Blocks until `tokens` are available.
+
+        :returns: the number of seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.updated_at
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
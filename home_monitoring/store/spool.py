@@ -0,0 +1,371 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+import zlib
+
+from home_monitoring import logger
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.store.metrics_store import (
+    ChunkResult,
+    MetricsStore,
+    WriteResult,
+)
+from home_monitoring.store.retry import is_retryable_error, is_transient_error
+
+logger = logger.get(__name__)
+
+
+class SpoolMetricsStore(MetricsStore):
+    """Durable, append-only local spool in front of another MetricsStore.
+
+    Writes are committed (and fsync'd) to a SQLite file, one transaction per
+    write_metrics batch, and return immediately. A background thread drains the
+    spool into the downstream store in large batches, deleting rows only once
+    they were delivered, so delivery is at-least-once. When the spool grows past
+    `max_records`, the oldest batches are discarded to bound disk usage.
+
+    Batches that can never be delivered, because the downstream store rejected
+    them as invalid or they failed `max_attempts` drains for reasons other than
+    connectivity, are moved to the spool_dead_letter table so they don't block
+    the batches behind them. It keeps the latest `max_dead_letter_records`,
+    discarding the oldest."""
+
+    def __init__(
+        self,
+        path: str,
+        downstream: MetricsStore,
+        max_records: int = 500_000,
+        drain_batch_size: int = 1000,
+        drain_interval_seconds: float = 30,
+        max_drain_interval_seconds: float = 600,
+        compress: bool = True,
+        max_attempts: int = 10,
+        max_dead_letter_records: int = 50_000,
+    ):
+        self.path = os.path.expanduser(path)
+        self.downstream = downstream
+        self.max_records = max_records
+        self.drain_batch_size = drain_batch_size
+        self.drain_interval_seconds = drain_interval_seconds
+        self.max_drain_interval_seconds = max_drain_interval_seconds
+        self.compress = compress
+        self.max_attempts = max_attempts
+        self.max_dead_letter_records = max_dead_letter_records
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # fsync on every commit, i.e. once per spooled batch
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "  id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            "  table_name TEXT NOT NULL,"
+            "  multi_measure_name TEXT,"
+            "  record_count INTEGER NOT NULL,"
+            "  compressed INTEGER NOT NULL,"
+            "  payload BLOB NOT NULL,"
+            "  attempts INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(spool)")]
+        if "attempts" not in columns:
+            # spool created before attempts were tracked
+            self.conn.execute(
+                "ALTER TABLE spool ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+            )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool_dead_letter ("
+            "  id INTEGER PRIMARY KEY,"
+            "  table_name TEXT NOT NULL,"
+            "  multi_measure_name TEXT,"
+            "  record_count INTEGER NOT NULL,"
+            "  compressed INTEGER NOT NULL,"
+            "  payload BLOB NOT NULL,"
+            "  attempts INTEGER NOT NULL,"
+            "  error TEXT,"
+            "  dead_lettered_at REAL NOT NULL"
+            ")"
+        )
+        self.conn.commit()
+
+        self._stop = threading.Event()
+        self._drain_thread = None
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        """Appends the records to the spool. Delivery to the downstream store
+        happens asynchronously in drain()"""
+        chunk_result = ChunkResult(index=0, record_count=len(records), attempts=1)
+        if records:
+            payload = self._serialize(records)
+            with self.lock:
+                self.conn.execute(
+                    "INSERT INTO spool (table_name, multi_measure_name, "
+                    "record_count, compressed, payload) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        table_name,
+                        multi_measure_name,
+                        len(records),
+                        int(self.compress),
+                        payload,
+                    ),
+                )
+                dropped = self._trim_oldest("spool", self.max_records)
+                self.conn.commit()
+            if dropped:
+                logger.warning(
+                    f"Spool exceeded {self.max_records} records, "
+                    f"dropped {dropped} oldest records"
+                )
+            chunk_result.records_ingested = len(records)
+
+        return WriteResult(chunks=[chunk_result])
+
+    def pending_records(self) -> int:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(record_count), 0) FROM spool"
+            ).fetchone()
+        return row[0]
+
+    def dead_letter_records(self) -> int:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(record_count), 0) FROM spool_dead_letter"
+            ).fetchone()
+        return row[0]
+
+    def drain(self) -> int:
+        """Delivers spooled batches to the downstream store until the spool is
+        empty or a delivery fails and should be retried later. Undeliverable
+        batches are dead-lettered and draining continues behind them.
+
+        :returns: the number of records delivered"""
+        delivered = 0
+        # after a combined batch failed for good, spooled batches are retried
+        # one at a time until the bad one is dead-lettered
+        isolate = False
+        while not self._stop.is_set():
+            rows = self._read_batch(max_rows=1 if isolate else None)
+            if not rows:
+                break
+
+            _, table_name, multi_measure_name, _, _ = rows[0]
+            records = MetricBatch()
+            for _, _, _, compressed, payload in rows:
+                self._deserialize(payload, compressed, records)
+
+            error = self._deliver(table_name, records, multi_measure_name)
+            ids = [row[0] for row in rows]
+            if error is None:
+                with self.lock:
+                    self.conn.executemany(
+                        "DELETE FROM spool WHERE id = ?", [(id,) for id in ids]
+                    )
+                    self.conn.commit()
+                delivered += len(records)
+                continue
+
+            if is_transient_error(error):
+                logger.warning(f"Spool drain failed, will retry: {error}")
+                break
+
+            attempts = self._record_attempt(ids)
+            if is_retryable_error(error) and attempts < self.max_attempts:
+                logger.warning(
+                    f"Spool drain failed for {len(records)} records, will retry: "
+                    f"{error}"
+                )
+                break
+            if len(rows) > 1:
+                isolate = True
+                continue
+            self._dead_letter(ids, error)
+            isolate = False
+
+        if delivered:
+            logger.info(f"Drained {delivered} spooled records")
+        return delivered
+
+    def start(self) -> None:
+        """Starts the background drain thread"""
+        if self._drain_thread is None:
+            self._stop.clear()
+            self._drain_thread = threading.Thread(
+                target=self._drain_loop, name="spool-drain", daemon=True
+            )
+            self._drain_thread.start()
+
+    def close(self, drain_timeout_seconds: float = 10) -> None:
+        """Stops the background thread and makes a final, bounded attempt to
+        drain the spool. Anything left over is delivered by the next process"""
+        if self._drain_thread is not None:
+            self._stop.set()
+            self._drain_thread.join()
+            self._drain_thread = None
+            self._stop.clear()
+
+        deadline = time.monotonic() + drain_timeout_seconds
+        while time.monotonic() < deadline and self.pending_records():
+            if not self.drain():
+                break
+
+        remaining = self.pending_records()
+        if remaining:
+            logger.info(f"{remaining} records remain spooled at {self.path}")
+        with self.lock:
+            self.conn.close()
+
+    def _deliver(
+        self, table_name: str, records: MetricBatch, multi_measure_name: str
+    ) -> Optional[str]:
+        """Writes the records downstream.
+
+        :returns: the error, if any of them weren't delivered"""
+        try:
+            if multi_measure_name:
+                result = self.downstream.write_metrics(
+                    table_name, records, multi_measure_name=multi_measure_name
+                )
+            else:
+                result = self.downstream.write_metrics(table_name, records)
+        except Exception as err:
+            return f"{type(err).__name__}: {err}"
+
+        if not result.records_failed:
+            return None
+        errors = [c.error for c in result.chunks if c.records_failed and c.error]
+        return errors[0] if errors else f"{result.records_failed} records failed"
+
+    def _record_attempt(self, ids: List[int]) -> int:
+        """Counts a failed delivery of the spooled batches
+
+        :returns: the most attempts made for any of them"""
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE spool SET attempts = attempts + 1 WHERE id = ?",
+                [(id,) for id in ids],
+            )
+            self.conn.commit()
+            return self.conn.execute(
+                f"SELECT MAX(attempts) FROM spool WHERE id IN "
+                f"({','.join('?' * len(ids))})",
+                ids,
+            ).fetchone()[0]
+
+    def _dead_letter(self, ids: List[int], error: str) -> None:
+        """Moves undeliverable batches out of the spool"""
+        with self.lock:
+            for id in ids:
+                row = self.conn.execute(
+                    "SELECT table_name, record_count, attempts FROM spool "
+                    "WHERE id = ?",
+                    (id,),
+                ).fetchone()
+                if row is None:
+                    # dropped by _trim_oldest() while it was being delivered
+                    continue
+                self.conn.execute(
+                    "INSERT INTO spool_dead_letter (id, table_name, "
+                    "multi_measure_name, record_count, compressed, payload, "
+                    "attempts, error, dead_lettered_at) "
+                    "SELECT id, table_name, multi_measure_name, record_count, "
+                    "compressed, payload, attempts, ?, ? FROM spool WHERE id = ?",
+                    (error, time.time(), id),
+                )
+                self.conn.execute("DELETE FROM spool WHERE id = ?", (id,))
+                table_name, record_count, attempts = row
+                logger.error(
+                    f"Dead-lettered {record_count} spooled {table_name} records "
+                    f"after {attempts} attempts: {error}"
+                )
+            dropped = self._trim_oldest(
+                "spool_dead_letter", self.max_dead_letter_records
+            )
+            self.conn.commit()
+        if dropped:
+            logger.warning(
+                f"Dead letter table exceeded {self.max_dead_letter_records} "
+                f"records, dropped {dropped} oldest records"
+            )
+
+    def _drain_loop(self) -> None:
+        interval = self.drain_interval_seconds
+        while not self._stop.is_set():
+            self.drain()
+            if self.pending_records():
+                # downstream is unreachable or failing => back off
+                interval = min(interval * 2, self.max_drain_interval_seconds)
+            else:
+                interval = self.drain_interval_seconds
+            self._stop.wait(interval)
+
+    def _read_batch(self, max_rows: int = None) -> List[Tuple]:
+        """Reads the oldest spooled batches sharing a table and multi-measure
+        name, up to roughly `drain_batch_size` records"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT id, table_name, multi_measure_name, compressed, payload, "
+                "record_count FROM spool ORDER BY id"
+            )
+            rows = []
+            count = 0
+            for row in cursor:
+                record_count = row[-1]
+                if rows and (
+                    row[1:3] != rows[0][1:3]
+                    or count + record_count > self.drain_batch_size
+                    or len(rows) == max_rows
+                ):
+                    break
+                rows.append(row[:-1])
+                count += record_count
+            cursor.close()
+        return rows
+
+    def _trim_oldest(self, table: str, max_records: int) -> int:
+        """Deletes the oldest batches of `table` (spool or spool_dead_letter)
+        until it holds at most `max_records`. Called with the lock held
+
+        :returns: the number of records deleted"""
+        total = self.conn.execute(
+            f"SELECT COALESCE(SUM(record_count), 0) FROM {table}"
+        ).fetchone()[0]
+        if total <= max_records:
+            return 0
+
+        dropped = 0
+        cursor = self.conn.execute(f"SELECT id, record_count FROM {table} ORDER BY id")
+        ids = []
+        for id, record_count in cursor:
+            if total - dropped <= max_records:
+                break
+            ids.append((id,))
+            dropped += record_count
+        cursor.close()
+
+        self.conn.executemany(f"DELETE FROM {table} WHERE id = ?", ids)
+        return dropped
+
+    def _serialize(self, records: Metrics) -> bytes:
+        payload = json.dumps(
+            [[r.name, r.time, r.value, r.dimensions] for r in records],
+            separators=(",", ":"),
+        ).encode("utf-8")
+        return zlib.compress(payload) if self.compress else payload
+
+    @staticmethod
+    def _deserialize(payload: bytes, compressed: int, batch: MetricBatch) -> None:
+        if compressed:
+            payload = zlib.decompress(payload)
+        for name, ts, value, dimensions in json.loads(payload):
+            batch.append(name, ts, value, dimensions)
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from home_monitoring import logger
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.store.metrics_store import (
+    ChunkResult,
+    MetricsStore,
+    WriteResult,
+)
+
+logger = logger.get(__name__)
+
+# dimension that identifies a device/location across scrapers
+NAME_DIMENSION = "name"
+
+
+class SqliteMetricsStore(MetricsStore):
+    """Embedded SQLite store for local ingestion and replay without AWS.
+
+    One row is stored per measure, indexed on (table, measure, name, time),
+    where name is the value of the record's "name" dimension, if any. Records
+    are written as single measures regardless of `multi_measure_name`. Writing
+    a record with an existing (table, measure, dimensions, time) replaces it,
+    matching Timestream's "last writer wins" upserts"""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "  table_name TEXT NOT NULL,"
+            "  measure_name TEXT NOT NULL,"
+            "  name TEXT,"
+            "  time INTEGER NOT NULL,"
+            "  value REAL NOT NULL,"
+            "  dimensions TEXT NOT NULL,"
+            "  PRIMARY KEY (table_name, measure_name, dimensions, time)"
+            ")"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS metrics_measure_name_time "
+            "ON metrics (table_name, measure_name, name, time)"
+        )
+        self.conn.commit()
+
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        rows = []
+        for record in records:
+            dimensions = {d["Name"]: str(d["Value"]) for d in record.dimensions}
+            rows.append(
+                (
+                    table_name,
+                    record.name,
+                    dimensions.get(NAME_DIMENSION),
+                    int(record.time),
+                    float(record.value),
+                    json.dumps(sorted(dimensions.items()), separators=(",", ":")),
+                )
+            )
+
+        chunk_result = ChunkResult(index=0, record_count=len(rows), attempts=1)
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metrics (table_name, measure_name, name, "
+                "time, value, dimensions) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+        chunk_result.records_ingested = len(rows)
+
+        logger.debug(f"Wrote {len(rows)} records to {self.path}:{table_name}")
+        return WriteResult(chunks=[chunk_result])
+
+    def query(
+        self,
+        table_name: str,
+        measure_name: Optional[str] = None,
+        name: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> MetricBatch:
+        """Reads records ordered by time, e.g. for replay into another store.
+
+        :param name: value of the "name" dimension
+        :param since: inclusive lower bound, in epoch seconds
+        :param until: exclusive upper bound, in epoch seconds"""
+        clauses = ["table_name = ?"]
+        params = [table_name]
+        for clause, param in (
+            ("measure_name = ?", measure_name),
+            ("name = ?", name),
+            ("time >= ?", since),
+            ("time < ?", until),
+        ):
+            if param is not None:
+                clauses.append(clause)
+                params.append(param)
+
+        batch = MetricBatch()
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT measure_name, time, value, dimensions FROM metrics "
+                f"WHERE {' AND '.join(clauses)} ORDER BY time",
+                params,
+            )
+            for measure, ts, value, dimensions in cursor:
+                batch.append(
+                    measure, ts, value, tuple(map(tuple, json.loads(dimensions)))
+                )
+            cursor.close()
+        return batch
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
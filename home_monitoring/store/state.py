@@ -0,0 +1,41 @@
+import json
+from typing import Any, Optional
+
+import boto3
+
+from home_monitoring.config import STATE_TABLE_NAME
+
+
+class StateTable:
+    """JSON values stored by key in the shared pipeline state table. Values
+    are stored as JSON strings to avoid DynamoDB's float => Decimal mapping"""
+
+    def __init__(self, dynamodb=None, table_name: str = STATE_TABLE_NAME):
+        self._dynamodb = dynamodb
+        self.table_name = table_name
+
+    @property
+    def dynamodb(self):
+        # created lazily so that callers that never touch state pay nothing
+        if self._dynamodb is None:
+            self._dynamodb = boto3.resource("dynamodb", region_name="us-west-2")
+        return self._dynamodb
+
+    @property
+    def table(self):
+        return self.dynamodb.Table(self.table_name)
+
+    def get(self, key: str, consistent_read: bool = False) -> Optional[Any]:
+        response = self.table.get_item(
+            Key={"state_key": key}, ConsistentRead=consistent_read
+        )
+        item = response.get("Item")
+        return json.loads(item["value"]) if item else None
+
+    def put(self, key: str, value: Any) -> None:
+        self.table.put_item(
+            Item={"state_key": key, "value": json.dumps(value, separators=(",", ":"))}
+        )
+
+    def delete(self, key: str) -> None:
+        self.table.delete_item(Key={"state_key": key})
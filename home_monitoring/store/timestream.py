@@ -1,51 +1,296 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
+import json
+import time
+from typing import Iterable, List, Tuple
 
 from botocore.client import BaseClient
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
 
 from home_monitoring import logger
-from home_monitoring.store.metrics_store import MetricsStore, MetricRecord
-
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.store.instrumentation import StoreStats
+from home_monitoring.store.metrics_store import (
+    ChunkResult,
+    MetricsStore,
+    MetricRecord,
+    WriteResult,
+)
+from home_monitoring.store.retry import RetryPolicy, TokenBucket, is_retryable_rejection
 
 logger = logger.get(__name__)
 
+# WriteRecords accepts at most 100 records per call
+# See https://docs.aws.amazon.com/timestream/latest/developerguide/API_WriteRecords.html  # noqa
+MAX_RECORDS_PER_CALL = 100
+DEFAULT_MAX_WORKERS = 8
+# Pacing for WriteRecords calls issued by a single store instance
+DEFAULT_CALLS_PER_SECOND = 20
+# Record attributes that may be sent once per call via CommonAttributes
+# See https://docs.aws.amazon.com/timestream/latest/developerguide/metering-and-pricing.writes.html  # noqa
+HOISTABLE_ATTRIBUTES = (
+    "Dimensions",
+    "MeasureName",
+    "MeasureValueType",
+    "Time",
+    "TimeUnit",
+)
+
 
 class TimestreamMetricsStore(MetricsStore):
-    def __init__(self, client: BaseClient, database_name: str):
+    def __init__(
+        self,
+        client: BaseClient,
+        database_name: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        records_per_call: int = MAX_RECORDS_PER_CALL,
+        retry_policy: RetryPolicy = None,
+        token_bucket: TokenBucket = None,
+    ):
         self.client = client
         self.database_name = database_name
+        self.max_workers = max_workers
+        self.records_per_call = min(records_per_call, MAX_RECORDS_PER_CALL)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.token_bucket = token_bucket or TokenBucket(DEFAULT_CALLS_PER_SECOND)
+        self.stats = StoreStats("timestream")
 
-    def write_metric(self, record: MetricRecord) -> None:
-        self.write_metrics([record])
+    def write_metrics(
+        self, table_name: str, records: Metrics, multi_measure_name: str = None
+    ) -> WriteResult:
+        """Writes the records in chunks of at most `records_per_call`, issuing the
+        WriteRecords calls concurrently on a bounded thread pool. Retryable
+        rejections and throttled calls are resubmitted per `retry_policy`.
+        Attributes shared by every record in a chunk are sent once, as
+        CommonAttributes.
 
-    def write_metrics(self, table_name: str, records: List[MetricRecord]) -> None:
-        try:
-            timestream_records = list(map(self.to_timestream_record, records))
-            logger.info(timestream_records)
+        :param multi_measure_name: if set, records sharing a timestamp and
+            dimension set are combined into a single MULTI measure record with
+            this measure name, with one measure value per input record
+        :returns: a WriteResult with one ChunkResult per WriteRecords call.
+            Counts are in Timestream records, i.e. rows in multi-measure mode"""
+        rows, row_keys = self._group_rows(records, multi_measure_name)
+        chunks = self._plan_chunks(rows, row_keys)
 
-            # implements "last writer wins" semantics
-            # See https://docs.aws.amazon.com/timestream/latest/developerguide/code-samples.write.html#code-samples.write.upserts  # noqa
-            common_attributes = {"Version": int(datetime.now().timestamp())}
+        # implements "last writer wins" semantics. All chunks share a single
+        # version so that a batch is never partially superseded by itself
+        # See https://docs.aws.amazon.com/timestream/latest/developerguide/code-samples.write.html#code-samples.write.upserts  # noqa
+        version = int(datetime.now().timestamp())
 
-            result = self.client.write_records(
-                DatabaseName=self.database_name,
-                TableName=table_name,
-                Records=timestream_records,
-                CommonAttributes=common_attributes,
-            )
-            logger.info(
-                "WriteRecords Status: [%s]"
-                % result["ResponseMetadata"]["HTTPStatusCode"]
-            )
-        except self.client.exceptions.RejectedRecordsException as err:
-            self._print_rejected_records_exceptions(err)
-        except Exception as err:
-            # TODO Configure logger
-            logger.error("Error writing metrics:", err)
+        def write_chunk(args) -> ChunkResult:
+            # payloads are built lazily, one chunk at a time, by the worker
+            index, chunk_rows = args
+            if multi_measure_name:
+                chunk = self.to_multi_measure_records(
+                    records, chunk_rows, multi_measure_name
+                )
+            else:
+                chunk = self.to_timestream_records(
+                    records, [row[0] for row in chunk_rows]
+                )
+            common_attributes = self.hoist_common_attributes(chunk)
+            common_attributes["Version"] = version
+            return self._write_chunk(table_name, index, chunk, common_attributes)
+
+        if len(chunks) <= 1:
+            chunk_results = list(map(write_chunk, enumerate(chunks)))
+        else:
+            num_workers = min(self.max_workers, len(chunks))
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                chunk_results = list(executor.map(write_chunk, enumerate(chunks)))
+
+        result = WriteResult(chunks=chunk_results)
+        logger.info(
+            f"Wrote {result.records_ingested}/{len(rows)} records "
+            f"to {table_name} in {len(chunks)} chunk(s): "
+            f"{result.records_rejected} rejected, {result.records_failed} failed"
+        )
+        return result
+
+    @staticmethod
+    def _group_rows(
+        records: Metrics, multi_measure_name: str = None
+    ) -> Tuple[List[List[int]], list]:
+        """Groups record indices into Timestream rows, i.e. one row per record
+        or, in multi-measure mode, one row per (time, dimension set).
+
+        :returns: the rows and the dimension set key of each row"""
+        if isinstance(records, MetricBatch):
+            dimension_keys = records.dimension_set_ids
+            times = records.times
+        else:
+            dimension_keys = [
+                tuple((d["Name"], str(d["Value"])) for d in record.dimensions)
+                for record in records
+            ]
+            times = [record.time for record in records]
+
+        if not multi_measure_name:
+            return [[i] for i in range(len(records))], dimension_keys
+
+        rows = {}
+        for i, dimension_key in enumerate(dimension_keys):
+            rows.setdefault((times[i], dimension_key), []).append(i)
+        return list(rows.values()), [key[1] for key in rows.keys()]
+
+    def _plan_chunks(
+        self, rows: List[List[int]], row_keys: list
+    ) -> List[List[List[int]]]:
+        """Splits rows into chunks of at most `records_per_call`.
+
+        Rows are grouped by dimension set when that doesn't increase the
+        number of WriteRecords calls, so that each chunk's dimensions can be
+        hoisted into CommonAttributes"""
+        size = self.records_per_call
+        sequential = [rows[i : i + size] for i in range(0, len(rows), size)]
+
+        groups = defaultdict(list)
+        for row, key in zip(rows, row_keys):
+            groups[key].append(row)
+
+        if len(groups) <= 1:
+            return sequential
+
+        grouped = [
+            group[i : i + size]
+            for group in groups.values()
+            for i in range(0, len(group), size)
+        ]
+        return grouped if len(grouped) <= len(sequential) else sequential
+
+    @staticmethod
+    def hoist_common_attributes(timestream_records: List[dict]) -> dict:
+        """Moves attributes shared by every record into a CommonAttributes dict,
+        removing them from the individual records.
+
+        :returns: the CommonAttributes (excluding Version)"""
+        common_attributes = {}
+        if not timestream_records:
+            return common_attributes
+
+        first = timestream_records[0]
+        for attribute in HOISTABLE_ATTRIBUTES:
+            if attribute in first and all(
+                r.get(attribute) == first[attribute] for r in timestream_records
+            ):
+                common_attributes[attribute] = first[attribute]
+
+        for record in timestream_records:
+            for attribute in common_attributes:
+                del record[attribute]
+
+        return common_attributes
+
+    def _write_chunk(
+        self, table_name: str, index: int, chunk: List[dict], common_attributes: dict
+    ) -> ChunkResult:
+        """Writes a chunk, resubmitting only the retryable subset of any rejected
+        records and backing off on throttling or transient service errors"""
+        chunk_result = ChunkResult(index=index, record_count=len(chunk))
+        pending = chunk
+
+        while pending:
+            chunk_result.attempts += 1
+            if chunk_result.attempts > 1:
+                self.stats.record_retry()
+            self.token_bucket.acquire()
+            num_bytes = self._payload_bytes(pending, common_attributes)
+            started = time.perf_counter()
+            try:
+                result = self.client.write_records(
+                    DatabaseName=self.database_name,
+                    TableName=table_name,
+                    Records=pending,
+                    CommonAttributes=common_attributes,
+                )
+                self.stats.record_call(
+                    time.perf_counter() - started, len(pending), num_bytes
+                )
+                logger.debug(
+                    "WriteRecords Status (chunk %d, attempt %d): [%s]"
+                    % (
+                        index,
+                        chunk_result.attempts,
+                        result["ResponseMetadata"]["HTTPStatusCode"],
+                    )
+                )
+                chunk_result.records_ingested += len(pending)
+                chunk_result.error = None
+                pending = []
+            except self.client.exceptions.RejectedRecordsException as err:
+                self._print_rejected_records_exceptions(err)
+                rejected = err.response["RejectedRecords"]
+                retryable = [
+                    pending[rr["RecordIndex"]]
+                    for rr in rejected
+                    if is_retryable_rejection(rr)
+                ]
+                self.stats.record_call(
+                    time.perf_counter() - started,
+                    len(pending),
+                    num_bytes,
+                    records_rejected=len(rejected) - len(retryable),
+                )
+                chunk_result.records_ingested += len(pending) - len(rejected)
+                chunk_result.records_rejected += len(rejected) - len(retryable)
+                chunk_result.error = "RejectedRecordsException"
+                pending = retryable
+            except self._transient_exceptions() as err:
+                self.stats.record_call(
+                    time.perf_counter() - started,
+                    len(pending),
+                    num_bytes,
+                    throttled=isinstance(
+                        err, self.client.exceptions.ThrottlingException
+                    ),
+                    error=True,
+                )
+                logger.warning(f"Transient error writing metrics chunk {index}: {err}")
+                chunk_result.error = err.__class__.__name__
+            except Exception as err:
+                self.stats.record_call(
+                    time.perf_counter() - started, len(pending), num_bytes, error=True
+                )
+                logger.error(f"Error writing metrics chunk {index}: {err}")
+                chunk_result.error = str(err)
+                break
+
+            if pending:
+                if chunk_result.attempts >= self.retry_policy.max_attempts:
+                    logger.error(
+                        f"Giving up on {len(pending)} records in chunk {index} "
+                        f"after {chunk_result.attempts} attempts"
+                    )
+                    break
+                time.sleep(self.retry_policy.backoff_seconds(chunk_result.attempts))
+
+        return chunk_result
+
+    @staticmethod
+    def _payload_bytes(records: List[dict], common_attributes: dict) -> int:
+        """Approximate request payload size, as serialized by botocore.
+
+        Only the first record is serialized and its size extrapolated, so
+        stats don't cost a second serialization of every chunk. Records in a
+        chunk share their shape, as shared attributes were hoisted"""
+        if not records:
+            return 0
+        record_bytes = len(json.dumps(records[0], separators=(",", ":")))
+        common_bytes = len(json.dumps(common_attributes, separators=(",", ":")))
+        # {"Records":[...],"CommonAttributes":...}, with a comma per record
+        return 32 + common_bytes + len(records) * (record_bytes + 1)
+
+    def _transient_exceptions(self) -> tuple:
+        return (
+            self.client.exceptions.ThrottlingException,
+            self.client.exceptions.InternalServerException,
+            BotocoreConnectionError,
+        )
 
     @staticmethod
     def _print_rejected_records_exceptions(err):
-        logger.info("RejectedRecords: ", err)
+        logger.info(f"RejectedRecords: {err}")
         for rr in err.response["RejectedRecords"]:
             logger.info(f"Rejected Index {rr['RecordIndex']}: {rr['Reason']}")
             if "ExistingVersion" in rr:
@@ -53,6 +298,48 @@ class TimestreamMetricsStore(MetricsStore):
                     f"Rejected record existing version: {rr['ExistingVersion']}"
                 )
 
+    @classmethod
+    def to_timestream_records(
+        cls, records: Metrics, indices: Iterable[int]
+    ) -> List[dict]:
+        """Converts the records at `indices` to Timestream WriteRecords payloads"""
+        if isinstance(records, MetricBatch):
+            return [records.to_timestream_record(i) for i in indices]
+        else:
+            return [cls.to_timestream_record(records[i]) for i in indices]
+
+    @classmethod
+    def to_multi_measure_records(
+        cls, records: Metrics, rows: List[List[int]], measure_name: str
+    ) -> List[dict]:
+        """Converts rows of records sharing a timestamp and dimension set into
+        MULTI measure WriteRecords payloads
+        See https://docs.aws.amazon.com/timestream/latest/developerguide/writes.html#writes.writing-data-multi-measure  # noqa
+        """
+        multi_measure_records = []
+        for row in rows:
+            measures = cls.to_timestream_records(records, row)
+            # a measure may only appear once per row => the last value wins
+            measure_values = {
+                m["MeasureName"]: {
+                    "Name": m["MeasureName"],
+                    "Value": m["MeasureValue"],
+                    "Type": m["MeasureValueType"],
+                }
+                for m in measures
+            }
+            multi_measure_records.append(
+                {
+                    "Dimensions": measures[0]["Dimensions"],
+                    "MeasureName": measure_name,
+                    "MeasureValues": list(measure_values.values()),
+                    "MeasureValueType": "MULTI",
+                    "Time": measures[0]["Time"],
+                    "TimeUnit": measures[0]["TimeUnit"],
+                }
+            )
+        return multi_measure_records
+
     @staticmethod
     def to_timestream_record(record: MetricRecord) -> dict:
         return {
@@ -0,0 +1,80 @@
+from typing import Optional, Tuple
+
+from home_monitoring import logger
+from home_monitoring.models.metrics import MetricBatch, Metrics
+from home_monitoring.store.metrics_store import (
+    DeliveryCallback,
+    FilteringMetricsStore,
+    MetricsStore,
+    WriteResult,
+)
+from home_monitoring.store.state import StateTable
+
+logger = logger.get(__name__)
+
+
+class WatermarkStore:
+    """Last timestamp written per scraper, kept in the shared state table"""
+
+    KEY_PREFIX = "watermark#"
+
+    def __init__(self, state_table: StateTable = None):
+        self._state_table = state_table
+
+    @property
+    def state_table(self) -> StateTable:
+        # created lazily so that scrapers which don't track watermarks pay
+        # nothing
+        if self._state_table is None:
+            self._state_table = StateTable()
+        return self._state_table
+
+    def get(self, name: str) -> Optional[int]:
+        return self.state_table.get(self.KEY_PREFIX + name, consistent_read=True)
+
+    def put(self, name: str, ts: int) -> None:
+        self.state_table.put(self.KEY_PREFIX + name, ts)
+
+
+class WatermarkingMetricsStore(FilteringMetricsStore):
+    """Advances a scraper's watermark to the latest timestamp delivered to
+    the downstream store. Records at or before the watermark were already
+    written by a previous run and are skipped"""
+
+    def __init__(
+        self,
+        downstream: MetricsStore,
+        watermarks: WatermarkStore,
+        name: str,
+        watermark_ts: Optional[int],
+    ):
+        super().__init__(downstream)
+        self.watermarks = watermarks
+        self.name = name
+        self.watermark_ts = watermark_ts
+
+    def prepare(
+        self, table_name: str, records: Metrics
+    ) -> Tuple[Metrics, DeliveryCallback]:
+        times = (
+            records.times
+            if isinstance(records, MetricBatch)
+            else [r.time for r in records]
+        )
+        new_records = records
+        if self.watermark_ts is not None and min(times, default=0) <= self.watermark_ts:
+            new_records = [r for r in records if r.time > self.watermark_ts]
+            times = [r.time for r in new_records]
+        skipped = len(records) - len(new_records)
+        if skipped:
+            logger.info(f"Skipping {skipped} records before the {self.name} watermark")
+
+        def on_delivered(result: WriteResult) -> None:
+            if not new_records or result.records_failed:
+                return
+            latest_ts = max(times)
+            if self.watermark_ts is None or latest_ts > self.watermark_ts:
+                self.watermarks.put(self.name, latest_ts)
+                self.watermark_ts = latest_ts
+
+        return new_records, on_delivered
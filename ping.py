@@ -1,9 +1,35 @@
-from home_monitoring.lambdas import metrics_importer
+import os
+
+import boto3
 
+from home_monitoring.config import OnPremConfig
+from home_monitoring.lambdas import metrics_importer
+from home_monitoring.store.last_value import FileLastValueIndex
+from home_monitoring.store.spool import SpoolMetricsStore
+from home_monitoring.store.timestream import TimestreamMetricsStore
 
-# Simple driver class for the on-prem "ping" scraper
+# Simple driver class for the on-prem "ping" scraper. Metrics are written to a
+# local spool first so they survive the very WAN outages we're measuring, and
+# are forwarded to Timestream once connectivity returns
 if __name__ == "__main__":
-    event = {"scraper_class": "home_monitoring.scrapers.ping.PingScraper"}
-    context = {}
+    env = os.environ["ENVIRONMENT"]
 
-    metrics_importer.lambda_handler(event, context)
+    timestream_client = boto3.client("timestream-write", region_name="us-west-2")
+    store = SpoolMetricsStore(
+        os.environ.get("SPOOL_PATH", OnPremConfig.SPOOL_PATH),
+        TimestreamMetricsStore(timestream_client, "home_monitoring"),
+        max_records=OnPremConfig.SPOOL_MAX_RECORDS,
+        max_attempts=OnPremConfig.SPOOL_MAX_ATTEMPTS,
+        max_dead_letter_records=OnPremConfig.SPOOL_MAX_DEAD_LETTER_RECORDS,
+    )
+    # deliver anything left over from previous runs while we scrape
+    store.start()
+    try:
+        metrics_importer.run_scraper(
+            "home_monitoring.scrapers.ping.PingScraper",
+            env,
+            store,
+            FileLastValueIndex(OnPremConfig.LAST_VALUE_INDEX_PATH),
+        )
+    finally:
+        store.close(drain_timeout_seconds=OnPremConfig.SPOOL_DRAIN_TIMEOUT_SECONDS)
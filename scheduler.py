@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import os
+import threading
+
+import boto3
+
+from home_monitoring.config import OnPremConfig
+from home_monitoring.ping_daemon import PingDaemon
+from home_monitoring.scheduler import Job, Scheduler, run_command
+from home_monitoring.store.spool import SpoolMetricsStore
+from home_monitoring.store.timestream import TimestreamMetricsStore
+
+# Resident on-prem process replacing cron: hosts the ping daemon and runs the
+# egg detector on a schedule, sharing one spool and Timestream client
+if __name__ == "__main__":
+    env = os.environ["ENVIRONMENT"]
+
+    timestream_client = boto3.client("timestream-write", region_name="us-west-2")
+    store = SpoolMetricsStore(
+        os.environ.get("SPOOL_PATH", OnPremConfig.SPOOL_PATH),
+        TimestreamMetricsStore(timestream_client, "home_monitoring"),
+        max_records=OnPremConfig.SPOOL_MAX_RECORDS,
+        max_attempts=OnPremConfig.SPOOL_MAX_ATTEMPTS,
+        max_dead_letter_records=OnPremConfig.SPOOL_MAX_DEAD_LETTER_RECORDS,
+    )
+    store.start()
+
+    ping_daemon = PingDaemon(store)
+    ping_thread = threading.Thread(
+        target=lambda: asyncio.run(ping_daemon.run_async()), name="ping-daemon"
+    )
+
+    scheduler = Scheduler(
+        [
+            Job(
+                "egg_detector",
+                functools.partial(
+                    run_command,
+                    ["make", "run"],
+                    cwd=OnPremConfig.EGG_DETECTOR_DIR,
+                    timeout_seconds=OnPremConfig.EGG_DETECTOR_TIMEOUT_SECONDS,
+                ),
+                interval_seconds=OnPremConfig.EGG_DETECTOR_INTERVAL_SECONDS,
+                jitter_seconds=30,
+                hours=OnPremConfig.EGG_DETECTOR_HOURS,
+            ),
+            Job(
+                "egg_detector_cleanup",
+                functools.partial(
+                    run_command,
+                    [
+                        "find",
+                        OnPremConfig.EGG_DETECTOR_OUTPUT_DIR,
+                        "-mtime",
+                        f"+{OnPremConfig.EGG_DETECTOR_OUTPUT_RETENTION_DAYS}",
+                        "-delete",
+                    ],
+                ),
+                interval_seconds=24 * 60 * 60,
+            ),
+        ],
+        store,
+    )
+
+    ping_thread.start()
+    try:
+        scheduler.run()
+    finally:
+        ping_daemon.stop()
+        ping_thread.join()
+        store.close(drain_timeout_seconds=OnPremConfig.SPOOL_DRAIN_TIMEOUT_SECONDS)
@@ -25,15 +25,14 @@ module "lambdas" {
   auth_tokens_table_arn = module.storage.auth_tokens_table_arn
   metrics_table_arn = module.storage.metrics_table_arn
   egg_detector_cache_table_arn = module.storage.egg_detector_cache_table_arn
+  state_table_arn = module.storage.state_table_arn
   image_uri = "${local.account_number}.dkr.ecr.us-west-2.amazonaws.com/home_monitoring:latest"
   enable_functions = true
   enable_monitoring = false
   alarms_email = var.alarms_email
   scraper_configs = {
-    ecowitt = "rate(15 minutes)"
-    yolink = "rate(15 minutes)"
-    flume = "cron(30 * * * ? *)"
-    enphase = "cron(30 * * * ? *)"
+    frequent = "rate(15 minutes)"
+    hourly = "cron(30 * * * ? *)"
   }
   s3_bucket_name = local.assets_bucket_name
 }
@@ -25,6 +25,7 @@ module "lambdas" {
   auth_tokens_table_arn = module.storage.auth_tokens_table_arn
   metrics_table_arn = module.storage.metrics_table_arn
   egg_detector_cache_table_arn = module.storage.egg_detector_cache_table_arn
+  state_table_arn = module.storage.state_table_arn
   image_uri = "${local.dev_account_number}.dkr.ecr.us-west-2.amazonaws.com/home_monitoring:latest"
   enable_functions = true
   alarms_email = var.alarms_email
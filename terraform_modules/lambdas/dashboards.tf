@@ -13,10 +13,8 @@ resource "aws_cloudwatch_dashboard" "lambda" {
             "properties": {
                 "metrics": [
                     [ "AWS/Lambda", "Invocations", "FunctionName", "home_monitoring_auth", "Resource", "home_monitoring_auth" ],
-                    [ "...", "home_monitoring_scraper_flume", ".", "home_monitoring_scraper_flume" ],
-                    [ "...", "home_monitoring_scraper_enphase", ".", "home_monitoring_scraper_enphase" ],
-                    [ "...", "home_monitoring_scraper_yolink", ".", "home_monitoring_scraper_yolink" ],
-                    [ "...", "home_monitoring_scraper_ecowitt", ".", "home_monitoring_scraper_ecowitt" ]
+                    [ "...", "home_monitoring_scraper_hourly", ".", "home_monitoring_scraper_hourly" ],
+                    [ "...", "home_monitoring_scraper_frequent", ".", "home_monitoring_scraper_frequent" ]
                 ],
                 "period": 300,
                 "region": "us-west-2",
@@ -38,10 +36,8 @@ resource "aws_cloudwatch_dashboard" "lambda" {
             "properties": {
                 "metrics": [
                     [ "AWS/Lambda", "Errors", "FunctionName", "home_monitoring_auth", "Resource", "home_monitoring_auth" ],
-                    [ "...", "home_monitoring_scraper_ecowitt", ".", "home_monitoring_scraper_ecowitt" ],
-                    [ "...", "home_monitoring_scraper_yolink", ".", "home_monitoring_scraper_yolink" ],
-                    [ "...", "home_monitoring_scraper_flume", ".", "home_monitoring_scraper_flume" ],
-                    [ "...", "home_monitoring_scraper_enphase", ".", "home_monitoring_scraper_enphase" ]
+                    [ "...", "home_monitoring_scraper_frequent", ".", "home_monitoring_scraper_frequent" ],
+                    [ "...", "home_monitoring_scraper_hourly", ".", "home_monitoring_scraper_hourly" ]
                 ],
                 "period": 300,
                 "region": "us-west-2",
@@ -31,7 +31,8 @@ data "aws_iam_policy_document" "home_monitoring_function_policy_document" {
     ]
     resources = [
       var.auth_tokens_table_arn,
-      var.egg_detector_cache_table_arn
+      var.egg_detector_cache_table_arn,
+      var.state_table_arn
     ]
   }
   statement {
@@ -1,9 +1,12 @@
+# one function per schedule group, running the group's scrapers concurrently
+# (see SCHEDULE_GROUPS in home_monitoring/config.py)
 resource "aws_lambda_function" "home_monitoring_scraper" {
   for_each = var.scraper_configs
   function_name = "home_monitoring_scraper_${each.key}"
   role          = aws_iam_role.home_monitoring_function_role.arn
-  memory_size   = 128 # MB
-  timeout       = 10 # seconds
+  memory_size   = 256 # MB
+  # scrapers time out after 40s, leaving time to flush their records
+  timeout       = 60 # seconds
 
   package_type  = "Image"
   image_uri     = var.image_uri
@@ -41,7 +44,7 @@ resource "aws_cloudwatch_event_target" "home_monitoring_lambda_target" {
   }
   input = <<JSON
   {
-    "scraper_class": "home_monitoring.scrapers.${each.key}.${title(each.key)}Scraper"
+    "schedule_group": "${each.key}"
   }
   JSON
 }
@@ -83,7 +86,8 @@ resource "aws_cloudwatch_log_group" "home_monitoring_auth_log_group" {
 resource "aws_cloudwatch_event_rule" "home_monitoring_auth_lambda_event_rule" {
   name = "home_monitoring_auth_lambda_event_rule"
   description = "Event trigger for auth token refresh"
-  schedule_expression = "cron(0 4 * * ? *)"
+  # hourly, but tokens are only refreshed when close to expiry
+  schedule_expression = "cron(0 * * * ? *)"
   # we manually enable this via the console for dev testing
   is_enabled = var.enable_functions
 }
@@ -19,6 +19,10 @@ variable "egg_detector_cache_table_arn" {
   type = string
 }
 
+variable "state_table_arn" {
+  type = string
+}
+
 variable "image_uri" {
   type = string
 }
@@ -37,13 +41,12 @@ variable "alarms_email" {
   type = string
 }
 
+# schedule group => schedule expression
 variable "scraper_configs" {
   type    = map(string)
   default = {
-    ecowitt = "rate(5 minutes)"
-    yolink = "rate(5 minutes)"
-    flume = "cron(30 * * * ? *)"
-    enphase = "cron(30 * * * ? *)"
+    frequent = "rate(5 minutes)"
+    hourly = "cron(30 * * * ? *)"
   }
 }
 
@@ -66,3 +66,18 @@ resource "aws_dynamodb_table" "egg_detector_cache" {
     prevent_destroy = true
   }
 }
+
+# Small key/value table for pipeline state that must survive Lambda cold starts,
+# e.g. the last value written per series
+resource "aws_dynamodb_table" "home_monitoring_state" {
+  name           = "home_monitoring_state"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "state_key"
+
+  attribute {
+    name = "state_key"
+    type = "S"
+  }
+
+  deletion_protection_enabled = var.enable_delete_protection
+}
@@ -10,6 +10,10 @@ output "egg_detector_cache_table_arn" {
   value = aws_dynamodb_table.egg_detector_cache.arn
 }
 
+output "state_table_arn" {
+  value = aws_dynamodb_table.home_monitoring_state.arn
+}
+
 output "home_monitoring_bucket_name" {
   value = aws_s3_bucket.home_monitoring.arn
 }
@@ -0,0 +1,124 @@
+import threading
+from unittest.mock import MagicMock
+
+from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.store.async_writer import AsyncMetricsWriter
+from home_monitoring.store.last_value import DedupingMetricsStore, FileLastValueIndex
+from home_monitoring.store.memory import InMemoryMetricsStore
+from home_monitoring.store.watermark import WatermarkingMetricsStore
+
+
+class TestAsyncMetricsWriter:
+    def test_coalesces_writes_until_flush(self):
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream, max_delay_seconds=60)
+
+        for i in range(3):
+            result = writer.write_metrics("metrics", self._get_records(2, i))
+            assert result.records_ingested == 2
+        writer.write_metrics("other", self._get_records(1))
+        assert downstream.write_calls == 0
+
+        result = writer.flush()
+
+        assert downstream.write_calls == 2
+        assert len(downstream.records("metrics")) == 6
+        assert result.records_ingested == 7
+        assert writer.flush().records_ingested == 0
+        writer.close()
+
+    def test_flushes_at_batch_size(self):
+        downstream = InMemoryMetricsStore()
+        written = threading.Event()
+        write_metrics = downstream.write_metrics
+
+        def notify(*args, **kwargs):
+            result = write_metrics(*args, **kwargs)
+            written.set()
+            return result
+
+        downstream.write_metrics = notify
+        writer = AsyncMetricsWriter(
+            downstream, max_batch_records=4, max_delay_seconds=60
+        )
+
+        writer.write_metrics("metrics", self._get_records(2))
+        writer.write_metrics("metrics", self._get_records(2, 1))
+
+        assert written.wait(5)
+        assert len(downstream) == 4
+        writer.close()
+
+    def test_downstream_failure_is_reported_on_flush(self):
+        downstream = MagicMock()
+        downstream.write_metrics.side_effect = Exception("Could not connect")
+        writer = AsyncMetricsWriter(downstream)
+
+        writer.write_metrics("metrics", self._get_records(3))
+        result = writer.close()
+
+        assert result.records_failed == 3
+
+    def test_wrap_applies_to_downstream(self, tmp_path):
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream)
+        index = FileLastValueIndex(str(tmp_path / "last_values.json"))
+        store = writer.wrap(lambda s: DedupingMetricsStore(s, index))
+
+        store.write_metrics("metrics", self._get_records(3))
+        writer.flush()
+        store.write_metrics("metrics", self._get_records(3))
+        result = writer.close()
+
+        # only the latest value per series is indexed
+        assert len(downstream) == 5
+        assert result.records_skipped == 1
+
+    def test_wrapped_stores_share_downstream_writes(self, tmp_path):
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream, max_delay_seconds=60)
+        watermarks = MagicMock()
+        index = FileLastValueIndex(str(tmp_path / "last_values.json"))
+        # e.g. two scrapers, each with its own watermark
+        enphase = writer.wrap(
+            lambda s: WatermarkingMetricsStore(s, watermarks, "enphase", 1695185303)
+        )
+        flume = writer.wrap(
+            lambda s: WatermarkingMetricsStore(s, watermarks, "flume", None)
+        ).wrap(lambda s: DedupingMetricsStore(s, index))
+
+        enphase.write_metrics("metrics", self._get_records(3))
+        flume.write_metrics("metrics", self._get_records(2, 1))
+        result = writer.close()
+
+        assert downstream.write_calls == 1
+        assert len(downstream) == 4
+        # filtered when enqueued
+        assert result.records_skipped == 1
+        # advanced once the shared write succeeded
+        assert watermarks.put.call_count == 2
+
+    def test_writes_after_close_are_dropped(self):
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream)
+        writer.close()
+        watermarks = MagicMock()
+        # e.g. a scraper that outlived its timeout
+        store = writer.wrap(
+            lambda s: WatermarkingMetricsStore(s, watermarks, "enphase", None)
+        )
+
+        result = store.write_metrics("metrics", self._get_records(3))
+
+        assert result.records_failed == 3
+        assert writer.records_dropped == 3
+        assert len(downstream) == 0
+        watermarks.put.assert_not_called()
+
+    def _get_records(self, count, offset=0):
+        records = []
+        for i in range(count):
+            record = MetricRecord("ping_avg", 1695185303 + offset * 100 + i, 10.5)
+            record.add_dimension("location", "primary_residence")
+            records.append(record)
+        return records
@@ -2,6 +2,7 @@ from unittest.mock import patch
 
 import arrow
 
+from home_monitoring.scrapers import auth_token_fetcher
 from home_monitoring.scrapers.auth_token_fetcher import AuthTokenFetcher, AuthTokens
 from home_monitoring import secrets
 
@@ -11,14 +12,23 @@ class TestAuthTokenFetcher:
         "home_monitoring.scrapers.auth_token_fetcher.AuthTokenFetcher._get_dynamo_table"
     )
     def test_get_access_token(self, get_dynamo_table):
-        get_dynamo_table.return_value.query.return_value = {
-            "Items": [{"access_token": "FAKE_TOKEN"}]
+        auth_token_fetcher._access_tokens.clear()
+        get_dynamo_table.return_value.get_item.return_value = {
+            "Item": {
+                "access_token": "FAKE_TOKEN",
+                "expiration_ts": arrow.now().shift(hours=1).int_timestamp,
+            }
         }
 
         fetcher = AuthTokenFetcher(env="dev")
         token = fetcher.get_access_token("foo")
+        # served from memory until it expires
+        token = AuthTokenFetcher(env="dev").get_access_token("foo")
 
         get_dynamo_table.assert_called_once()
+        get_dynamo_table.return_value.get_item.assert_called_once_with(
+            Key={"app_name": "foo"}, ConsistentRead=True
+        )
         assert token == "FAKE_TOKEN"
 
     @patch(
@@ -35,7 +45,7 @@ class TestAuthTokenFetcher:
     ):
         now = arrow.now()
         app_name = "foo"
-        get_dynamo_table.return_value.query.return_value = {"Items": []}
+        get_dynamo_table.return_value.get_item.return_value = {}
         auth_tokens = AuthTokens(
             token_type="bearer",
             access_token="FAKE_ACCESS_TOKEN",
@@ -67,13 +77,12 @@ class TestAuthTokenFetcher:
     ):
         now = arrow.now()
         app_name = "foo"
-        get_dynamo_table.return_value.query.return_value = {
-            "Items": [
-                {
-                    "access_token": "FAKE_ACCESS_TOKEN",
-                    "refresh_token": "FAKE_REFRESH_TOKEN",
-                }
-            ]
+        get_dynamo_table.return_value.get_item.return_value = {
+            "Item": {
+                "access_token": "FAKE_ACCESS_TOKEN",
+                "refresh_token": "FAKE_REFRESH_TOKEN",
+                "expiration_ts": now.shift(hours=1).int_timestamp,
+            }
         }
         auth_tokens = AuthTokens(
             token_type="bearer",
@@ -91,3 +100,27 @@ class TestAuthTokenFetcher:
         )
         upsert_auth_tokens.assert_called_once_with(app_name, auth_tokens)
         assert token == auth_tokens
+
+    @patch(
+        "home_monitoring.scrapers.auth_token_fetcher.AuthTokenFetcher._get_dynamo_table"
+    )
+    @patch(
+        "home_monitoring.scrapers.auth_token_fetcher.AuthTokenFetcher._enphase_token_refresh"
+    )
+    def test_refresh_tokens_not_due(self, enphase_token_refresh, get_dynamo_table):
+        expiration_ts = arrow.now().shift(hours=12).int_timestamp
+        get_dynamo_table.return_value.get_item.return_value = {
+            "Item": {
+                "token_type": "bearer",
+                "access_token": "FAKE_ACCESS_TOKEN",
+                "refresh_token": "FAKE_REFRESH_TOKEN",
+                "expiration_ts": expiration_ts,
+            }
+        }
+
+        fetcher = AuthTokenFetcher(env="dev")
+        token = fetcher.refresh_tokens("foo")
+
+        enphase_token_refresh.assert_not_called()
+        assert token.access_token == "FAKE_ACCESS_TOKEN"
+        assert token.expiration_ts == expiration_ts
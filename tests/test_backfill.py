@@ -0,0 +1,167 @@
+import threading
+
+import arrow
+import pytest
+
+from home_monitoring.backfill import BackfillProgress, BackfillRunner, main
+from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.scrapers.base_scraper import BackfillableScraper, BaseScraper
+from home_monitoring.scrapers.utils import split_windows
+from home_monitoring.store.memory import InMemoryMetricsStore
+from home_monitoring.store.metrics_store import ChunkResult, WriteResult
+from home_monitoring.store.retry import TokenBucket
+
+HOUR = 60 * 60
+SINCE = arrow.get("2024-01-01T00:00:00+00:00")
+
+
+class FakeScraper(BackfillableScraper):
+    """Returns one record per hour of the requested window"""
+
+    backfill_window_seconds = 6 * HOUR
+
+    def __init__(self, env: str = "dev", fail_windows=()):
+        super().__init__(env)
+        self.fail_windows = set(fail_windows)
+        self.windows = []
+        self.lock = threading.Lock()
+
+    def scrape_metrics(self):
+        return []
+
+    def scrape_window(self, since, until):
+        window = (since.int_timestamp, until.int_timestamp)
+        with self.lock:
+            self.windows.append(window)
+        if window in self.fail_windows:
+            raise Exception("vendor error")
+        return [
+            MetricRecord("water_usage", ts, 1.0)
+            for ts in range(window[0], window[1], HOUR)
+        ]
+
+
+class LiveOnlyScraper(BaseScraper):
+    def scrape_metrics(self):
+        return []
+
+
+class FailingStore(InMemoryMetricsStore):
+    def write_metrics(self, table_name, records, multi_measure_name=None):
+        return WriteResult(
+            chunks=[ChunkResult(index=0, record_count=len(records), error="down")]
+        )
+
+
+def _runner(scraper, store, progress=None, **kwargs):
+    # no rate limit in tests
+    return BackfillRunner(
+        scraper, store, progress, token_bucket=TokenBucket(1000), **kwargs
+    )
+
+
+class TestSplitWindows:
+    def test_aligned_to_window_size(self):
+        since = SINCE.int_timestamp
+        windows = split_windows(since + HOUR, since + 13 * HOUR, 6 * HOUR)
+        assert windows == [
+            (since + HOUR, since + 6 * HOUR),
+            (since + 6 * HOUR, since + 12 * HOUR),
+            (since + 12 * HOUR, since + 13 * HOUR),
+        ]
+
+    def test_unaligned(self):
+        windows = split_windows(5, 25, 10, align=False)
+        assert windows == [(5, 15), (15, 25)]
+
+    def test_empty_range(self):
+        assert split_windows(100, 100, 10) == []
+
+
+class TestBackfillRunner:
+    def test_run(self):
+        scraper = FakeScraper()
+        store = InMemoryMetricsStore()
+
+        report = _runner(scraper, store, batch_records=10).run(
+            SINCE, SINCE.shift(days=1)
+        )
+
+        assert report.windows == 4
+        assert report.windows_completed == 4
+        assert report.records_fetched == report.records_written == 24
+        # 6 records per window, flushed once 10 are buffered
+        assert report.write_calls == 2
+        assert sorted(r.time for r in store.records("metrics")) == list(
+            range(SINCE.int_timestamp, SINCE.shift(days=1).int_timestamp, HOUR)
+        )
+        assert "4/4 windows completed" in report.summary()
+
+    def test_resume(self, tmp_path):
+        path = str(tmp_path / "progress.json")
+        failed_window = (SINCE.int_timestamp, SINCE.int_timestamp + 6 * HOUR)
+        store = InMemoryMetricsStore()
+
+        report = _runner(
+            FakeScraper(fail_windows=[failed_window]), store, BackfillProgress(path)
+        ).run(SINCE, SINCE.shift(days=1))
+        assert report.windows_failed == 1
+        assert report.windows_completed == 3
+
+        # a new run only fetches the window that failed
+        scraper = FakeScraper()
+        report = _runner(scraper, store, BackfillProgress(path)).run(
+            SINCE, SINCE.shift(days=1)
+        )
+        assert scraper.windows == [failed_window]
+        assert report.windows_skipped == 3
+        assert report.windows_completed == 1
+        assert len(store.records("metrics")) == 24
+
+    def test_failed_writes_are_not_marked_completed(self, tmp_path):
+        path = str(tmp_path / "progress.json")
+
+        report = _runner(FakeScraper(), FailingStore(), BackfillProgress(path)).run(
+            SINCE, SINCE.shift(hours=12)
+        )
+
+        assert report.windows_failed == 2
+        assert report.records_failed == 12
+        assert not BackfillProgress(path).completed
+
+    def test_unsupported_scraper(self):
+        with pytest.raises(ValueError, match="does not support backfill"):
+            _runner(LiveOnlyScraper(), InMemoryMetricsStore())
+
+    def test_cli_unsupported_scraper(self, tmp_path, capsys):
+        with pytest.raises(SystemExit):
+            main(
+                [
+                    "tests.test_backfill.LiveOnlyScraper",
+                    "2024-01-01T00:00:00",
+                    "2024-01-01T12:00:00",
+                    "--sqlite",
+                    str(tmp_path / "metrics.db"),
+                ]
+            )
+
+        assert "LiveOnlyScraper does not support backfill" in capsys.readouterr().err
+        assert not (tmp_path / "metrics.db").exists()
+
+    def test_cli(self, tmp_path):
+        report = main(
+            [
+                "tests.test_backfill.FakeScraper",
+                "2024-01-01T00:00:00",
+                "2024-01-01T12:00:00",
+                "--env",
+                "dev",
+                "--progress",
+                str(tmp_path / "progress.json"),
+                "--sqlite",
+                str(tmp_path / "metrics.db"),
+            ]
+        )
+
+        assert report.windows_completed == 2
+        assert report.records_written == 12
@@ -8,7 +8,7 @@ from home_monitoring.scrapers.ecowitt import EcowittScraper
 
 
 class TestEcowittScraper:
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_scrape_metrics(self, requests_get):
         ts = arrow.now().int_timestamp
         requests_get.return_value.json.return_value = {
@@ -31,6 +31,7 @@ class TestEcowittScraper:
                 "application_key": ANY,
                 "api_key": ANY,
             },
+            timeout=ANY,
         )
 
         assert len(metric_records) == 3
@@ -39,10 +40,57 @@ class TestEcowittScraper:
         assert metric_records[0].time == ts
         assert metric_records[1].name == "soil_moisture"
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_response_error(self, requests_get):
         requests_get.return_value.json.return_value = {"msg": "error", "data": {}}
 
         scraper = EcowittScraper(env="dev")
         with pytest.raises(Exception):
             scraper.scrape_metrics()
+
+    @patch("requests.Session.get")
+    def test_scrape_window(self, requests_get):
+        since = arrow.get("2023-09-20T00:00:00-07:00")
+        until = since.shift(days=1)
+        requests_get.return_value.json.return_value = {
+            "msg": "success",
+            "data": {
+                "indoor": {
+                    "temperature": {
+                        "unit": "ºF",
+                        "list": {
+                            str(since.int_timestamp): "72.1",
+                            str(until.int_timestamp): "70.0",
+                        },
+                    }
+                },
+                "soil_ch1": {
+                    "soilmoisture": {
+                        "unit": "%",
+                        "list": {str(since.int_timestamp + 300): "41"},
+                    }
+                },
+            },
+        }
+        scraper = EcowittScraper(env="dev")
+        metric_records = scraper.scrape_window(since, until)
+
+        requests_get.assert_called_once_with(
+            "https://api.ecowitt.net/api/v3//device/history",  # noqa
+            params={
+                "mac": "C4:5B:BE:6D:9E:80",
+                "start_date": "2023-09-20 00:00:00",
+                "end_date": "2023-09-20 23:59:59",
+                "cycle_type": "5min",
+                "call_back": ANY,
+                "application_key": ANY,
+                "api_key": ANY,
+            },
+            timeout=ANY,
+        )
+        # the sample at `until` belongs to the next window
+        assert [(r.name, r.time, r.value) for r in metric_records] == [
+            ("temperature", since.int_timestamp, 72.1),
+            ("soil_moisture", since.int_timestamp + 300, 41.0),
+        ]
+        assert metric_records[1].dimensions == [{"Name": "name", "Value": "lower_bank"}]
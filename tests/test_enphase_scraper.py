@@ -1,7 +1,12 @@
+import arrow
+import pytest
+import requests
+
+from home_monitoring.scrapers import enphase
 from home_monitoring.scrapers.enphase import EnphaseScraper
 from home_monitoring.scrapers.utils import get_previous_hour_dt
 from home_monitoring import secrets
-from unittest.mock import MagicMock
+from unittest.mock import ANY, MagicMock
 from unittest.mock import patch
 
 SINCE_DATE = "2023-08-21 09:00:00"
@@ -10,7 +15,7 @@ UNTIL_DATE = "2023-08-21 10:00:00"
 
 class TestEnphaseScraper:
     @patch("home_monitoring.scrapers.enphase.EnphaseScraper._get_access_token")
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_get_microinverter_production(self, requests_get, get_access_token):
         get_access_token.return_value = "FAKE_TOKEN"
 
@@ -28,6 +33,7 @@ class TestEnphaseScraper:
             headers={
                 "Authorization": "Bearer FAKE_TOKEN",
             },
+            timeout=ANY,
         )
 
     @patch(
@@ -65,3 +71,111 @@ class TestEnphaseScraper:
         record = result[1]
         assert record.name == "solar_energy_produced"
         assert record.value == 40
+
+    @patch(
+        "home_monitoring.scrapers.enphase.EnphaseScraper.get_microinverter_production"
+    )
+    def test_scrape_window(self, get_microinverter_production):
+        scraper = EnphaseScraper()
+        response = MagicMock()
+        response.json.return_value = {
+            "intervals": [
+                {"end_at": 1384122600, "devices_reporting": 1, "powr": 30, "enwh": 8},
+                {"end_at": 1384209000, "devices_reporting": 1, "powr": 20, "enwh": 5},
+            ],
+        }
+        get_microinverter_production.return_value = response
+
+        since = arrow.get(1384122600)
+        result = scraper.scrape_window(since, since.shift(days=1))
+
+        get_microinverter_production.assert_called_once_with(1384122599)
+        # the second interval ends at the end of the window, so it's dropped
+        assert [(r.name, r.time) for r in result] == [
+            ("solar_avg_power_produced", 1384122600),
+            ("solar_energy_produced", 1384122600),
+        ]
+
+    @patch("home_monitoring.scrapers.enphase.EnphaseScraper._get_access_token")
+    @patch("home_monitoring.scrapers.enphase.EnphaseScraper._get")
+    def test_scrape_microinverters(self, get, get_access_token):
+        get_access_token.return_value = "FAKE_TOKEN"
+        enphase._microinverters.clear()
+
+        def respond(path, params=None):
+            response = MagicMock()
+            if path.endswith("/devices"):
+                response.json.return_value = {
+                    "devices": {
+                        "micros": [
+                            {"serial_number": "121"},
+                            {"serial_number": "122"},
+                            {"serial_number": "123", "active": False},
+                            {"serial_number": "124"},
+                        ]
+                    }
+                }
+            elif "/micros/124/" in path:
+                response.json.return_value = {"message": "Not Found"}
+            else:
+                response.json.return_value = {
+                    "intervals": [
+                        {"end_at": 1384122600, "powr": 250, "enwh": 60},
+                        {"end_at": 1384123500, "powr": 240, "enwh": 62},
+                    ]
+                }
+            return response
+
+        get.side_effect = respond
+        scraper = EnphaseScraper()
+        scraper.microinverter_telemetry = True
+
+        result = scraper.scrape_microinverters(1384122599)
+
+        # the failed microinverter is skipped
+        assert len(result) == 8
+        assert {r.name for r in result} == {
+            "microinverter_avg_power_produced",
+            "microinverter_energy_produced",
+        }
+        assert result[0].dimensions == [
+            {"Name": "location", "Value": "primary_residence"},
+            {"Name": "serial_number", "Value": "121"},
+        ]
+        # the device list is cached
+        scraper.scrape_microinverters(1384122599)
+        device_list_calls = [
+            c for c in get.call_args_list if c.args[0].endswith("/devices")
+        ]
+        assert len(device_list_calls) == 1
+
+        # windows are retried as a whole rather than losing the failed device
+        with pytest.raises(Exception, match="Failed to fetch 1 of 3"):
+            scraper.scrape_microinverters(1384122599, 1384124400, allow_partial=False)
+
+    @patch("home_monitoring.scrapers.enphase.EnphaseScraper._get_access_token")
+    @patch("requests.Session.get")
+    def test_get_raises_on_error_status(self, requests_get, get_access_token):
+        get_access_token.return_value = "FAKE_TOKEN"
+        response = requests.Response()
+        response.status_code = 429
+        requests_get.return_value = response
+
+        with pytest.raises(requests.HTTPError):
+            EnphaseScraper(env="dev").get_microinverter_production(0)
+
+    def test_get_intervals_follows_pages(self):
+        pages = {
+            100: {"end_at": 200, "intervals": [{"end_at": 150}, {"end_at": 200}]},
+            200: {"end_at": 300, "intervals": [{"end_at": 250}]},
+        }
+
+        def fetch_page(start_at_ts):
+            response = MagicMock()
+            response.json.return_value = pages[start_at_ts]
+            return response
+
+        intervals = EnphaseScraper().get_intervals(fetch_page, 100, 260)
+
+        assert [i["end_at"] for i in intervals] == [150, 200, 250]
+        assert len(EnphaseScraper().get_intervals(fetch_page, 100)) == 2
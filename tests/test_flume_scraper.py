@@ -1,7 +1,10 @@
 import arrow
-from home_monitoring.scrapers.flume import FlumeScraper
+import pytest
+
+from home_monitoring.scrapers.flume import FlumeScraper, LocalDatetimeParser
 from unittest.mock import ANY
 from unittest.mock import MagicMock
+from unittest.mock import patch
 
 # Set to False for integration testing against the live API
 USE_MOCK = True
@@ -18,12 +21,13 @@ class TestFlumeScraper:
             response.json.return_value = {"data": [{"access_token": "FAKE_TOKEN"}]}
             self._mock_make_request(scraper, response)
 
-        scraper.get_tokens()
-        print(scraper.access_token)
-        assert scraper.access_token is not None
+        access_token, expires_in_seconds = scraper.fetch_token()
+        assert access_token is not None
+        assert expires_in_seconds > 0
 
     def test_scrape_metrics(self):
         scraper = FlumeScraper()
+        scraper.bucket = "HR"
         if USE_MOCK:
             response = MagicMock()
             response.status_code = 200
@@ -80,6 +84,118 @@ class TestFlumeScraper:
             params=expected_params,
         )
 
+    def test_scrape_window(self):
+        scraper = FlumeScraper()
+        scraper.bucket = "HR"
+        response = MagicMock()
+        response.json.return_value = {
+            "data": [
+                {
+                    "fake_request_id": [
+                        {"datetime": "2023-08-21 00:00:00", "value": 1.5},
+                        {"datetime": "2023-08-21 01:00:00", "value": 0},
+                        {"datetime": "2023-08-28 00:00:00", "value": 2.5},
+                    ]
+                }
+            ]
+        }
+        make_request_mock = self._mock_make_request(scraper, response)
+
+        since = arrow.get("2023-08-21 00:00:00", tzinfo="US/Pacific").to("UTC")
+        records = scraper.scrape_window(since, since.shift(days=7))
+
+        queries = make_request_mock.call_args.kwargs["params"]["queries"]
+        assert queries[0]["since_datetime"] == "2023-08-21 00:00:00"
+        assert queries[0]["until_datetime"] == "2023-08-27 23:59:59"
+        assert [(r.time, r.value) for r in records] == [
+            (since.int_timestamp, 1.5),
+            (since.int_timestamp + 3600, 0.0),
+        ]
+
+    def test_scrape_window_minutes(self):
+        scraper = FlumeScraper()
+        scraper.bucket = "MIN"
+        response = MagicMock()
+        response.json.return_value = {
+            "data": [
+                {
+                    "first": [
+                        {"datetime": "2023-08-21 00:00:00", "value": 0.5},
+                        {"datetime": "2023-08-21 00:01:00", "value": 0.25},
+                    ]
+                },
+                {"second": [{"datetime": "2023-08-21 20:00:00", "value": 1}]},
+            ]
+        }
+        make_request_mock = self._mock_make_request(scraper, response)
+
+        since = arrow.get("2023-08-21 00:00:00", tzinfo="US/Pacific")
+        records = scraper.scrape_window(since.shift(seconds=1), since.shift(days=1))
+
+        # 24 hours of minutes need two queries, sent in a single request
+        make_request_mock.assert_called_once()
+        queries = make_request_mock.call_args.kwargs["params"]["queries"]
+        assert [(q["since_datetime"], q["until_datetime"]) for q in queries] == [
+            ("2023-08-21 00:00:00", "2023-08-21 19:59:59"),
+            ("2023-08-21 20:00:00", "2023-08-21 23:59:59"),
+        ]
+        assert all(q["bucket"] == "MIN" for q in queries)
+        # the 00:00 bucket is before the window
+        assert [(r.time, r.value) for r in records] == [
+            (since.int_timestamp + 60, 0.25),
+            (since.int_timestamp + 20 * 3600, 1.0),
+        ]
+        assert records[0].dimensions == [{"Name": "name", "Value": "primary_residence"}]
+        assert {r.name for r in records} == {"household_water_usage_per_minute"}
+
+    def test_catch_up_until(self):
+        scraper = FlumeScraper()
+        now = arrow.get("2023-08-21T10:35:30+00:00")
+        with patch("home_monitoring.scrapers.flume.arrow.utcnow", return_value=now):
+            scraper.bucket = "HR"
+            assert scraper.catch_up_until() == arrow.get("2023-08-21T10:00:00+00:00")
+            # minutes that may not have been uploaded yet are left for later
+            scraper.bucket = "MIN"
+            assert scraper.catch_up_until() == arrow.get("2023-08-21T10:25:00+00:00")
+
+    def test_scrape_since_minutes(self):
+        scraper = FlumeScraper()
+        scraper.bucket = "MIN"
+        response = MagicMock()
+        response.json.return_value = {"data": [{}]}
+        make_request_mock = self._mock_make_request(scraper, response)
+        now = arrow.get("2023-08-21T22:35:00+00:00")
+
+        with patch("home_monitoring.scrapers.flume.arrow.utcnow", return_value=now):
+            # more than a single request can return at minute resolution
+            scraper.scrape_since(now.shift(days=-4).int_timestamp)
+
+        # each request stays within the query limits
+        for call in make_request_mock.call_args_list:
+            queries = call.kwargs["params"]["queries"]
+            assert len(queries) <= 3
+            assert all(q["bucket"] == "MIN" for q in queries)
+        assert make_request_mock.call_count == 2
+
+    def test_query_device_range_too_large(self):
+        scraper = FlumeScraper()
+        self._mock_make_request(scraper, {})
+        since = arrow.get(SINCE_DATE)
+
+        with pytest.raises(ValueError):
+            scraper.query_device(since, since.shift(days=3), "MIN")
+
+    def test_local_datetime_parser(self):
+        parser = LocalDatetimeParser()
+        for datetime_str in (
+            "2023-08-21 09:00:00",
+            "2023-08-21 09:59:30",
+            "2023-11-05 00:15:00",
+            "2023-03-12 03:01:00",
+        ):
+            expected = arrow.get(datetime_str, tzinfo="US/Pacific").int_timestamp
+            assert parser.parse(datetime_str) == expected
+
     def _mock_make_request(self, scraper, response):
         mock = MagicMock()
         mock.return_value = response
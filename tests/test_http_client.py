@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from home_monitoring.scrapers.http import DEFAULT_TIMEOUT, HttpClient, get_client
+
+
+class TestHttpClient:
+    def test_get_client_is_shared(self):
+        client = get_client("https://api.example.com")
+
+        assert get_client("https://api.example.com") is client
+        assert get_client("https://other.example.com") is not client
+        assert client.session.headers["Accept-Encoding"] == "gzip, deflate"
+        adapter = client.session.get_adapter("https://api.example.com/v1")
+        assert adapter._pool_maxsize == 16
+
+    @patch("requests.Session.get")
+    def test_default_timeout(self, session_get):
+        client = HttpClient("https://api.example.com/")
+
+        client.get("/v1/devices", params={"id": 1})
+        client.get("https://api.example.com/v2/devices", timeout=5)
+
+        assert session_get.call_args_list[0].args == (
+            "https://api.example.com/v1/devices",
+        )
+        assert session_get.call_args_list[0].kwargs == {
+            "params": {"id": 1},
+            "timeout": DEFAULT_TIMEOUT,
+        }
+        assert session_get.call_args_list[1].kwargs == {"timeout": 5}
@@ -0,0 +1,51 @@
+import pytest
+
+from home_monitoring.config import ColdStartConfig
+from home_monitoring.import_profile import (
+    BudgetCheck,
+    ImportProfile,
+    parse_importtime,
+    profile_import,
+)
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       149 |        149 |     home_monitoring
+import time:      1200 |      90000 |   boto3
+import time:      2000 |      92000 | home_monitoring.lambdas.grafana_launcher
+import time:        73 |         73 | gc
+"""
+
+
+class TestImportProfile:
+    def test_parse_importtime(self):
+        profile = ImportProfile(
+            "home_monitoring.lambdas.grafana_launcher",
+            parse_importtime(IMPORTTIME_OUTPUT),
+        )
+
+        assert len(profile.imports) == 4
+        assert profile.total_ms == 92
+        assert profile.imported("boto3")
+        assert not profile.imported("requests")
+        assert profile.slowest(1)[0].name == profile.module
+
+    def test_budget_check(self):
+        profile = ImportProfile(
+            "home_monitoring.lambdas.grafana_launcher",
+            parse_importtime(IMPORTTIME_OUTPUT),
+        )
+
+        assert BudgetCheck(profile, budget_ms=100).passed
+        assert not BudgetCheck(profile, budget_ms=50).passed
+        check = BudgetCheck(profile, budget_ms=100, deferred=["boto3", "jinja2"])
+        assert check.eagerly_imported == ["boto3"]
+        assert "imports boto3, which should be deferred" in check.report()
+
+    @pytest.mark.parametrize("module", list(ColdStartConfig.DEFERRED_IMPORTS))
+    def test_handlers_defer_heavy_imports(self, module):
+        check = BudgetCheck(
+            profile_import(module, runs=1),
+            deferred=ColdStartConfig.DEFERRED_IMPORTS[module],
+        )
+        assert check.eagerly_imported == []
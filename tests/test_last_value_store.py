@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock
+
+from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.store.last_value import (
+    DedupingMetricsStore,
+    DynamoLastValueIndex,
+    FileLastValueIndex,
+    series_key,
+)
+from home_monitoring.store.metrics_store import ChunkResult, WriteResult
+
+
+class TestDedupingMetricsStore:
+    def test_skips_unchanged_records(self, tmp_path):
+        downstream = self._get_downstream()
+        index = FileLastValueIndex(str(tmp_path / "last_values.json"))
+        store = DedupingMetricsStore(downstream, index)
+
+        result = store.write_metrics("metrics", self._get_records())
+        assert result.records_skipped == 0
+        assert len(downstream.write_metrics.call_args.args[1]) == 2
+
+        # the same readings are re-scraped on the next run, one sensor reported
+        records = self._get_records()
+        records[1].time += 300
+        records[1].value = 20.5
+        result = store.write_metrics("metrics", records)
+
+        assert result.records_skipped == 1
+        written = downstream.write_metrics.call_args.args[1]
+        assert written == [records[1]]
+
+        # index is persisted across instances
+        index = FileLastValueIndex(str(tmp_path / "last_values.json"))
+        store = DedupingMetricsStore(downstream, index)
+        result = store.write_metrics("metrics", records)
+        assert result.records_skipped == 2
+        assert downstream.write_metrics.call_count == 2
+
+    def test_index_not_updated_on_failure(self, tmp_path):
+        downstream = self._get_downstream(failing=True)
+        index = FileLastValueIndex(str(tmp_path / "last_values.json"))
+        store = DedupingMetricsStore(downstream, index)
+
+        store.write_metrics("metrics", self._get_records())
+        result = store.write_metrics("metrics", self._get_records())
+
+        assert result.records_skipped == 0
+        assert downstream.write_metrics.call_count == 2
+
+    def test_dynamo_index(self):
+        dynamodb = MagicMock()
+        record = self._get_records()[0]
+        key = series_key("metrics", record)
+        dynamodb.batch_get_item.return_value = {
+            "Responses": {
+                "home_monitoring_state": [
+                    {
+                        "state_key": f"last_value#{key}",
+                        "ts": record.time,
+                        "value": "19.6",
+                    }
+                ]
+            },
+            "UnprocessedKeys": {},
+        }
+        index = DynamoLastValueIndex(dynamodb)
+
+        values = index.get_many([key])
+        assert values == {key: (record.time, 19.6)}
+
+        index.put_many({key: (record.time + 1, 19.7)})
+        batch = dynamodb.Table.return_value.batch_writer.return_value.__enter__
+        batch.return_value.put_item.assert_called_once_with(
+            Item={
+                "state_key": f"last_value#{key}",
+                "ts": record.time + 1,
+                "value": "19.7",
+            }
+        )
+
+    def _get_downstream(self, failing=False):
+        def write_metrics(table_name, records, multi_measure_name=None):
+            chunk = ChunkResult(
+                index=0,
+                record_count=len(records),
+                records_ingested=0 if failing else len(records),
+            )
+            return WriteResult(chunks=[chunk])
+
+        downstream = MagicMock()
+        downstream.write_metrics.side_effect = write_metrics
+        return downstream
+
+    def _get_records(self):
+        records = [
+            MetricRecord("temperature", 1695184258, 19.6),
+            MetricRecord("temperature", 1695184258, 20.1),
+        ]
+        records[0].add_dimension("name", "Chicken brooder")
+        records[1].add_dimension("name", "Pool temp")
+        return records
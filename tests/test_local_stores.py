@@ -0,0 +1,71 @@
+import pytest
+
+from home_monitoring.models.metrics import MetricBatch, MetricRecord
+from home_monitoring.store.memory import InMemoryMetricsStore
+from home_monitoring.store.sqlite import SqliteMetricsStore
+
+
+class TestSqliteMetricsStore:
+    def test_write_and_query(self, tmp_path):
+        store = SqliteMetricsStore(str(tmp_path / "metrics.db"))
+
+        result = store.write_metrics("metrics", _get_records())
+
+        assert result.records_ingested == 4
+        records = store.query("metrics", "temperature", name="Pool temp")
+        assert list(records) == [_get_records()[1], _get_records()[3]]
+        assert len(store.query("metrics", since=1695184258 + 60)) == 2
+        assert len(store.query("other")) == 0
+
+    def test_upsert(self, tmp_path):
+        path = str(tmp_path / "metrics.db")
+        store = SqliteMetricsStore(path)
+        store.write_metrics("metrics", _get_records())
+
+        record = _get_records()[0]
+        record.value = 25.0
+        store.write_metric("metrics", record)
+        store.close()
+
+        records = SqliteMetricsStore(path).query("metrics", name="Chicken brooder")
+        assert [r.value for r in records] == [25.0, 19.8]
+
+
+class TestParquetMetricsStore:
+    def test_write_and_query(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        from home_monitoring.store.parquet import ParquetMetricsStore
+
+        store = ParquetMetricsStore(str(tmp_path / "archive"))
+        store.write_metrics("metrics", MetricBatch.from_records(_get_records()))
+        store.write_metrics("metrics", [MetricRecord("leak_sensor", 1695184258, 1)])
+
+        partition = (
+            tmp_path / "archive/metrics/measure_name=temperature/date=2023-09-20"
+        )
+        assert len(list(partition.iterdir())) == 1
+        assert list(store.query("metrics", "temperature")) == _get_records()
+        assert len(store.query("metrics", since=1695184258 + 60)) == 2
+        assert len(store.query("metrics")) == 5
+
+
+class TestInMemoryMetricsStore:
+    def test_ring_buffer(self):
+        store = InMemoryMetricsStore(max_records=3)
+
+        store.write_metrics("metrics", _get_records())
+        store.write_metrics("other", [MetricRecord("leak_sensor", 1695184258, 1)])
+
+        assert len(store) == 3
+        assert store.write_calls == 2
+        assert store.records("metrics") == _get_records()[2:]
+
+
+def _get_records():
+    records = []
+    for ts in (1695184258, 1695184258 + 60):
+        for name, value in (("Chicken brooder", 19.6), ("Pool temp", 20.1)):
+            record = MetricRecord("temperature", ts, value + (ts - 1695184258) / 300)
+            record.add_dimension("name", name)
+            records.append(record)
+    return records
@@ -0,0 +1,56 @@
+from home_monitoring.models.metrics import MetricBatch, MetricRecord
+
+
+class TestMetricBatch:
+    def test_append_interns_names_and_dimensions(self):
+        batch = MetricBatch()
+        dimension_set_id = batch.intern_dimensions([("location", "primary_residence")])
+        for ts in range(1000):
+            batch.append("solar_avg_power_produced", ts, 30, None, dimension_set_id)
+            batch.append("solar_energy_produced", ts, 40, None, dimension_set_id)
+
+        assert len(batch) == 2000
+        assert batch.names == ["solar_avg_power_produced", "solar_energy_produced"]
+        assert len(batch.dimension_sets) == 1
+
+    def test_dict_and_tuple_dimensions_are_equivalent(self):
+        batch = MetricBatch()
+        batch.append("temperature", 1, 10.0, [{"Name": "name", "Value": "Pool"}])
+        batch.append("temperature", 2, 11.0, [("name", "Pool")])
+        batch.append("temperature", 3, 12.0, [("name", "Office")])
+        batch.append("temperature", 4, 13.0)
+
+        assert list(batch.dimension_set_ids) == [0, 0, 1, 2]
+        assert batch.dimensions(3) == []
+
+    def test_record_views(self):
+        records = [
+            MetricRecord("temperature", 1, 10.5, [{"Name": "name", "Value": "Pool"}]),
+            MetricRecord("leak_sensor", 2, 1, [{"Name": "name", "Value": "Tank"}]),
+        ]
+        batch = MetricBatch.from_records(records)
+
+        assert list(batch) == records
+        assert batch[-1] == records[1]
+
+        # views don't share their dimension list with the batch
+        record = batch[0]
+        record.add_dimension("foo", "bar")
+        assert batch.dimensions(0) == [{"Name": "name", "Value": "Pool"}]
+
+    def test_to_timestream_records(self):
+        batch = MetricBatch()
+        for ts in range(5):
+            batch.append("ping_avg", ts, 12.5, [("location", "primary_residence")])
+
+        payloads = list(batch.to_timestream_records(1, 3))
+
+        assert len(payloads) == 2
+        assert payloads[0] == {
+            "Dimensions": [{"Name": "location", "Value": "primary_residence"}],
+            "MeasureName": "ping_avg",
+            "MeasureValue": "12.5",
+            "MeasureValueType": "DOUBLE",
+            "Time": "1",
+            "TimeUnit": "SECONDS",
+        }
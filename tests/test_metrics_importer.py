@@ -0,0 +1,271 @@
+import threading
+from unittest.mock import ANY, MagicMock, patch
+
+import arrow
+import pytest
+
+from home_monitoring.lambdas import metrics_importer
+from home_monitoring.lambdas.warm_cache import WarmCache
+from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.scrapers import auth_token_fetcher
+from home_monitoring.scrapers.auth_token_fetcher import AuthTokens
+from home_monitoring.scrapers.base_scraper import BackfillableScraper, BaseScraper
+from home_monitoring.store.async_writer import AsyncMetricsWriter
+from home_monitoring.store.memory import InMemoryMetricsStore
+from home_monitoring.store.watermark import WatermarkStore
+
+# released at the end of each test so the slow scraper's thread exits
+release_slow_scraper = threading.Event()
+
+
+class PoolScraper(BaseScraper):
+    def scrape_metrics(self):
+        return [MetricRecord("temperature", 1695184258, 25.0)]
+
+
+class FridgeScraper(BaseScraper):
+    def scrape_metrics(self):
+        return [MetricRecord("temperature", 1695184258, 3.5)]
+
+
+class WatermarkedScraper(BackfillableScraper):
+    backfill_window_seconds = 24 * 60 * 60
+    track_watermark = True
+
+    def scrape_metrics(self):
+        return [MetricRecord("solar_energy_produced", 1695184258, 5.0)]
+
+    def scrape_window(self, since, until):
+        return []
+
+
+class OtherWatermarkedScraper(WatermarkedScraper):
+    def scrape_metrics(self):
+        return [MetricRecord("household_water_usage", 1695184258, 2.0)]
+
+
+class BrokenScraper(BaseScraper):
+    def scrape_metrics(self):
+        raise Exception("vendor error")
+
+
+class ExpiredCredentialsScraper(BaseScraper):
+    def scrape_metrics(self):
+        raise Exception(
+            "An error occurred (ExpiredTokenException) when calling the GetItem "
+            "operation: The security token included in the request is expired"
+        )
+
+
+class SlowScraper(BaseScraper):
+    timeout_seconds = 0.1
+
+    def scrape_metrics(self):
+        release_slow_scraper.wait(5)
+        return [MetricRecord("temperature", 1695184258, 0.0)]
+
+
+class LateWatermarkedScraper(WatermarkedScraper):
+    timeout_seconds = 0.1
+
+    def scrape_metrics(self):
+        release_slow_scraper.wait(5)
+        return super().scrape_metrics()
+
+
+def _name(scraper_class):
+    return f"{__name__}.{scraper_class.__name__}"
+
+
+class TestRunScrapers:
+    def teardown_method(self):
+        release_slow_scraper.set()
+
+    def test_shared_writes(self):
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream, max_delay_seconds=60)
+
+        failures = metrics_importer.run_scrapers(
+            [_name(PoolScraper), _name(FridgeScraper)], "dev", writer
+        )
+        writer.close()
+
+        assert failures == {}
+        assert len(downstream) == 2
+        # both scrapers' records were coalesced into a single write
+        assert downstream.write_calls == 1
+
+    def test_watermarked_scrapers_share_writes(self):
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream, max_delay_seconds=60)
+        state_table = MagicMock()
+        state_table.get.return_value = None
+
+        failures = metrics_importer.run_scrapers(
+            [_name(WatermarkedScraper), _name(OtherWatermarkedScraper)],
+            "dev",
+            writer,
+            watermarks=WatermarkStore(state_table),
+        )
+        writer.close()
+
+        assert failures == {}
+        # each scraper's watermark wrapper filters on enqueue, so their
+        # records still share a single downstream write
+        assert downstream.write_calls == 1
+        assert len(downstream) == 2
+        assert state_table.put.call_count == 2
+
+    def test_failures_are_isolated(self):
+        release_slow_scraper.clear()
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream)
+
+        failures = metrics_importer.run_scrapers(
+            [
+                _name(PoolScraper),
+                _name(BrokenScraper),
+                _name(SlowScraper),
+                f"{__name__}.MissingScraper",
+            ],
+            "dev",
+            writer,
+        )
+        writer.flush()
+
+        assert failures == {
+            _name(BrokenScraper): "vendor error",
+            _name(SlowScraper): "timed out after 0.1s",
+            f"{__name__}.MissingScraper": ANY,
+        }
+        assert [r.value for r in downstream.records("metrics")] == [25.0]
+
+    def test_timed_out_scrapers_never_write(self):
+        release_slow_scraper.clear()
+        downstream = InMemoryMetricsStore()
+        writer = AsyncMetricsWriter(downstream)
+        state_table = MagicMock()
+        state_table.get.return_value = None
+
+        failures = metrics_importer.run_scrapers(
+            [_name(LateWatermarkedScraper)],
+            "dev",
+            writer,
+            watermarks=WatermarkStore(state_table),
+        )
+        writer.close()
+        # the scraper finishes after the invocation is over
+        release_slow_scraper.set()
+        for thread in threading.enumerate():
+            if thread.name.startswith("ThreadPoolExecutor"):
+                thread.join(5)
+
+        assert failures == {_name(LateWatermarkedScraper): "timed out after 0.1s"}
+        assert len(downstream) == 0
+        state_table.put.assert_not_called()
+        # cancelled before writing, rather than dropped by the closed writer
+        assert writer.records_dropped == 0
+
+    def test_cached_scrapers_are_reused(self):
+        cache = WarmCache()
+        names = [_name(PoolScraper), _name(BrokenScraper)]
+
+        metrics_importer.run_scrapers(names, "dev", InMemoryMetricsStore(), cache=cache)
+        pool_scraper = cache.values[("scraper", _name(PoolScraper), "dev")]
+        metrics_importer.run_scrapers(names, "dev", InMemoryMetricsStore(), cache=cache)
+
+        assert cache.values[("scraper", _name(PoolScraper), "dev")] is pool_scraper
+        # failed scrapers are rebuilt on the next run
+        assert ("scraper", _name(BrokenScraper), "dev") not in cache
+
+    @patch("requests.Session.get")
+    @patch.object(auth_token_fetcher.AuthTokenFetcher, "get_auth_tokens")
+    def test_cached_scraper_token_expiry(self, get_auth_tokens, requests_get):
+        auth_token_fetcher._access_tokens.clear()
+        now = arrow.now()
+        get_auth_tokens.return_value = AuthTokens(
+            "bearer", "TOKEN1", "REFRESH", now.shift(minutes=5).int_timestamp
+        )
+        requests_get.return_value = MagicMock(status_code=200)
+        cache = WarmCache()
+        name = "home_monitoring.scrapers.enphase.EnphaseScraper"
+
+        scraper = metrics_importer.get_scraper(name, "dev", cache)
+        scraper.get_microinverter_production(0)
+
+        # the next invocation runs after the token expired and was refreshed
+        get_auth_tokens.return_value = AuthTokens(
+            "bearer", "TOKEN2", "REFRESH", now.shift(hours=1).int_timestamp
+        )
+        with patch.object(
+            auth_token_fetcher.arrow, "now", return_value=now.shift(minutes=10)
+        ):
+            assert metrics_importer.get_scraper(name, "dev", cache) is scraper
+            scraper.get_microinverter_production(0)
+
+        assert [
+            call.kwargs["headers"]["Authorization"]
+            for call in requests_get.call_args_list
+        ] == ["Bearer TOKEN1", "Bearer TOKEN2"]
+
+    def test_credential_errors_invalidate_cache(self):
+        cache = WarmCache()
+        cache.get(("client", "timestream-write"), object)
+
+        failures = metrics_importer.run_scrapers(
+            [_name(ExpiredCredentialsScraper)],
+            "dev",
+            InMemoryMetricsStore(),
+            cache=cache,
+        )
+
+        assert failures
+        assert ("client", "timestream-write") not in cache
+
+
+class TestLambdaHandler:
+    def setup_method(self):
+        metrics_importer.warm_cache.invalidate()
+
+    @pytest.mark.parametrize(
+        "event,expected",
+        [
+            ({"scraper_class": "a.Scraper"}, ["a.Scraper"]),
+            (
+                {"scraper_classes": ["a.Scraper", "b.Scraper"]},
+                ["a.Scraper", "b.Scraper"],
+            ),
+        ],
+    )
+    def test_get_scraper_class_names(self, event, expected):
+        assert metrics_importer.get_scraper_class_names(event) == expected
+
+    @patch.dict(
+        "home_monitoring.config.PipelineConfig.SCHEDULE_GROUPS",
+        {"test": [_name(PoolScraper)]},
+    )
+    def test_schedule_group(self):
+        assert metrics_importer.get_scraper_class_names({"schedule_group": "test"}) == [
+            _name(PoolScraper)
+        ]
+
+    @patch(
+        "home_monitoring.lambdas.metrics_importer.PipelineConfig.EMIT_STORE_METRICS",
+        False,
+    )
+    @patch("home_monitoring.lambdas.metrics_importer.TimestreamMetricsStore")
+    @patch("home_monitoring.lambdas.metrics_importer.boto3")
+    @patch.dict("os.environ", {"ENVIRONMENT": "dev"})
+    def test_raises_after_delivering_healthy_scrapers(self, boto3, store_class):
+        downstream = InMemoryMetricsStore()
+        store_class.return_value = downstream
+
+        with pytest.raises(Exception, match="1 of 2 scrapers failed"):
+            metrics_importer.lambda_handler(
+                {"scraper_classes": [_name(PoolScraper), _name(BrokenScraper)]}, None
+            )
+
+        assert len(downstream) == 1
+        # the client is reused by the next, warm invocation
+        assert ("client", "timestream-write") in metrics_importer.warm_cache
+        boto3.client.assert_called_once()
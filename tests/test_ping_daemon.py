@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from home_monitoring.ping_daemon import PingDaemon, RttHistogram
+from home_monitoring.scrapers.probes import ProbeTarget
+from home_monitoring.store.memory import InMemoryMetricsStore
+
+TARGET = ProbeTarget("google_dns", "8.8.8.8")
+MINUTE_TS = 1695184200
+
+
+class TestRttHistogram:
+    def test_stats(self):
+        histogram = RttHistogram([10, 20, 50])
+        for rtt_ms in [12.0, 14.0, None, 18.0, 40.0]:
+            histogram.add(rtt_ms)
+
+        stats = histogram.stats()
+
+        assert stats["packet_loss_pct"] == 20
+        assert stats["min"] == 12
+        assert stats["max"] == 40
+        assert stats["avg"] == 21
+        # 2nd of 4 RTTs, two thirds through the 3 RTTs in the (12, 20] bucket
+        assert stats["p50"] == pytest.approx(12 + 8 * 2 / 3)
+        # the slowest RTT is in the (20, 40] bucket
+        assert 20 < stats["p99"] <= 40
+        # |14 - 12|, |18 - 14|, |40 - 18|
+        assert stats["jitter"] == pytest.approx(28 / 3)
+
+    def test_all_lost(self):
+        histogram = RttHistogram([10])
+        histogram.add(None)
+        assert histogram.stats() == {"packet_loss_pct": 100}
+
+    def test_slow_replies(self):
+        histogram = RttHistogram([10])
+        histogram.add(1500.0)
+        assert histogram.percentile(99) == 1500
+
+
+class TestPingDaemon:
+    def test_take_finished(self):
+        daemon = PingDaemon(InMemoryMetricsStore(), [TARGET], timeout_seconds=2)
+        daemon.record(MINUTE_TS + 10, TARGET, "icmp", 10.0)
+        daemon.record(MINUTE_TS + 59, TARGET, "icmp", None)
+        daemon.record(MINUTE_TS + 61, TARGET, "icmp", 12.0)
+
+        # the first minute's last probe may still be in flight
+        assert not daemon.take_finished(MINUTE_TS + 61)
+
+        records = list(daemon.take_finished(MINUTE_TS + 62))
+        assert {r.name: r.value for r in records}["ping_packet_loss_pct"] == 50
+        assert {r.time for r in records} == {MINUTE_TS}
+
+        records = list(daemon.take_finished(None))
+        assert {r.time for r in records} == {MINUTE_TS + 60}
+        assert not daemon.histograms
+
+    def test_run(self):
+        store = InMemoryMetricsStore()
+
+        async def run():
+            server = await asyncio.start_server(
+                lambda reader, writer: writer.close(), "127.0.0.1", 0
+            )
+            port = server.sockets[0].getsockname()[1]
+            daemon = PingDaemon(
+                store,
+                [ProbeTarget("local", "127.0.0.1", "tcp", port)],
+                sample_interval_seconds=0.01,
+                timeout_seconds=0.5,
+                flush_interval_seconds=0.05,
+            )
+            task = asyncio.create_task(daemon.run_async())
+            await asyncio.sleep(0.3)
+            daemon.stop()
+            await task
+            server.close()
+
+        asyncio.run(run())
+
+        # partial minutes are flushed on stop
+        records = store.records("metrics")
+        losses = [r.value for r in records if r.name == "ping_packet_loss_pct"]
+        assert losses and all(loss == 0 for loss in losses)
+        assert {r.name for r in records} >= {"ping_p95", "ping_jitter"}
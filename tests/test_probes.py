@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from home_monitoring.scrapers.ping import PingScraper
+from home_monitoring.scrapers.probes import (
+    ProbeEngine,
+    ProbeResult,
+    ProbeTarget,
+    percentile,
+)
+
+
+class DnsResponder(asyncio.DatagramProtocol):
+    """Answers DNS queries by echoing them back, dropping every other one"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queries += 1
+        if self.queries % 2:
+            self.transport.sendto(data, addr)
+
+
+def _engine():
+    return ProbeEngine(count=4, interval_seconds=0.01, timeout_seconds=0.5)
+
+
+class TestProbeEngine:
+    def test_tcp_and_dns_probes_run_concurrently(self):
+        async def run():
+            loop = asyncio.get_running_loop()
+            server = await asyncio.start_server(
+                lambda reader, writer: writer.close(), "127.0.0.1", 0
+            )
+            transport, responder = await loop.create_datagram_endpoint(
+                DnsResponder, local_addr=("127.0.0.1", 0)
+            )
+            tcp_port = server.sockets[0].getsockname()[1]
+            dns_port = transport.get_extra_info("sockname")[1]
+            try:
+                return await _engine().probe_all(
+                    [
+                        ProbeTarget("tcp", "127.0.0.1", "tcp", tcp_port),
+                        ProbeTarget("dns", "localhost", "dns", dns_port),
+                    ]
+                )
+            finally:
+                server.close()
+                transport.close()
+
+        tcp, dns = asyncio.run(run())
+
+        assert tcp.kind == "tcp"
+        assert len(tcp.rtts) == 4
+        assert tcp.loss_pct == 0
+        # every other query went unanswered
+        assert dns.loss_pct == 50
+        assert all(rtt < 500 for rtt in dns.rtts)
+
+    def test_icmp_falls_back_to_tcp(self):
+        result = _engine().run([ProbeTarget("lo", "127.0.0.1", "icmp", port=1)])[0]
+
+        # ICMP where the sandbox permits it, otherwise refused TCP connects,
+        # which still measure a round trip
+        assert result.kind in ("icmp", "tcp")
+        assert result.loss_pct == 0
+
+    def test_unresolvable_host(self):
+        result = _engine().run([ProbeTarget("bad", "host.invalid", "tcp")])[0]
+        assert result.loss_pct == 100
+        assert result.stats() == {"packet_loss_pct": 100}
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            _engine().run([ProbeTarget("lo", "127.0.0.1", "http")])
+
+
+class TestProbeResult:
+    def test_stats(self):
+        target = ProbeTarget("google_dns", "8.8.8.8")
+        result = ProbeResult(target, "icmp", [10.0, 14.0, None, 12.0, 20.0])
+
+        stats = result.stats()
+
+        assert stats["packet_loss_pct"] == 20
+        assert stats["min"] == 10
+        assert stats["avg"] == 14
+        assert stats["max"] == 20
+        assert stats["p50"] == 13
+        # |14 - 10|, |12 - 14|, |20 - 12|
+        assert stats["jitter"] == pytest.approx(14 / 3)
+
+    def test_percentile(self):
+        assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 95) == pytest.approx(4.8)
+        assert percentile([7.0], 99) == 7.0
+
+
+class TestPingScraper:
+    def test_process_results(self):
+        results = [
+            ProbeResult(ProbeTarget("google_dns", "8.8.8.8"), "tcp", [10.0, 12.0]),
+            ProbeResult(ProbeTarget("cloudflare_dns", "1.1.1.1"), "icmp", [None]),
+        ]
+
+        records = list(PingScraper.process_results(results, 1695184258))
+
+        assert len(records) == 9
+        assert records[0].name == "ping_packet_loss_pct"
+        assert records[0].dimensions == [
+            {"Name": "location", "Value": "primary_residence"},
+            {"Name": "target", "Value": "google_dns"},
+            {"Name": "probe", "Value": "tcp"},
+        ]
+        assert {r.name: r.value for r in records[:8]}["ping_avg"] == 11
+        assert records[8].name == "ping_packet_loss_pct"
+        assert records[8].value == 100
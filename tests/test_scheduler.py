@@ -0,0 +1,85 @@
+from concurrent.futures import wait
+import threading
+
+from home_monitoring.scheduler import Job, Scheduler
+from home_monitoring.store.memory import InMemoryMetricsStore
+
+HOUR = 60 * 60
+# 2023-09-20T15:00:00Z
+START_TS = 1695222000
+
+
+def fail():
+    raise ValueError("camera offline")
+
+
+class TestScheduler:
+    def test_runs_aligned_to_interval_with_jitter(self):
+        calls = []
+        job = Job("ping", lambda: calls.append(1), 5 * 60, jitter_seconds=30)
+        scheduler = Scheduler([job])
+
+        assert not scheduler.tick(START_TS + 1)
+        state = scheduler.states["ping"]
+        assert START_TS + 300 <= state.start_at <= START_TS + 330
+
+        wait(scheduler.tick(state.start_at))
+        scheduler.shutdown()
+
+        assert calls == [1]
+        assert state.due_at == START_TS + 600
+
+    def test_overlapping_runs_are_skipped(self):
+        release = threading.Event()
+        calls = []
+
+        def slow_job():
+            calls.append(1)
+            release.wait(5)
+
+        scheduler = Scheduler([Job("egg_detector", slow_job, 60)])
+        running = scheduler.tick(START_TS)
+        assert len(running) == 1
+
+        # still running when the next run is due
+        assert not scheduler.tick(START_TS + 60)
+
+        release.set()
+        wait(running)
+        assert len(scheduler.tick(START_TS + 120)) == 1
+        scheduler.shutdown()
+        assert calls == [1, 1]
+
+    def test_missed_runs_are_skipped(self):
+        scheduler = Scheduler([Job("cleanup", lambda: None, 60)])
+        wait(scheduler.tick(START_TS))
+
+        # the scheduler was busy for ten minutes
+        wait(scheduler.tick(START_TS + 600 + 10))
+        scheduler.shutdown()
+
+        assert scheduler.states["cleanup"].due_at == START_TS + 660
+
+    def test_hours(self):
+        job = Job("egg_detector", lambda: None, HOUR, hours=[14, 15])
+        scheduler = Scheduler([job])
+
+        assert len(scheduler.tick(START_TS)) == 1
+        # 16:00 UTC
+        assert not scheduler.tick(START_TS + HOUR)
+        scheduler.shutdown()
+
+    def test_metrics(self):
+        store = InMemoryMetricsStore()
+        scheduler = Scheduler([Job("egg_detector", fail, 60)], store)
+
+        wait(scheduler.tick(START_TS))
+        scheduler.shutdown()
+
+        records = store.records("metrics")
+        assert sorted(r.name for r in records) == [
+            "job_duration_seconds",
+            "job_lateness_seconds",
+        ]
+        assert {"Name": "job", "Value": "egg_detector"} in records[0].dimensions
+        assert all(r.value >= 0 for r in records)
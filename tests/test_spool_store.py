@@ -0,0 +1,176 @@
+from unittest.mock import MagicMock
+
+from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.store.metrics_store import ChunkResult, WriteResult
+from home_monitoring.store.spool import SpoolMetricsStore
+
+
+class TestSpoolMetricsStore:
+    def test_write_and_drain(self, tmp_path):
+        downstream = self._get_downstream()
+        store = SpoolMetricsStore(str(tmp_path / "spool.db"), downstream)
+
+        result = store.write_metrics("metrics", self._get_records(3))
+        store.write_metrics("metrics", self._get_records(2))
+
+        assert result.records_ingested == 3
+        downstream.write_metrics.assert_not_called()
+        assert store.pending_records() == 5
+
+        assert store.drain() == 5
+        downstream.write_metrics.assert_called_once()
+        table_name, records = downstream.write_metrics.call_args.args
+        assert table_name == "metrics"
+        assert len(records) == 5
+        assert records[0].name == "ping_avg"
+        assert records[0].dimensions == [
+            {"Name": "location", "Value": "primary_residence"}
+        ]
+        assert store.pending_records() == 0
+
+    def test_drain_failure_keeps_records(self, tmp_path):
+        downstream = self._get_downstream()
+        downstream.write_metrics.side_effect = Exception("Could not connect")
+        store = SpoolMetricsStore(str(tmp_path / "spool.db"), downstream)
+
+        store.write_metrics("metrics", self._get_records(3))
+
+        assert store.drain() == 0
+        assert store.pending_records() == 3
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "spool.db")
+        store = SpoolMetricsStore(path, self._get_downstream(failing=True))
+        store.write_metrics("metrics", self._get_records(3))
+        store.close(drain_timeout_seconds=0)
+
+        downstream = self._get_downstream()
+        store = SpoolMetricsStore(path, downstream, compress=False)
+        assert store.drain() == 3
+        assert len(downstream.write_metrics.call_args.args[1]) == 3
+
+    def test_drain_batch_size(self, tmp_path):
+        downstream = self._get_downstream()
+        store = SpoolMetricsStore(
+            str(tmp_path / "spool.db"), downstream, drain_batch_size=4
+        )
+        for _ in range(3):
+            store.write_metrics("metrics", self._get_records(2))
+
+        assert store.drain() == 6
+        assert downstream.write_metrics.call_count == 2
+
+    def test_poison_batch_is_dead_lettered(self, tmp_path):
+        def write_metrics(table_name, records):
+            poisoned = any(r.value < 0 for r in records)
+            chunk = ChunkResult(
+                index=0,
+                record_count=len(records),
+                records_ingested=0 if poisoned else len(records),
+                error=(
+                    "An error occurred (ValidationException) when calling the "
+                    "WriteRecords operation"
+                    if poisoned
+                    else None
+                ),
+            )
+            return WriteResult(chunks=[chunk])
+
+        downstream = MagicMock()
+        downstream.write_metrics.side_effect = write_metrics
+        store = SpoolMetricsStore(str(tmp_path / "spool.db"), downstream)
+        poison = self._get_records(1)
+        poison[0].value = -1.0
+        store.write_metrics("metrics", poison)
+        for _ in range(2):
+            store.write_metrics("metrics", self._get_records(2))
+
+        # the batches behind the poison batch are still delivered
+        assert store.drain() == 4
+        assert store.pending_records() == 0
+        assert store.dead_letter_records() == 1
+
+    def test_dead_letter_after_max_attempts(self, tmp_path):
+        store = SpoolMetricsStore(
+            str(tmp_path / "spool.db"),
+            self._get_downstream(failing=True),
+            max_attempts=2,
+        )
+        store.write_metrics("metrics", self._get_records(3))
+
+        assert store.drain() == 0
+        assert store.pending_records() == 3
+        assert store.drain() == 0
+        assert store.pending_records() == 0
+        assert store.dead_letter_records() == 3
+
+    def test_max_dead_letter_records(self, tmp_path):
+        store = SpoolMetricsStore(
+            str(tmp_path / "spool.db"),
+            self._get_downstream(failing=True),
+            max_attempts=1,
+            max_dead_letter_records=5,
+        )
+        for _ in range(3):
+            store.write_metrics("metrics", self._get_records(2))
+            store.drain()
+
+        # the oldest dead-lettered batch was dropped
+        assert store.pending_records() == 0
+        assert store.dead_letter_records() == 4
+
+    def test_dead_letter_skips_trimmed_batches(self, tmp_path):
+        store = SpoolMetricsStore(
+            str(tmp_path / "spool.db"), self._get_downstream(), max_records=2
+        )
+        store.write_metrics("metrics", self._get_records(2))
+        # e.g. trimmed by a write while the batch was being delivered
+        store.write_metrics("metrics", self._get_records(2))
+
+        store._dead_letter([1, 2], "ValidationException")
+
+        assert store.pending_records() == 0
+        assert store.dead_letter_records() == 2
+
+    def test_connectivity_errors_are_not_attempts(self, tmp_path):
+        downstream = self._get_downstream()
+        downstream.write_metrics.side_effect = Exception("Could not connect")
+        store = SpoolMetricsStore(
+            str(tmp_path / "spool.db"), downstream, max_attempts=1
+        )
+        store.write_metrics("metrics", self._get_records(3))
+
+        for _ in range(3):
+            assert store.drain() == 0
+        assert store.pending_records() == 3
+        assert store.dead_letter_records() == 0
+
+    def test_max_records(self, tmp_path):
+        store = SpoolMetricsStore(
+            str(tmp_path / "spool.db"), self._get_downstream(), max_records=5
+        )
+        for _ in range(4):
+            store.write_metrics("metrics", self._get_records(2))
+
+        assert store.pending_records() == 4
+
+    def _get_downstream(self, failing=False):
+        def write_metrics(table_name, records):
+            chunk = ChunkResult(
+                index=0,
+                record_count=len(records),
+                records_ingested=0 if failing else len(records),
+            )
+            return WriteResult(chunks=[chunk])
+
+        downstream = MagicMock()
+        downstream.write_metrics.side_effect = write_metrics
+        return downstream
+
+    def _get_records(self, count):
+        records = []
+        for i in range(count):
+            record = MetricRecord("ping_avg", 1695185303 + i, 10.5)
+            record.add_dimension("location", "primary_residence")
+            records.append(record)
+        return records
@@ -0,0 +1,43 @@
+from home_monitoring.store.instrumentation import LatencyHistogram, StoreStats
+
+
+class TestStoreStats:
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        for latency_ms in [3] * 90 + [40] * 9 + [20000]:
+            histogram.observe(latency_ms)
+
+        assert histogram.count == 100
+        assert histogram.percentile(50) == 5
+        assert histogram.percentile(95) == 50
+        assert histogram.percentile(100) == 20000
+        assert histogram.max_ms == 20000
+
+    def test_to_metric_records(self):
+        stats = StoreStats("timestream")
+        assert stats.to_metric_records() == []
+
+        stats.record_call(0.08, 100, 20000)
+        stats.record_call(0.02, 50, 10000, records_rejected=2)
+        stats.record_call(0.01, 50, 10000, throttled=True, error=True)
+        stats.record_retry()
+
+        records = {
+            r.name: r for r in stats.to_metric_records(1695185303, [("scraper", "x")])
+        }
+
+        assert records["pipeline_write_calls"].value == 3
+        assert records["pipeline_write_records_per_call"].value == 200 / 3
+        assert records["pipeline_write_bytes_per_call"].value == 40000 / 3
+        assert records["pipeline_write_records_rejected"].value == 2
+        assert records["pipeline_write_throttled_calls"].value == 1
+        assert records["pipeline_write_retries"].value == 1
+        assert records["pipeline_write_errors"].value == 0
+        assert records["pipeline_write_latency_ms_max"].value == 80
+        assert records["pipeline_write_calls"].dimensions == [
+            {"Name": "store", "Value": "timestream"},
+            {"Name": "scraper", "Value": "x"},
+        ]
+
+        assert stats.reset().calls == 3
+        assert stats.snapshot().calls == 0
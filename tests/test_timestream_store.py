@@ -0,0 +1,290 @@
+import json
+from unittest.mock import ANY, MagicMock
+
+import pytest
+
+from home_monitoring.models.metrics import MetricBatch, MetricRecord
+from home_monitoring.store.retry import RetryPolicy, TokenBucket
+from home_monitoring.store.timestream import TimestreamMetricsStore
+
+
+class RejectedRecordsException(Exception):
+    def __init__(self, rejected_records):
+        super().__init__("RejectedRecordsException")
+        self.response = {"RejectedRecords": rejected_records}
+
+
+class ThrottlingException(Exception):
+    pass
+
+
+class InternalServerException(Exception):
+    pass
+
+
+class TestTimestreamMetricsStore:
+    def test_write_metrics_single_chunk(self):
+        client = self._get_client()
+        store = TimestreamMetricsStore(client, "home_monitoring")
+
+        result = store.write_metrics("metrics", self._get_records(3))
+
+        client.write_records.assert_called_once()
+        call_args = client.write_records.call_args
+        assert call_args.kwargs["DatabaseName"] == "home_monitoring"
+        assert call_args.kwargs["TableName"] == "metrics"
+        assert len(call_args.kwargs["Records"]) == 3
+        assert "Version" in call_args.kwargs["CommonAttributes"]
+        assert len(result.chunks) == 1
+        assert result.records_ingested == 3
+        assert result.records_failed == 0
+
+    def test_write_metrics_chunked(self):
+        client = self._get_client()
+        store = TimestreamMetricsStore(client, "home_monitoring", max_workers=4)
+
+        result = store.write_metrics("metrics", self._get_records(250))
+
+        assert client.write_records.call_count == 3
+        chunk_sizes = sorted(
+            len(c.kwargs["Records"]) for c in client.write_records.call_args_list
+        )
+        assert chunk_sizes == [50, 100, 100]
+        versions = set(
+            c.kwargs["CommonAttributes"]["Version"]
+            for c in client.write_records.call_args_list
+        )
+        assert len(versions) == 1
+        assert [c.index for c in result.chunks] == [0, 1, 2]
+        assert result.records_ingested == 250
+
+    def test_write_metrics_batch(self):
+        client = self._get_client()
+        store = TimestreamMetricsStore(client, "home_monitoring")
+        batch = MetricBatch.from_records(self._get_records(150))
+
+        result = store.write_metrics("metrics", batch)
+
+        assert client.write_records.call_count == 2
+        assert result.records_ingested == 150
+        call_args = client.write_records.call_args_list[0]
+        assert call_args.kwargs["Records"][0] == {
+            "MeasureValue": "0.0",
+            "Time": "1695185303",
+        }
+        assert call_args.kwargs["CommonAttributes"] == {
+            "Dimensions": [{"Name": "name", "Value": "Pool temp"}],
+            "MeasureName": "temperature",
+            "MeasureValueType": "DOUBLE",
+            "TimeUnit": "SECONDS",
+            "Version": ANY,
+        }
+
+    def test_hoist_common_attributes(self):
+        records = self._get_records(3)
+        records[1].name = "humidity"
+        timestream_records = TimestreamMetricsStore.to_timestream_records(
+            records, range(3)
+        )
+
+        common_attributes = TimestreamMetricsStore.hoist_common_attributes(
+            timestream_records
+        )
+
+        assert set(common_attributes.keys()) == {
+            "Dimensions",
+            "MeasureValueType",
+            "TimeUnit",
+        }
+        assert timestream_records[1] == {
+            "MeasureName": "humidity",
+            "MeasureValue": "1.0",
+            "Time": "1695185304",
+        }
+        # the record's own dimensions list is left intact
+        assert records[0].dimensions == [{"Name": "name", "Value": "Pool temp"}]
+
+    def test_write_metrics_grouped_by_dimensions(self):
+        client = self._get_client()
+        store = TimestreamMetricsStore(client, "home_monitoring", records_per_call=4)
+        records = self._get_records(8)
+        for record in records[::2]:
+            record.dimensions = [{"Name": "name", "Value": "Office temp"}]
+
+        store.write_metrics("metrics", records)
+
+        assert client.write_records.call_count == 2
+        for call_args in client.write_records.call_args_list:
+            assert "Dimensions" in call_args.kwargs["CommonAttributes"]
+            for record in call_args.kwargs["Records"]:
+                assert "Dimensions" not in record
+
+    def test_write_metrics_not_grouped_if_more_calls(self):
+        client = self._get_client()
+        store = TimestreamMetricsStore(client, "home_monitoring")
+        records = self._get_records(3)
+        records[1].dimensions = [{"Name": "name", "Value": "Office temp"}]
+
+        store.write_metrics("metrics", records)
+
+        client.write_records.assert_called_once()
+        call_args = client.write_records.call_args
+        assert "Dimensions" not in call_args.kwargs["CommonAttributes"]
+        assert [r["Time"] for r in call_args.kwargs["Records"]] == [
+            "1695185303",
+            "1695185304",
+            "1695185305",
+        ]
+
+    def test_write_metrics_multi_measure(self):
+        client = self._get_client()
+        store = TimestreamMetricsStore(client, "home_monitoring")
+        batch = MetricBatch()
+        for ts in (1695185303, 1695185603):
+            for name, value in (("ping_min", 9.5), ("ping_avg", 12), ("ping_max", 20)):
+                batch.append(name, ts, value, [("location", "primary_residence")])
+
+        result = store.write_metrics("metrics", batch, multi_measure_name="ping")
+
+        client.write_records.assert_called_once()
+        call_args = client.write_records.call_args
+        assert call_args.kwargs["CommonAttributes"] == {
+            "Dimensions": [{"Name": "location", "Value": "primary_residence"}],
+            "MeasureName": "ping",
+            "MeasureValueType": "MULTI",
+            "TimeUnit": "SECONDS",
+            "Version": ANY,
+        }
+        records = call_args.kwargs["Records"]
+        assert len(records) == 2
+        assert records[0] == {
+            "MeasureValues": [
+                {"Name": "ping_min", "Value": "9.5", "Type": "DOUBLE"},
+                {"Name": "ping_avg", "Value": "12.0", "Type": "DOUBLE"},
+                {"Name": "ping_max", "Value": "20.0", "Type": "DOUBLE"},
+            ],
+            "Time": "1695185303",
+        }
+        assert result.records_ingested == 2
+
+    def test_write_metrics_rejected_records(self):
+        client = self._get_client()
+        client.write_records.side_effect = RejectedRecordsException(
+            [{"RecordIndex": 1, "Reason": "Duplicate"}]
+        )
+        store = TimestreamMetricsStore(client, "home_monitoring")
+
+        result = store.write_metrics("metrics", self._get_records(3))
+
+        assert result.records_ingested == 2
+        assert result.records_rejected == 1
+        assert result.records_failed == 0
+        assert result.chunks[0].error == "RejectedRecordsException"
+        client.write_records.assert_called_once()
+
+    def test_write_metrics_resubmits_retryable_rejections(self):
+        client = self._get_client()
+        client.write_records.side_effect = [
+            RejectedRecordsException(
+                [
+                    {"RecordIndex": 0, "Reason": "Duplicate record"},
+                    {"RecordIndex": 2, "Reason": "Internal error"},
+                ]
+            ),
+            {"ResponseMetadata": {"HTTPStatusCode": 200}},
+        ]
+        store = self._get_store(client)
+
+        records = self._get_records(3)
+        result = store.write_metrics("metrics", records)
+
+        assert client.write_records.call_count == 2
+        resubmitted = client.write_records.call_args_list[1].kwargs["Records"]
+        assert len(resubmitted) == 1
+        assert resubmitted[0]["Time"] == str(records[2].time)
+        assert result.records_ingested == 2
+        assert result.records_rejected == 1
+        assert result.records_failed == 0
+        assert result.chunks[0].attempts == 2
+
+    def test_write_metrics_throttled(self):
+        client = self._get_client()
+        client.write_records.side_effect = [
+            ThrottlingException(),
+            {"ResponseMetadata": {"HTTPStatusCode": 200}},
+        ]
+        store = self._get_store(client)
+
+        result = store.write_metrics("metrics", self._get_records(3))
+
+        assert client.write_records.call_count == 2
+        assert result.records_ingested == 3
+        assert result.chunks[0].error is None
+
+        stats = store.stats.snapshot()
+        assert stats.calls == 2
+        assert stats.records == 6
+        assert stats.throttled_calls == 1
+        assert stats.retries == 1
+        assert stats.errors == 0
+        assert stats.bytes > 0
+
+    def test_payload_bytes(self):
+        records = self._get_records(100)
+        chunk = TimestreamMetricsStore.to_timestream_records(records, range(100))
+        common_attributes = TimestreamMetricsStore.hoist_common_attributes(chunk)
+
+        serialized = json.dumps(
+            {"Records": chunk, "CommonAttributes": common_attributes},
+            separators=(",", ":"),
+        )
+        estimate = TimestreamMetricsStore._payload_bytes(chunk, common_attributes)
+        assert estimate == pytest.approx(len(serialized), rel=0.05)
+
+    def test_write_metrics_retries_exhausted(self):
+        client = self._get_client()
+        client.write_records.side_effect = InternalServerException()
+        store = self._get_store(client)
+
+        result = store.write_metrics("metrics", self._get_records(3))
+
+        assert client.write_records.call_count == 3
+        assert result.records_ingested == 0
+        assert result.records_failed == 3
+        assert result.chunks[0].error == "InternalServerException"
+
+    def test_write_metrics_non_retryable_error(self):
+        client = self._get_client()
+        client.write_records.side_effect = ValueError("ValidationException")
+        store = self._get_store(client)
+
+        result = store.write_metrics("metrics", self._get_records(3))
+
+        client.write_records.assert_called_once()
+        assert result.records_failed == 3
+
+    def _get_client(self):
+        client = MagicMock()
+        client.exceptions.RejectedRecordsException = RejectedRecordsException
+        client.exceptions.ThrottlingException = ThrottlingException
+        client.exceptions.InternalServerException = InternalServerException
+        client.write_records.return_value = {
+            "ResponseMetadata": {"HTTPStatusCode": 200}
+        }
+        return client
+
+    def _get_store(self, client):
+        return TimestreamMetricsStore(
+            client,
+            "home_monitoring",
+            retry_policy=RetryPolicy(max_attempts=3, base_delay_seconds=0),
+            token_bucket=TokenBucket(rate=1000),
+        )
+
+    def _get_records(self, count):
+        records = []
+        for i in range(count):
+            record = MetricRecord("temperature", 1695185303 + i, float(i))
+            record.add_dimension("name", "Pool temp")
+            records.append(record)
+        return records
@@ -0,0 +1,84 @@
+import time
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+from home_monitoring.scrapers.token_cache import TokenCache
+
+
+class TestTokenCache:
+    def test_refreshes_and_caches(self):
+        table = MagicMock()
+        table.get_item.return_value = {}
+        fetch_token = MagicMock(return_value=("TOKEN1", 3600))
+        cache = TokenCache("yolink", fetch_token, table, memory={})
+
+        assert cache.get_token() == "TOKEN1"
+        assert cache.get_token() == "TOKEN1"
+
+        fetch_token.assert_called_once()
+        table.get_item.assert_called_once_with(
+            Key={"app_name": "yolink"}, ConsistentRead=True
+        )
+        item = table.put_item.call_args.kwargs["Item"]
+        assert item["access_token"] == "TOKEN1"
+        assert item["version"] == 1
+
+    def test_uses_stored_token(self):
+        table = MagicMock()
+        table.get_item.return_value = self._get_item("STORED", 3600)
+        fetch_token = MagicMock()
+
+        cache = TokenCache("yolink", fetch_token, table, memory={})
+
+        assert cache.get_token() == "STORED"
+        fetch_token.assert_not_called()
+
+    def test_refreshes_near_expiry(self):
+        table = MagicMock()
+        table.get_item.return_value = self._get_item("STORED", 60, version=3)
+        fetch_token = MagicMock(return_value=("TOKEN2", 3600))
+
+        cache = TokenCache("yolink", fetch_token, table, memory={})
+
+        assert cache.get_token() == "TOKEN2"
+        put_item = table.put_item.call_args.kwargs
+        assert put_item["Item"]["version"] == 4
+        assert put_item["ExpressionAttributeValues"] == {":version": 4}
+
+    def test_concurrent_refresh_adopts_winner(self):
+        table = MagicMock()
+        table.get_item.side_effect = [
+            self._get_item("EXPIRED", -10, version=3),
+            self._get_item("WINNER", 3600, version=4),
+        ]
+        table.put_item.side_effect = ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+        )
+        fetch_token = MagicMock(return_value=("LOSER", 3600))
+
+        cache = TokenCache("yolink", fetch_token, table, memory={})
+
+        assert cache.get_token() == "WINNER"
+
+    def test_invalidate(self):
+        table = MagicMock()
+        table.get_item.return_value = self._get_item("REVOKED", 3600, version=1)
+        fetch_token = MagicMock(return_value=("TOKEN2", 3600))
+        cache = TokenCache("yolink", fetch_token, table, memory={})
+        assert cache.get_token() == "REVOKED"
+
+        cache.invalidate()
+
+        assert cache.get_token() == "TOKEN2"
+        assert table.put_item.call_args.kwargs["Item"]["version"] == 2
+
+    def _get_item(self, access_token, expires_in_seconds, version=1):
+        return {
+            "Item": {
+                "app_name": "yolink",
+                "access_token": access_token,
+                "expiration_ts": int(time.time()) + expires_in_seconds,
+                "version": version,
+            }
+        }
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError, NoCredentialsError
+
+from home_monitoring.lambdas.warm_cache import WarmCache, is_credential_or_config_error
+
+
+class TestWarmCache:
+    def test_get_creates_once(self):
+        cache = WarmCache()
+        factory = MagicMock(side_effect=[object(), object()])
+
+        first = cache.get("client", factory)
+        assert cache.get("client", factory) is first
+        factory.assert_called_once()
+
+        cache.invalidate("client")
+        assert cache.get("client", factory) is not first
+
+    def test_invalidate_all(self):
+        cache = WarmCache()
+        cache.get("a", object)
+        cache.get("b", object)
+
+        cache.invalidate()
+
+        assert "a" not in cache and "b" not in cache
+
+    def test_is_credential_or_config_error(self):
+        expired = ClientError(
+            {"Error": {"Code": "ExpiredTokenException", "Message": "expired"}},
+            "WriteRecords",
+        )
+        throttled = ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": "slow down"}},
+            "WriteRecords",
+        )
+
+        assert is_credential_or_config_error(expired)
+        assert is_credential_or_config_error(NoCredentialsError())
+        # as recorded in ChunkResult.error
+        assert is_credential_or_config_error(str(expired))
+        assert not is_credential_or_config_error(throttled)
+        assert not is_credential_or_config_error(str(throttled))
+        assert not is_credential_or_config_error(Exception("vendor error"))
@@ -0,0 +1,143 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import arrow
+
+from home_monitoring.lambdas import metrics_importer
+from home_monitoring.models.metrics import MetricRecord
+from home_monitoring.scrapers.base_scraper import BackfillableScraper
+from home_monitoring.store.async_writer import AsyncMetricsWriter
+from home_monitoring.store.memory import InMemoryMetricsStore
+from home_monitoring.store.metrics_store import ChunkResult, WriteResult
+from home_monitoring.store.watermark import WatermarkingMetricsStore, WatermarkStore
+
+HOUR = 60 * 60
+NOW = arrow.get("2024-01-02T12:00:00+00:00")
+
+
+class FakeStateTable:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key, consistent_read=False):
+        return self.values.get(key)
+
+    def put(self, key, value):
+        self.values[key] = value
+
+
+class HourlyScraper(BackfillableScraper):
+    """Reports one record per hour, up to NOW"""
+
+    backfill_window_seconds = 24 * HOUR
+    track_watermark = True
+
+    def __init__(self, env: str = "dev"):
+        super().__init__(env)
+        self.windows = []
+
+    def scrape_metrics(self):
+        return [MetricRecord("water_usage", NOW.int_timestamp - HOUR, 1.0)]
+
+    def scrape_window(self, since, until):
+        self.windows.append((since.int_timestamp, until.int_timestamp))
+        first_hour = -(-since.int_timestamp // HOUR) * HOUR
+        return [
+            MetricRecord("water_usage", ts, 1.0)
+            for ts in range(first_hour, until.int_timestamp, HOUR)
+        ]
+
+    def catch_up_until(self):
+        return NOW
+
+
+class TestScrapeSince:
+    def test_first_run_scrapes_metrics(self):
+        scraper = HourlyScraper()
+        assert len(scraper.scrape_since(None)) == 1
+        assert scraper.windows == []
+
+    def test_catches_up_in_fewest_windows(self):
+        scraper = HourlyScraper()
+        watermark_ts = NOW.shift(hours=-30).int_timestamp
+
+        records = scraper.scrape_since(watermark_ts)
+
+        # 29 missed hours in two unaligned day-sized windows
+        assert scraper.windows == [
+            (watermark_ts + 1, watermark_ts + 1 + 24 * HOUR),
+            (watermark_ts + 1 + 24 * HOUR, NOW.int_timestamp),
+        ]
+        assert [r.time for r in records] == list(
+            range(watermark_ts + HOUR, NOW.int_timestamp, HOUR)
+        )
+
+    def test_long_gaps_are_truncated(self):
+        scraper = HourlyScraper()
+        scraper.max_catch_up_seconds = 2 * HOUR
+
+        records = scraper.scrape_since(NOW.shift(days=-30).int_timestamp)
+
+        assert len(records) == 2
+
+    def test_stops_between_windows_when_cancelled(self):
+        scraper = HourlyScraper()
+        cancelled = threading.Event()
+        scrape_window = scraper.scrape_window
+
+        def cancel_after_window(since, until):
+            # e.g. the scraper timed out during its first request
+            cancelled.set()
+            return scrape_window(since, until)
+
+        scraper.scrape_window = cancel_after_window
+        scraper.scrape_since(NOW.shift(hours=-30).int_timestamp, cancelled)
+
+        assert len(scraper.windows) == 1
+
+
+class TestWatermarkingMetricsStore:
+    def test_skips_records_before_watermark_and_advances(self):
+        downstream = InMemoryMetricsStore()
+        watermarks = WatermarkStore(FakeStateTable())
+        store = WatermarkingMetricsStore(downstream, watermarks, "HourlyScraper", 100)
+
+        result = store.write_metrics("metrics", _get_records(50, 100, 150))
+
+        assert [r.time for r in downstream.records("metrics")] == [150]
+        assert result.records_skipped == 2
+        assert watermarks.get("HourlyScraper") == 150
+
+    def test_watermark_not_advanced_on_failure(self):
+        downstream = MagicMock()
+        downstream.write_metrics.return_value = WriteResult(
+            chunks=[ChunkResult(index=0, record_count=1, error="throttled")]
+        )
+        watermarks = WatermarkStore(FakeStateTable())
+        store = WatermarkingMetricsStore(downstream, watermarks, "HourlyScraper", None)
+
+        store.write_metrics("metrics", _get_records(200))
+
+        assert watermarks.get("HourlyScraper") is None
+
+
+class TestRunScraper:
+    @patch("home_monitoring.lambdas.metrics_importer.load_scraper_class")
+    def test_missed_runs_heal_on_next_run(self, load_scraper_class):
+        load_scraper_class.return_value = HourlyScraper
+        downstream = InMemoryMetricsStore()
+        watermarks = WatermarkStore(FakeStateTable())
+        watermarks.put("HourlyScraper", NOW.shift(hours=-4).int_timestamp)
+
+        writer = AsyncMetricsWriter(downstream)
+        metrics_importer.run_scraper(
+            "tests.test_watermark.HourlyScraper", "dev", writer, None, watermarks
+        )
+        writer.close()
+
+        assert len(downstream) == 3
+        assert watermarks.get("HourlyScraper") == NOW.int_timestamp - HOUR
+
+
+def _get_records(*times):
+    return [MetricRecord("water_usage", ts, 1.0) for ts in times]
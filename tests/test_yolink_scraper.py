@@ -1,12 +1,15 @@
+import time
 from unittest.mock import MagicMock, patch
 
 import arrow
 
-from home_monitoring.scrapers.yolink import YolinkScraper
+from home_monitoring.config import YolinkConfig
+from home_monitoring.scrapers.token_cache import TokenCache
+from home_monitoring.scrapers.yolink import YolinkDeviceCache, YolinkScraper
 
 
 class TestYolinkScraper:
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_scrape_metrics(self, requests_post):
         ts = arrow.now().int_timestamp
 
@@ -108,14 +111,25 @@ class TestYolinkScraper:
             },
         }
 
-        requests_post.side_effect = [
-            access_token_response,
-            get_devices_response,
-            get_device_state_response1,
-            get_device_state_response2,
-        ]
+        responses = {
+            "Home.getDeviceList": get_devices_response,
+            "THSensor.getState": get_device_state_response1,
+            "LeakSensor.getState": get_device_state_response2,
+        }
+
+        def post(url, **kwargs):
+            if url.endswith("/token"):
+                return access_token_response
+            return responses[kwargs["json"]["method"]]
+
+        requests_post.side_effect = post
 
-        scraper = YolinkScraper(env="dev")
+        token_table = MagicMock()
+        token_table.get_item.return_value = {}
+        scraper = YolinkScraper(env="dev", device_cache=self._get_device_cache())
+        scraper.token_cache = TokenCache(
+            "yolink", scraper.get_token, token_table, memory={}
+        )
         metric_records = scraper.scrape_metrics()
 
         assert requests_post.call_count == 4
@@ -124,17 +138,138 @@ class TestYolinkScraper:
         expected_urls_and_methods = [
             ("https://api.yosmart.com/open/yolink/token", None),
             ("https://api.yosmart.com/open/yolink/v2/api", "Home.getDeviceList"),
-            ("https://api.yosmart.com/open/yolink/v2/api", "THSensor.getState"),
-            ("https://api.yosmart.com/open/yolink/v2/api", "LeakSensor.getState"),
         ]
 
-        for idx, call in enumerate(call_args_list):
+        for idx, call in enumerate(call_args_list[:2]):
             assert call[0][0] == expected_urls_and_methods[idx][0]
             method = expected_urls_and_methods[idx][1]
             if method:
                 assert call[1]["json"]["method"] == method
 
+        # device states are fetched concurrently, in no particular order
+        assert sorted(call[1]["json"]["method"] for call in call_args_list[2:]) == [
+            "LeakSensor.getState",
+            "THSensor.getState",
+        ]
+
+        token_table.put_item.assert_called_once()
+        assert token_table.put_item.call_args.kwargs["Item"]["access_token"] == (
+            "FAKE_TOKEN"
+        )
+
         assert len(metric_records) == 1
         assert metric_records[0].name == "temperature"
         assert metric_records[0].dimensions[0]["Name"] == "name"
         assert metric_records[0].dimensions[0]["Value"] == "Chicken brooder"
+
+    @patch("home_monitoring.scrapers.yolink.YolinkScraper.make_yolink_request")
+    def test_scrape_metrics_concurrent(self, make_yolink_request):
+        device_ids = list(YolinkConfig.DEVICE_MAPPING.keys())[:6]
+        ts = arrow.now().int_timestamp
+
+        def request(method, params={}):
+            if method == "Home.getDeviceList":
+                return {
+                    "data": {
+                        "devices": [
+                            {"deviceId": device_id, "token": "T", "type": "THSensor"}
+                            for device_id in device_ids
+                        ]
+                    }
+                }
+            device_id = params["targetDevice"]
+            index = device_ids.index(device_id)
+            if index == 1:
+                raise Exception("Request timed out")
+            # later devices respond first
+            time.sleep(0.05 * (len(device_ids) - index))
+            return {
+                "code": "000000",
+                "data": {
+                    "reportAt": arrow.get(ts + index).isoformat(),
+                    "state": {"temperature": 20.0, "state": "full"},
+                },
+            }
+
+        make_yolink_request.side_effect = request
+
+        started = time.monotonic()
+        scraper = YolinkScraper(env="dev", device_cache=self._get_device_cache())
+        metric_records = scraper.scrape_metrics()
+
+        assert time.monotonic() - started < 0.05 * 21
+        # the failed device is skipped, the rest keep device list order
+        assert [r.time for r in metric_records] == [ts, ts + 2, ts + 3, ts + 4, ts + 5]
+        assert [r.dimensions[0]["Value"] for r in metric_records] == [
+            YolinkConfig.DEVICE_MAPPING[device_ids[i]]["name"] for i in (0, 2, 3, 4, 5)
+        ]
+
+    @patch("home_monitoring.scrapers.yolink.YolinkScraper.make_yolink_request")
+    def test_device_list_cache(self, make_yolink_request):
+        device_id = "d88b4c0100063b11"
+        ts = arrow.now().int_timestamp
+        tokens = {"token": "OLD_TOKEN"}
+
+        def request(method, params={}):
+            if method == "Home.getDeviceList":
+                return {
+                    "data": {
+                        "devices": [
+                            {
+                                "deviceId": device_id,
+                                "token": tokens["token"],
+                                "type": "THSensor",
+                                "name": "Chicken brooder",
+                            }
+                        ]
+                    }
+                }
+            if params["token"] != tokens["token"]:
+                return {"code": "000103", "desc": "Token is invalid"}
+            return {
+                "code": "000000",
+                "data": {
+                    "reportAt": arrow.get(ts).isoformat(),
+                    "state": {"temperature": 20.0},
+                },
+            }
+
+        make_yolink_request.side_effect = request
+        state_table = MagicMock()
+        state_table.get.return_value = None
+        device_cache = YolinkDeviceCache(state_table, memory={})
+
+        YolinkScraper(env="dev", device_cache=device_cache).scrape_metrics()
+        state_table.put.assert_called_once()
+        assert state_table.put.call_args.args[1]["devices"] == [
+            {"deviceId": device_id, "type": "THSensor", "token": "OLD_TOKEN"}
+        ]
+
+        # the next run uses the cached list, which has a stale device token
+        tokens["token"] = "NEW_TOKEN"
+        make_yolink_request.reset_mock()
+        records = YolinkScraper(env="dev", device_cache=device_cache).scrape_metrics()
+
+        assert [c.args[0] for c in make_yolink_request.call_args_list] == [
+            "THSensor.getState",
+            "Home.getDeviceList",
+            "THSensor.getState",
+        ]
+        assert state_table.delete.call_count == 1
+        assert len(records) == 1
+
+        # and a cold start reads the refreshed list from the state table
+        state_table.get.return_value = state_table.put.call_args.args[1]
+        device_cache = YolinkDeviceCache(state_table, memory={})
+        make_yolink_request.reset_mock()
+        YolinkScraper(env="dev", device_cache=device_cache).scrape_metrics()
+
+        make_yolink_request.assert_called_once_with(
+            "THSensor.getState",
+            params={"targetDevice": device_id, "token": "NEW_TOKEN"},
+        )
+
+    def _get_device_cache(self):
+        state_table = MagicMock()
+        state_table.get.return_value = None
+        return YolinkDeviceCache(state_table, memory={})